@@ -0,0 +1,27 @@
+"""
+Resume ingestion: PDF conversion, chunking, near-duplicate detection and embedding.
+
+Names are imported from their modules on first access (PEP 562), so
+``import data`` doesn't load openai or tqdm until they are used.
+"""
+from src._lazy import lazy_exports
+
+__all__ = [
+    "convert_pdfs_to_markdown",
+    "chunk_markdown_file",
+    "chunk_markdown_files",
+    "NearDuplicateIndex",
+    "cluster_resumes",
+    "EmbeddingGenerator",
+    "EmbeddingStore",
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "convert_pdfs_to_markdown": (".loader", "convert_pdfs_to_markdown"),
+    "chunk_markdown_file": (".chunker", "chunk_markdown_file"),
+    "chunk_markdown_files": (".chunker", "chunk_markdown_files"),
+    "NearDuplicateIndex": (".dedup", "NearDuplicateIndex"),
+    "cluster_resumes": (".dedup", "cluster_resumes"),
+    "EmbeddingGenerator": (".embed", "EmbeddingGenerator"),
+    "EmbeddingStore": (".embed", "EmbeddingStore"),
+})
@@ -1,14 +1,55 @@
 import re
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from tqdm import tqdm
 from langchain_core.documents import Document
 
+from .dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+
 _SPACED_CAPS_RX = re.compile(r'(?<!\w)(?:[A-Z]\s+){2,}[A-Z](?!\w)')
 
 def _fix_spaced_caps(s: str) -> str:
     return _SPACED_CAPS_RX.sub(lambda m: m.group(0).replace(' ', ''), s)
 
+# Canonical section names for container headings, checked in order; chunks
+# before the first container heading (name, contact details) are "header".
+_SECTIONS = [
+    ("summary", r'about\s*me|summary|profile'),
+    ("experience", r'experience'),
+    ("education", r'education'),
+    ("skills", r'skills?'),
+    ("projects", r'projects?'),
+    ("achievements", r'achievements?|awards?|competitions?|hackathons?'),
+    ("publications", r'publications?'),
+    ("certifications", r'certifications?'),
+]
+_SECTION_RXS = [(name, re.compile(rf'\b(?:{rx})\b', re.IGNORECASE)) for name, rx in _SECTIONS]
+
+# Highest degree first; the first pattern found wins.
+_DEGREE_RXS = [
+    ("phd", re.compile(r'\bph\.?\s?d\b|\bdoctor(?:ate| of philosophy)\b', re.IGNORECASE)),
+    ("masters", re.compile(r"\bmaster'?s?\b|\bm\.?\s?(?:sc|tech|eng|phil)\b|\bm\.s\.|\bmba\b", re.IGNORECASE)),
+    ("bachelors", re.compile(r"\bbachelor'?s?\b|\bb\.?\s?(?:sc|tech|eng|com)\b|\bb\.[se]\.|\bb\.a\.", re.IGNORECASE)),
+    ("associate", re.compile(r"\bassociate'?s? degree\b|\bdiploma\b", re.IGNORECASE)),
+]
+
+def section_name(chunk: str) -> str:
+    """Canonical section of a chunk, from its leading container heading."""
+    first_line = chunk.lstrip().split("\n", 1)[0]
+    if first_line.startswith("#"):
+        for name, rx in _SECTION_RXS:
+            if rx.search(first_line):
+                return name
+    return "header"
+
+def detect_degree(texts: List[str]) -> Optional[str]:
+    """Highest degree mentioned in the texts (education sections, preferably), or None."""
+    text = "\n".join(texts)
+    for name, rx in _DEGREE_RXS:
+        if rx.search(text):
+            return name
+    return None
+
 def _container_chunking(content: str, resume_id: str) -> List[Document]:
     content = re.sub(r'<!-- image -->', '', content)
     content = _fix_spaced_caps(content)
@@ -23,18 +64,58 @@ def _container_chunking(content: str, resume_id: str) -> List[Document]:
     for i, chunk in enumerate(parts):
         chunk = chunk.strip()
         if chunk and len(chunk) > 50:
-            docs.append(Document(page_content=chunk, metadata={"resume_id": resume_id, "chunk_id": i}))
+            docs.append(Document(page_content=chunk, metadata={
+                "resume_id": resume_id, "chunk_id": i, "section": section_name(chunk),
+            }))
+    # Resume-level attribute, copied to every chunk so it can be filtered on.
+    education = [d.page_content for d in docs if d.metadata["section"] == "education"]
+    degree = detect_degree(education or [content])
+    if degree is not None:
+        for d in docs:
+            d.metadata["degree"] = degree
     return docs
 
-def chunk_markdown_files(markdown_dir: Path) -> List[Document]:
-    md_files = list(markdown_dir.glob("*.md"))
+def chunk_markdown_file(md: Path) -> List[Document]:
+    """Chunks of one resume; the file stem is its resume_id."""
+    return _container_chunking(md.read_text(encoding="utf-8"), md.stem)
+
+def assign_clusters(chunks: List[Document], index: NearDuplicateIndex) -> int:
+    """
+    Set ``metadata["cluster_id"]`` on every chunk, adding each resume to ``index``.
+
+    Chunks of one resume must be contiguous. Returns how many resumes were
+    clustered as near-duplicates of an already indexed resume.
+    """
+    duplicates = 0
+    i = 0
+    while i < len(chunks):
+        rid = chunks[i].metadata["resume_id"]
+        j = i
+        while j < len(chunks) and chunks[j].metadata["resume_id"] == rid:
+            j += 1
+        cluster_id = index.add(rid, "\n\n".join(c.page_content for c in chunks[i:j]))
+        duplicates += cluster_id != rid
+        for c in chunks[i:j]:
+            c.metadata["cluster_id"] = cluster_id
+        i = j
+    return duplicates
+
+def chunk_markdown_files(markdown_dir: Path, dedup_threshold: float = DEFAULT_THRESHOLD) -> List[Document]:
+    """
+    Chunks of every resume in ``markdown_dir``.
+
+    Near-duplicate resumes (MinHash estimated Jaccard >= ``dedup_threshold``)
+    share a ``cluster_id``: the id of the first of them in file name order.
+    """
+    md_files = sorted(markdown_dir.glob("*.md"))
     if not md_files:
         raise ValueError(f"No markdown files found in {markdown_dir}")
     all_chunks: List[Document] = []
     for md in tqdm(md_files, desc="Chunking markdown"):
         try:
-            content = md.read_text(encoding="utf-8")
-            all_chunks.extend(_container_chunking(content, md.stem))
+            all_chunks.extend(chunk_markdown_file(md))
         except Exception as e:
             print(f"Failed to chunk {md.name}: {e}")
+    duplicates = assign_clusters(all_chunks, NearDuplicateIndex(dedup_threshold))
+    print(f"Near-duplicate resumes: {duplicates} of {len(md_files)}")
     return all_chunks
\ No newline at end of file
@@ -0,0 +1,106 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+# Resumes whose estimated Jaccard similarity (word 5-shingles) reaches this are
+# treated as the same resume: re-uploads, format conversions, small edits.
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 128
+# 16 bands x 8 rows: pairs at Jaccard 0.8 collide in some band with
+# probability ~0.97, pairs at 0.4 with ~0.01; candidates are then verified.
+BANDS = 16
+SHINGLE_SIZE = 5
+
+_MERSENNE = (1 << 61) - 1
+_TOKEN_RX = re.compile(r"\w+")
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> Set[str]:
+    """Word k-shingles of the lowercased text (the whole text if it is shorter)."""
+    words = _TOKEN_RX.findall(text.lower())
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` universal hash functions over CRC32 shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # a < 2^31 and x < 2^32 keep a * x + b below 2^64 (no uint64 overflow).
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64
+        )
+        if not len(hashes):
+            return np.full(len(self.a), _MERSENNE, dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % _MERSENNE).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures of whole resumes.
+
+    ``add`` returns the resume's cluster id: the cluster of the first indexed
+    resume it near-duplicates (estimated Jaccard >= ``threshold``), or its own
+    id. Only resumes sharing an LSH band bucket are compared, so adding is
+    roughly constant time instead of a scan over the corpus.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        seed: int = 0,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.hasher = MinHasher(num_perm, seed)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.clusters: Dict[str, str] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in np.split(sig, self.bands)]
+
+    def add(self, resume_id: str, text: str, cluster_id: Optional[str] = None) -> str:
+        """
+        Index a resume and return its cluster id.
+
+        Pass ``cluster_id`` to re-index a resume whose cluster is already known
+        (e.g. from stored chunk metadata) without matching it.
+        """
+        sig = self.hasher.signature(text)
+        keys = self._band_keys(sig)
+        if cluster_id is None:
+            best, best_sim = None, self.threshold
+            seen = set()
+            for band, key in zip(self._buckets, keys):
+                for other in band.get(key, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    sim = float(np.mean(self.signatures[other] == sig))
+                    if sim >= best_sim:
+                        best, best_sim = other, sim
+            cluster_id = self.clusters[best] if best is not None else resume_id
+        self.signatures[resume_id] = sig
+        self.clusters[resume_id] = cluster_id
+        for band, key in zip(self._buckets, keys):
+            band.setdefault(key, []).append(resume_id)
+        return cluster_id
+
+
+def cluster_resumes(texts: Dict[str, str], threshold: float = DEFAULT_THRESHOLD) -> Dict[str, str]:
+    """Cluster id per resume id; resumes are added in sorted id order, so ids are deterministic."""
+    index = NearDuplicateIndex(threshold)
+    return {rid: index.add(rid, texts[rid]) for rid in sorted(texts)}
@@ -1,20 +1,384 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
 import numpy as np
-from typing import List
+import openai
 from tqdm import tqdm
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+# Transient failures worth retrying; anything else (auth, bad request) is not.
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# API limit on inputs per embeddings request.
+MAX_BATCH_INPUTS = 2048
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-insensitive form of a chunk, used in content keys."""
+    return " ".join(text.split())
+
+
+def content_key(model: str, text: str) -> str:
+    """Content address of a text's embedding: hash of the model name and normalized text."""
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    """Token count function for ``model``: tiktoken if installed, else a conservative estimate."""
+    try:
+        import tiktoken
+
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # ~4 characters per token for English; over-estimate so batches and
+        # the tokens-per-minute budget stay under the real limits.
+        return lambda text: len(text) // 3 + 1
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+
+def token_batches(counts: List[int], max_tokens: int, max_items: int = MAX_BATCH_INPUTS) -> List[Tuple[int, int]]:
+    """
+    Split consecutive items into (start, end) batches of at most ``max_tokens``
+    tokens and ``max_items`` items. An item larger than ``max_tokens`` gets a
+    batch of its own.
+    """
+    batches = []
+    start, tokens = 0, 0
+    for i, n in enumerate(counts):
+        if i > start and (tokens + n > max_tokens or i - start >= max_items):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(counts):
+        batches.append((start, len(counts)))
+    return batches
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``per_minute / 60`` per second, holding one second's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float) -> float:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request costlier than the bucket waits for a full bucket and
+        # drives the level negative, so the average rate still holds.
+        need = min(cost, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by concurrent requests (FIFO)."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        async with self._lock:
+            while True:
+                delay = max(
+                    self.requests.wait_time(1) if self.requests else 0.0,
+                    self.tokens.wait_time(tokens) if self.tokens else 0.0,
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= tokens
+
+
+class _Checkpoints:
+    """Completed batches on disk, keyed by model and batch texts."""
+
+    def __init__(self, path: Union[str, Path], model: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.model = model
+
+    def _file(self, texts: List[str]) -> Path:
+        digest = hashlib.sha1(self.model.encode("utf-8"))
+        for t in texts:
+            digest.update(b"\0" + t.encode("utf-8"))
+        return self.path / f"{digest.hexdigest()}.npy"
+
+    def load(self, texts: List[str]) -> Optional[np.ndarray]:
+        try:
+            vectors = np.load(self._file(texts))
+        except (OSError, ValueError):
+            return None
+        return vectors if len(vectors) == len(texts) else None
+
+    def save(self, texts: List[str], vectors: np.ndarray):
+        path = self._file(texts)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp, path)
+
+    def remove(self, texts: List[str]):
+        self._file(texts).unlink(missing_ok=True)
+
+
+class EmbeddingStore:
+    """
+    Content-addressed embedding store: one float32 vector per ``content_key``.
+
+    Resume corpora repeat boilerplate and whole resumes uploaded twice; keyed
+    on content, each distinct text is embedded once across every chunk,
+    resume and rerun that contains it. Backed by a SQLite file.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        # Imported here: loading the src package is only worth it when a store is used.
+        from src.retrieval.cache import SqliteStore
+
+        self.db = SqliteStore(path, "embeddings")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in self.db.get_many(keys).items()}
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.db.put_many((key, vec.tobytes()) for key, vec in zip(keys, vectors))
+
 
 class EmbeddingGenerator:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = 3000,
+        tokens_per_minute: Optional[float] = 1_000_000,
+        max_batch_tokens: int = 30_000,
+        max_retries: int = 6,
+        retry_backoff: float = 1.0,
+        timeout: float = 60.0,
+    ):
+        """
+        Args:
+            api_key: OpenAI API key
+            base_url: OpenAI-compatible endpoint (None uses the client default)
+            max_concurrency: Max embedding requests in flight in ``generate``
+            requests_per_minute: Request budget (None for unlimited)
+            tokens_per_minute: Input-token budget (None for unlimited)
+            max_batch_tokens: Batches are filled up to this many input tokens
+            max_retries: Retries per batch on rate limits and transient errors
+            retry_backoff: Base delay in seconds, doubled on every retry
+            timeout: Per-request timeout in seconds
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.stats: Dict[str, int] = {}
+
+    def generate(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        batch_size: int = MAX_BATCH_INPUTS,
+        checkpoint_dir: Optional[Union[str, Path]] = None,
+        store: Optional[EmbeddingStore] = None,
+    ) -> np.ndarray:
+        """
+        Embed ``texts`` (rows in input order).
+
+        Identical texts (up to whitespace) are embedded once, and texts already
+        in ``store`` are not embedded at all. The rest are grouped into batches
+        of up to ``max_batch_tokens`` tokens (and ``batch_size`` inputs), sent
+        ``max_concurrency`` at a time under the requests/tokens-per-minute
+        budget, and retried with exponential backoff on rate limits and
+        transient errors. With ``checkpoint_dir``, every completed batch is
+        saved there, so rerunning after an interruption only embeds the
+        batches that are missing; the files are removed once the run completes.
+        """
+        return asyncio.run(self.agenerate(texts, model, batch_size, checkpoint_dir, store))
+
+    async def agenerate(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        batch_size: int = MAX_BATCH_INPUTS,
+        checkpoint_dir: Optional[Union[str, Path]] = None,
+        store: Optional[EmbeddingStore] = None,
+    ) -> np.ndarray:
+        """Async ``generate``."""
+        vectors, vector_ids = await self.agenerate_unique(texts, model, batch_size, checkpoint_dir, store)
+        return vectors[vector_ids]
+
+    def generate_unique(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        batch_size: int = MAX_BATCH_INPUTS,
+        checkpoint_dir: Optional[Union[str, Path]] = None,
+        store: Optional[EmbeddingStore] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ``generate`` without expanding duplicates: one row per distinct text,
+        plus the row of every input text (``vectors[vector_ids]`` is what
+        ``generate`` returns).
+        """
+        return asyncio.run(self.agenerate_unique(texts, model, batch_size, checkpoint_dir, store))
+
+    async def agenerate_unique(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        batch_size: int = MAX_BATCH_INPUTS,
+        checkpoint_dir: Optional[Union[str, Path]] = None,
+        store: Optional[EmbeddingStore] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Async ``generate_unique``."""
+        keys = [content_key(model, t) for t in texts]
+        rows: Dict[str, int] = {}
+        vector_ids = np.fromiter((rows.setdefault(k, len(rows)) for k in keys), dtype=np.int64, count=len(keys))
+        first = np.unique(vector_ids, return_index=True)[1]  # first text of each row
+        unique_keys = [keys[i] for i in first]
+
+        stored = store.get_many(unique_keys) if store is not None else {}
+        missing = [j for j, key in enumerate(unique_keys) if key not in stored]
+        fresh = await self._aembed_texts([texts[first[j]] for j in missing], model, batch_size, checkpoint_dir)
+        if store is not None and missing:
+            store.put_many([unique_keys[j] for j in missing], fresh)
+
+        self.stats = {"texts": len(texts), "unique": len(first), "stored": len(stored), "embedded": len(missing)}
+        if texts:
+            print(f"Embeddings: {len(texts)} texts, {len(first)} unique "
+                  f"({1 - len(first) / len(texts):.1%} duplicates), "
+                  f"{len(stored)} from store, {len(missing)} embedded")
+        if not len(first):
+            return np.zeros((0, 0), dtype=np.float32), vector_ids
+
+        dim = fresh.shape[1] if missing else len(next(iter(stored.values())))
+        vectors = np.empty((len(first), dim), dtype=np.float32)
+        for j, key in enumerate(unique_keys):
+            if key in stored:
+                vectors[j] = stored[key]
+        if missing:
+            vectors[missing] = fresh
+        return vectors, vector_ids
+
+    async def _aembed_texts(
+        self,
+        texts: List[str],
+        model: str,
+        batch_size: int,
+        checkpoint_dir: Optional[Union[str, Path]],
+    ) -> np.ndarray:
+        """Embed every text (no deduplication) in concurrent, rate-limited, checkpointed batches."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        count = token_counter(model)
+        counts = [count(t) for t in texts]
+        batches = token_batches(counts, self.max_batch_tokens, min(batch_size, MAX_BATCH_INPUTS))
+        checkpoints = _Checkpoints(checkpoint_dir, model) if checkpoint_dir else None
+
+        results: List[Optional[np.ndarray]] = [None] * len(batches)
+        if checkpoints:
+            for i, (lo, hi) in enumerate(batches):
+                results[i] = checkpoints.load(texts[lo:hi])
+        todo = [i for i, r in enumerate(results) if r is None]
+        if checkpoints and len(todo) < len(batches):
+            print(f"Resuming: {len(batches) - len(todo)}/{len(batches)} batches already embedded")
+
+        limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        progress = tqdm(total=len(batches), initial=len(batches) - len(todo), desc="OpenAI embeddings")
+
+        async def run(client: AsyncOpenAI, i: int):
+            lo, hi = batches[i]
+            vectors = await self._aembed(client, texts[lo:hi], model, sum(counts[lo:hi]), limiter, semaphore)
+            if checkpoints:
+                checkpoints.save(texts[lo:hi], vectors)
+            results[i] = vectors
+            progress.update(1)
+
+        # One async client per run: its connections belong to this event loop.
+        # Retries are handled in _aembed so backoff is shared with the rate limiter.
+        async with AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0) as client:
+            tasks = [asyncio.create_task(run(client, i)) for i in todo]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Stop issuing requests; completed batches are already checkpointed.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            finally:
+                progress.close()
+
+        if checkpoints:
+            for lo, hi in batches:
+                checkpoints.remove(texts[lo:hi])
+        return np.vstack(results)
 
-    def generate(self, texts: List[str], model: str = "text-embedding-3-small", batch_size: int = 100) -> np.ndarray:
-        vectors: List[np.ndarray] = []
-        for i in tqdm(range(0, len(texts), batch_size), desc="OpenAI embeddings"):
-            batch = texts[i:i+batch_size]
-            resp = self.client.embeddings.create(model=model, input=batch)
-            vectors.extend([np.array(it.embedding, dtype=np.float32) for it in resp.data])
-        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    async def _aembed(
+        self,
+        client: AsyncOpenAI,
+        texts: List[str],
+        model: str,
+        tokens: int,
+        limiter: RateLimiter,
+        semaphore: asyncio.Semaphore,
+    ) -> np.ndarray:
+        """One batch under the semaphore and rate limit, with timeout and retry/backoff."""
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    await limiter.acquire(tokens)
+                    resp = await asyncio.wait_for(
+                        client.embeddings.create(model=model, input=texts),
+                        timeout=self.timeout,
+                    )
+                return np.array([it.embedding for it in resp.data], dtype=np.float32)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Sleep outside the semaphore so a backing-off batch does not
+                # hold a slot; honor the server's Retry-After when it sends one.
+                delay = self.retry_backoff * (2 ** attempt)
+                delay += random.uniform(0, delay)
+                try:
+                    delay = max(delay, float(e.response.headers.get("retry-after")))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+                await asyncio.sleep(delay)
+                attempt += 1
 
     def generate_query_embedding(self, query: str, model: str = "text-embedding-3-small") -> np.ndarray:
         resp = self.client.embeddings.create(model=model, input=[query])
-        return np.array(resp.data[0].embedding, dtype=np.float32)
\ No newline at end of file
+        return np.array(resp.data[0].embedding, dtype=np.float32)
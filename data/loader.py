@@ -1,30 +1,242 @@
+import hashlib
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from tqdm import tqdm
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.document_converter import DocumentConverter, PdfFormatOption
 
-def convert_pdfs_to_markdown(pdf_dir: Path, output_dir: Path, max_resumes: int = 200) -> int:
-    output_dir.mkdir(parents=True, exist_ok=True)
-    pdf_files = list(pdf_dir.glob("*.pdf"))[:max_resumes]
-    if not pdf_files:
-        raise ValueError(f"No PDF files found in {pdf_dir}")
+MANIFEST_NAME = ".manifest.json"
+REPORT_NAME = "conversion_report.json"
+
+# Seconds past ``timeout`` before the coordinator stops waiting for a worker
+# stuck in native code (where the in-worker alarm cannot fire) and recycles the pool.
+HARD_TIMEOUT_GRACE = 30.0
+
+# Converter used by the current worker process, built once by _init_worker.
+_CONVERTER = None
+
+
+def make_docling_converter():
+    """docling ``DocumentConverter`` for digital resume PDFs."""
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
     # Resumes are digital text PDFs, not scans; OCR is unneeded and the
     # installed RapidOCR/torch build is incompatible with this docling version.
     pipeline_options = PdfPipelineOptions()
     pipeline_options.do_ocr = False
-    converter = DocumentConverter(
+    return DocumentConverter(
         format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)}
     )
-    ok, failed = 0, []
-    for pdf in tqdm(pdf_files, desc="PDF → Markdown"):
+
+
+def _init_worker(converter_factory: Callable[[], Any]):
+    global _CONVERTER
+    # Parallelism comes from the worker processes; keep each one's torch/OpenMP
+    # single-threaded (set before the converter imports them) so N workers
+    # don't oversubscribe the cores.
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    _CONVERTER = converter_factory()
+
+
+def _on_alarm(signum, frame):
+    raise TimeoutError("conversion timed out")
+
+
+def _convert_one(pdf: str, out: str, timeout: float) -> float:
+    """Convert one PDF in a worker; returns elapsed seconds."""
+    t0 = time.perf_counter()
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        md = _CONVERTER.convert(pdf).document.export_to_markdown()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    tmp = Path(out).with_suffix(".md.tmp")
+    tmp.write_text(md, encoding="utf-8")
+    os.replace(tmp, out)
+    return time.perf_counter() - t0
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path: Path, data: Any):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _kill_pool(executor: ProcessPoolExecutor):
+    # A worker stuck in native code ignores cancellation; terminate the processes.
+    for proc in list(getattr(executor, "_processes", {}).values()):
+        proc.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def convert_pdfs_to_markdown(
+    pdf_dir: Path,
+    output_dir: Path,
+    max_resumes: Optional[int] = None,
+    workers: Optional[int] = None,
+    timeout: float = 120.0,
+    force: bool = False,
+    converter_factory: Callable[[], Any] = make_docling_converter,
+) -> int:
+    """
+    Convert PDFs to Markdown in parallel, skipping PDFs converted before.
+
+    Each worker process builds one converter and converts files one at a
+    time. A content-hash manifest in ``output_dir`` records what every
+    Markdown file was converted from, so a rerun only converts new or modified
+    PDFs (unless ``force``); Markdown of PDFs that were removed is deleted.
+    Conversions longer than ``timeout`` seconds are abandoned. Failures are
+    written to ``conversion_report.json`` in ``output_dir``.
+
+    Args:
+        pdf_dir: Directory of ``*.pdf`` files
+        output_dir: Directory for ``<stem>.md`` files and the manifest
+        max_resumes: Only consider the first N PDFs (sorted by name); None for all
+        workers: Worker processes (default: CPU count)
+        timeout: Per-file conversion timeout in seconds
+        force: Reconvert every PDF regardless of the manifest
+        converter_factory: Picklable callable building a converter in each worker
+
+    Returns:
+        Number of PDFs with up-to-date Markdown (converted now or skipped as unchanged)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))[:max_resumes]
+    if not pdf_files:
+        raise ValueError(f"No PDF files found in {pdf_dir}")
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    for name in list(manifest):
+        if not (pdf_dir / name).exists():
+            (output_dir / manifest[name]["markdown"]).unlink(missing_ok=True)
+            del manifest[name]
+
+    todo: List[Tuple[Path, str]] = []
+    skipped = 0
+    for pdf in tqdm(pdf_files, desc="Hashing PDFs"):
+        digest = file_sha256(pdf)
+        entry = manifest.get(pdf.name)
+        if (not force and entry and entry["sha256"] == digest
+                and (output_dir / entry["markdown"]).exists()):
+            skipped += 1
+        else:
+            todo.append((pdf, digest))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    failures: List[Dict[str, Any]] = []
+    converted = crashes = 0
+    # (pdf, digest, isolate): isolated files run alone, to find which file
+    # crashed a worker when a pool breaks with several files in flight.
+    queue: List[Tuple[Path, str, bool]] = [(pdf, digest, False) for pdf, digest in reversed(todo)]
+    progress = tqdm(total=len(todo), desc="PDF → Markdown")
+
+    def record_failure(pdf: Path, digest: str, kind: str, error: str, elapsed: float):
+        failures.append({
+            "file": pdf.name, "sha256": digest, "kind": kind,
+            "error": error, "elapsed_s": round(elapsed, 2),
+        })
+        progress.update(1)
+
+    while queue:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(converter_factory,)
+        )
+        # At most one file per worker in flight, so submit time ~ start time
+        # and a stuck file can be identified.
+        in_flight: Dict[Future, Tuple[Path, str, bool, float]] = {}
         try:
-            result = converter.convert(str(pdf))
-            md = result.document.export_to_markdown()
-            (output_dir / f"{pdf.stem}.md").write_text(md, encoding="utf-8")
-            ok += 1
-        except Exception as e:
-            failed.append((pdf.name, str(e)))
-    if failed:
-        print(f"Failed ({len(failed)}): " + ", ".join(n for n, _ in failed[:5]) + (" ..." if len(failed) > 5 else ""))
-    return ok
\ No newline at end of file
+            while queue or in_flight:
+                while queue and len(in_flight) < workers:
+                    isolating = any(item[2] for item in in_flight.values())
+                    if in_flight and (isolating or queue[-1][2]):
+                        break
+                    pdf, digest, isolate = queue.pop()
+                    out = output_dir / f"{pdf.stem}.md"
+                    future = executor.submit(_convert_one, str(pdf), str(out), timeout)
+                    in_flight[future] = (pdf, digest, isolate, time.perf_counter())
+
+                done, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    pdf, digest, isolate, started = in_flight.pop(future)
+                    elapsed = time.perf_counter() - started
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        if isolate:
+                            record_failure(pdf, digest, "crash", "worker process died", elapsed)
+                            crashes += 1
+                            if crashes >= 3 and converted == 0:
+                                raise RuntimeError(
+                                    "Conversion workers keep dying before converting anything; "
+                                    "check the converter setup (is docling installed?)"
+                                )
+                        else:
+                            queue.append((pdf, digest, True))
+                        broken = True
+                    except TimeoutError as e:
+                        record_failure(pdf, digest, "timeout", str(e) or "timed out", elapsed)
+                    except Exception as e:
+                        record_failure(pdf, digest, "error", f"{type(e).__name__}: {e}", elapsed)
+                    else:
+                        manifest[pdf.name] = {"sha256": digest, "markdown": f"{pdf.stem}.md"}
+                        converted += 1
+                        progress.update(1)
+                        if converted % 100 == 0:
+                            _save_json(manifest_path, manifest)
+
+                now = time.perf_counter()
+                stuck = [f for f, item in in_flight.items() if now - item[3] > timeout + HARD_TIMEOUT_GRACE]
+                for future in stuck:
+                    pdf, digest, _, started = in_flight.pop(future)
+                    record_failure(pdf, digest, "timeout", "worker unresponsive", now - started)
+                if broken or stuck:
+                    # The pool is unusable; files still in flight are retried
+                    # on a fresh one (alone, if they may be the crash culprit).
+                    queue.extend((pdf, digest, broken) for pdf, digest, _, _ in in_flight.values())
+                    in_flight.clear()
+                    _kill_pool(executor)
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    progress.close()
+    _save_json(manifest_path, manifest)
+
+    report = {
+        "total": len(pdf_files),
+        "converted": converted,
+        "skipped_unchanged": skipped,
+        "failed": len(failures),
+        "failures": failures,
+    }
+    _save_json(output_dir / REPORT_NAME, report)
+    print(f"Converted {converted}, unchanged {skipped}, failed {len(failures)}")
+    if failures:
+        print(f"Failure report -> {output_dir / REPORT_NAME}")
+    return converted + skipped
@@ -0,0 +1,198 @@
+"""
+Synthetic resumes for benchmarks and tests, with no PDFs or API calls.
+
+Resumes are Markdown in the layout Docling produces (a name header, then
+``##`` container headings), so they go through the real chunker. Resume ``i``
+depends only on ``(seed, i)``, so a 10k-resume corpus is a prefix of a
+100k-resume one. ``hash_embeddings`` stands in for the embedding model: a
+text's vector is the sum of fixed pseudo-random vectors of its words, so texts
+sharing words stay close and dense retrieval still ranks meaningfully.
+"""
+import random
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .chunker import _container_chunking
+
+# role -> (titles, core skills)
+ROLES: Dict[str, Tuple[List[str], List[str]]] = {
+    "backend": (["Backend Engineer", "Software Engineer", "Java Developer", "Python Developer"],
+                ["python", "java", "spring", "django", "postgresql", "redis", "microservices", "rest", "kafka"]),
+    "frontend": (["Frontend Developer", "UI Engineer", "Web Developer"],
+                 ["react", "typescript", "javascript", "css", "html", "redux", "nextjs", "webpack"]),
+    "data": (["Data Scientist", "Machine Learning Engineer", "Data Analyst"],
+             ["python", "pandas", "sql", "pytorch", "tensorflow", "nlp", "statistics", "spark", "tableau"]),
+    "devops": (["DevOps Engineer", "Site Reliability Engineer", "Cloud Engineer"],
+               ["kubernetes", "docker", "aws", "terraform", "linux", "ansible", "prometheus", "ci/cd"]),
+    "mobile": (["Android Developer", "iOS Developer", "Mobile Engineer"],
+               ["kotlin", "swift", "android", "ios", "flutter", "firebase", "java"]),
+    "finance": (["Financial Analyst", "Accountant", "Investment Analyst"],
+                ["excel", "financial modeling", "valuation", "sap", "forecasting", "accounting", "audit"]),
+    "nursing": (["Registered Nurse", "ICU Nurse", "Clinical Nurse"],
+                ["patient care", "icu", "triage", "medication administration", "bls", "acls", "emr"]),
+    "sales": (["Sales Manager", "Account Executive", "Business Development Manager"],
+              ["b2b", "saas", "crm", "salesforce", "negotiation", "lead generation", "account management"]),
+    "design": (["Graphic Designer", "Product Designer", "UX Designer"],
+               ["photoshop", "illustrator", "figma", "ux research", "branding", "typography", "prototyping"]),
+    "pm": (["Project Manager", "Product Manager", "Scrum Master"],
+           ["agile", "scrum", "jira", "stakeholder management", "roadmapping", "pmp", "risk management"]),
+}
+COMMON_SKILLS = ["git", "communication", "teamwork", "leadership", "english", "problem solving"]
+SENIORITY = ["Junior", "", "", "Senior", "Lead", "Principal"]
+DEGREES = [
+    ("Diploma in {field}", 0.05), ("Bachelor of Science in {field}", 0.5),
+    ("Master of Science in {field}", 0.3), ("MBA", 0.1), ("PhD in {field}", 0.05),
+]
+FIELDS = ["Computer Science", "Information Technology", "Statistics", "Economics", "Nursing",
+          "Business Administration", "Electrical Engineering", "Design", "Mathematics"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises",
+             "Cyberdyne", "Soylent", "Tyrell", "Wonka", "Vandelay", "Pied Piper", "Aperture"]
+FIRST_NAMES = ["Alex", "Sam", "Priya", "Wei", "Maria", "John", "Aisha", "Carlos", "Yuki", "Olga", "Tunde", "Lena"]
+LAST_NAMES = ["Smith", "Patel", "Chen", "Garcia", "Kim", "Novak", "Okafor", "Rossi", "Sato", "Ivanova"]
+VERBS = ["Built", "Led", "Designed", "Improved", "Maintained", "Migrated", "Automated", "Delivered", "Owned"]
+OUTCOMES = ["reducing latency by {n}%", "serving {n}k users", "cutting costs by {n}%",
+            "improving accuracy by {n}%", "for {n} clients", "across {n} teams"]
+
+_TOKEN_RX = re.compile(r"\w+")
+
+
+def synthetic_resume(index: int, seed: int = 0) -> str:
+    """Markdown of synthetic resume ``index`` (deterministic in ``seed`` and ``index``)."""
+    rng = random.Random(seed * 1_000_003 + index)
+    role = rng.choice(list(ROLES))
+    titles, skills = ROLES[role]
+    title = f"{rng.choice(SENIORITY)} {rng.choice(titles)}".strip()
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    own_skills = rng.sample(skills, k=min(len(skills), rng.randint(3, 6)))
+    years = rng.randint(1, 20)
+
+    lines = [f"# {name}", f"{title} | {name.lower().replace(' ', '.')}{index}@example.com", ""]
+    lines += ["## Summary",
+              f"{title} with {years} years of experience in {', '.join(own_skills[:3])}.", ""]
+    lines.append("## Experience")
+    for _ in range(rng.randint(1, 4)):
+        lines.append(f"### {rng.choice(titles)} at {rng.choice(COMPANIES)} ({rng.randint(1, 6)} years)")
+        for _ in range(rng.randint(2, 4)):
+            outcome = rng.choice(OUTCOMES).format(n=rng.randint(5, 90))
+            lines.append(f"- {rng.choice(VERBS)} {' and '.join(rng.sample(own_skills, k=2))} systems, {outcome}")
+    lines.append("")
+    degree = rng.choices([d for d, _ in DEGREES], weights=[w for _, w in DEGREES])[0]
+    lines += ["## Education", f"{degree.format(field=rng.choice(FIELDS))}, University of {rng.choice(COMPANIES)}", ""]
+    lines += ["## Skills", ", ".join(own_skills + rng.sample(COMMON_SKILLS, k=2)), ""]
+    if rng.random() < 0.4:
+        lines += ["## Projects", f"- Open source {rng.choice(own_skills)} toolkit used by "
+                  f"{rng.randint(2, 500)} developers, written in {rng.choice(own_skills)}", ""]
+    if rng.random() < 0.3:
+        lines += ["## Certifications", f"- Certified {rng.choice(own_skills)} professional", ""]
+    return "\n".join(lines)
+
+
+def synthetic_resumes(n: int, seed: int = 0, duplicate_rate: float = 0.02) -> Iterator[Tuple[str, str]]:
+    """
+    ``(resume_id, markdown)`` of ``n`` resumes; ``duplicate_rate`` of them are
+    lightly edited re-uploads of an earlier one (as near-duplicates in real data).
+    """
+    rng = random.Random(seed)
+    for i in range(n):
+        if i and rng.random() < duplicate_rate:
+            text = synthetic_resume(rng.randrange(i), seed).replace("years of experience", "years experience")
+        else:
+            text = synthetic_resume(i, seed)
+        yield f"resume_{i:07d}", text
+
+
+def write_resumes(out_dir: Path, n: int, seed: int = 0) -> List[Path]:
+    """Write ``n`` synthetic resumes as ``<resume_id>.md`` files, the chunker's input layout."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for rid, text in synthetic_resumes(n, seed):
+        path = out_dir / f"{rid}.md"
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def synthetic_chunks(n_chunks: int, seed: int = 0) -> List[Document]:
+    """At least ``n_chunks`` chunks (whole resumes) from the real chunker."""
+    chunks: List[Document] = []
+    resumes = synthetic_resumes(1 << 62, seed)
+    while len(chunks) < n_chunks:
+        rid, text = next(resumes)
+        chunks.extend(_container_chunking(text, rid))
+    return chunks
+
+
+def _synthetic_queries(n: int, seed: int) -> Iterator[Tuple[str, Tuple[str, ...]]]:
+    """``(query, skills)``: each query asks for one or two skills of one role."""
+    rng = random.Random(seed + 7919)
+    for _ in range(n):
+        titles, skills = ROLES[rng.choice(list(ROLES))]
+        a, b = rng.sample(skills, k=2)
+        yield rng.choice([
+            (f"{rng.choice(titles).lower()} with {a} and {b} experience", (a, b)),
+            (f"{rng.choice(SENIORITY).lower()} {rng.choice(titles).lower()} {a}".replace("  ", " ").strip(), (a,)),
+            (f"{a} {b} {rng.choice(['masters', 'phd', 'bachelor', ''])}".strip(), (a, b)),
+            (f"candidates who know {a}, {b} and {rng.choice(COMMON_SKILLS)}", (a, b)),
+        ])
+
+
+def synthetic_queries(n: int, seed: int = 0) -> List[str]:
+    """Recruiter-style queries over the same roles and skills as the resumes."""
+    return [query for query, _ in _synthetic_queries(n, seed)]
+
+
+def synthetic_qrels(n_queries: int, n_resumes: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    ``synthetic_queries`` labeled against the first ``n_resumes`` resumes.
+
+    A resume's grade is how many of the query's skills its Skills section
+    lists. The records are in the format ``src.evaluation.load_qrels`` reads.
+    """
+    skills_of = {}
+    for rid, text in synthetic_resumes(n_resumes, seed):
+        section = text.split("## Skills\n", 1)[1].split("\n", 1)[0]
+        skills_of[rid] = set(section.split(", "))
+    qrels = []
+    for query, wanted in _synthetic_queries(n_queries, seed):
+        relevant = {rid: sum(s in skills for s in wanted) for rid, skills in skills_of.items()}
+        qrels.append({"query": query, "relevant": {rid: g for rid, g in relevant.items() if g}})
+    return qrels
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words embeddings: the sum of a fixed random vector per word."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._vectors: Dict[str, np.ndarray] = {}
+
+    def _word(self, word: str) -> np.ndarray:
+        v = self._vectors.get(word)
+        if v is None:
+            rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+            v = self._vectors[word] = rng.standard_normal(self.dim).astype(np.float32)
+        return v
+
+    def embed(self, texts: Sequence[str], block: int = 1024) -> np.ndarray:
+        """One row per text; texts without words get a zero vector."""
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for lo in range(0, len(texts), block):
+            words = [_TOKEN_RX.findall(t.lower()) for t in texts[lo:lo + block]]
+            flat = [self._word(w) for ws in words for w in ws]
+            if not flat:
+                continue
+            lengths = np.array([len(ws) for ws in words])
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            nonempty = lengths > 0
+            out[lo:lo + len(words)][nonempty] = np.add.reduceat(np.vstack(flat), starts[nonempty], axis=0)
+        return out
+
+
+def hash_embeddings(texts: Sequence[str], dim: int = 256) -> np.ndarray:
+    """``HashEmbedder(dim).embed(texts)``."""
+    return HashEmbedder(dim).embed(texts)
@@ -0,0 +1,59 @@
+"""
+Measure IVF recall@k and latency against exact dense search, to pick
+ANN_NPROBE / ANN_PQ_M in src/config.py with evidence.
+
+Queries are corpus embeddings with small Gaussian noise, so no API calls are
+needed.
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import CORPUS_DIR, EMBEDDINGS_PATH
+from src.retrieval.ann_index import IVFIndex, recall_at_k
+from src.retrieval.corpus_store import CorpusStore
+
+
+def load_vectors() -> np.ndarray:
+    if CorpusStore.exists(CORPUS_DIR):
+        return CorpusStore(CORPUS_DIR).embeddings
+    with open(EMBEDDINGS_PATH, "rb") as f:
+        X = pickle.load(f).astype(np.float32)
+    return X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall@k vs exact search")
+    parser.add_argument("--k", type=int, default=200, help="Recall cutoff (DENSE_TOP_K)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--noise", type=float, default=0.05, help="Query perturbation std")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default 4*sqrt(n))")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ subspaces (0 = no PQ)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    Xn = load_vectors()
+    rng = np.random.default_rng(0)
+    Q = np.asarray(Xn[rng.choice(Xn.shape[0], size=args.queries)], dtype=np.float32)
+    Q += args.noise * rng.normal(size=Q.shape).astype(np.float32) / np.sqrt(Q.shape[1])
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True)
+
+    t0 = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist, pq_m=args.pq_m).fit(Xn)
+    print(f"Built IVF over {Xn.shape[0]} vectors (nlist={index.nlist}, pq_m={args.pq_m}) "
+          f"in {time.perf_counter() - t0:.1f}s\n")
+
+    print(f"{'nprobe':>8} | {'recall@' + str(args.k):>10} | {'ms/query':>8}")
+    for row in recall_at_k(index, Xn, Q, k=args.k, nprobe_values=args.nprobe):
+        print(f"{row['nprobe']:>8} | {row['recall']:>10.4f} | {row['latency_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Resume-level candidate selection before reranking: quality/latency trade-off.
+
+Reranking every fused chunk (RERANK_TOP_K) is the reference. Each mode prunes
+the candidates to the best K resumes by aggregated fused score, and/or reranks
+in cascaded rounds, and is compared with the reference on:
+
+- pairs:   (query, chunk) pairs sent to the cross-encoder per query
+- ms/q:    reranking latency per query (best of --repeats)
+- recall:  share of the reference's top-N summarized resumes that are kept
+- top1:    whether the best resume is unchanged
+
+Candidates come from BM25 only (as in benchmark_reranker.py), so no API calls
+are needed and runs are comparable.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmark_reranker import EVAL_QUERIES, load_chunks
+from src.config import (
+    BM25_TOP_K, CASCADE_PATIENCE, CASCADE_ROUND_RESUMES, RERANK_BATCH_TOKENS, RERANK_TOP_K, RERANKER_MODEL,
+    RESUME_TOP_M, SUMMARY_TOP_N,
+)
+from src.generation.summarizer import ResumeSummarizer
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.chunk_index import ChunkIndex
+from src.retrieval.fusion import collapse_duplicates, prune_resumes, rrf_fuse_rows, rrf_hits
+from src.retrieval.reranker import CrossEncoderReranker
+
+
+def fused_candidates(chunks, chunk_index: ChunkIndex, n_candidates: int) -> List[List[Any]]:
+    bm25 = BM25Retriever()
+    bm25.fit(chunks)
+    fused = []
+    for q in EVAL_QUERIES:
+        rows, scores, per_source = rrf_fuse_rows({"bm25": bm25.search_rows(q, n_candidates)}, top_k=None)
+        fused.append(collapse_duplicates(rrf_hits(rows, scores, per_source, chunks), chunk_index.cluster_of, RERANK_TOP_K))
+    return fused
+
+
+def top_resumes(reranked, chunk_index: ChunkIndex, top_n: int) -> List[Any]:
+    return ResumeSummarizer._select(reranked, top_n, chunk_index)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume pruning and cascaded reranking trade-off")
+    parser.add_argument("--model", default=RERANKER_MODEL)
+    parser.add_argument("--candidates", type=int, default=BM25_TOP_K, help="BM25 hits per query")
+    parser.add_argument("--top-n", type=int, default=SUMMARY_TOP_N, help="Resumes that get summarized")
+    parser.add_argument("--max-batch-tokens", type=int, default=RERANK_BATCH_TOKENS)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = load_chunks()
+    chunk_index = ChunkIndex(chunks)
+    fused = fused_candidates(chunks, chunk_index, args.candidates)
+    reranker = CrossEncoderReranker(args.model, max_batch_tokens=args.max_batch_tokens)
+    print(f"Eval set: {len(fused)} queries, {sum(len(f) for f in fused)} fused chunks\n")
+
+    predict = reranker._predict
+    pairs_scored = [0]
+
+    def counting_predict(pairs):
+        pairs_scored[0] += len(pairs)
+        return predict(pairs)
+
+    reranker._predict = counting_predict
+
+    def rerank(query, hits):
+        return reranker.rerank(query, hits, chunk_index, top_k=RERANK_TOP_K)
+
+    def cascade(patience):
+        def run(query, hits):
+            return reranker.rerank_cascade(
+                query, hits, chunk_index, top_n=args.top_n, round_resumes=CASCADE_ROUND_RESUMES,
+                patience=patience, top_k=RERANK_TOP_K,
+            )
+        return run
+
+    def pruned(k, method, then=rerank):
+        return lambda query, hits: then(query, prune_resumes(hits, k, method, RESUME_TOP_M))
+
+    modes: Dict[str, Callable] = {"all chunks": rerank}
+    for k in (10, 20, 40):
+        for method in ("max", "sum"):
+            modes[f"prune {k} {method}"] = pruned(k, method)
+    modes[f"cascade p{CASCADE_PATIENCE}"] = cascade(CASCADE_PATIENCE)
+    modes[f"cascade p{CASCADE_PATIENCE + 1}"] = cascade(CASCADE_PATIENCE + 1)
+    modes["prune 20 max + cascade"] = pruned(20, "max", cascade(CASCADE_PATIENCE))
+
+    predict([(EVAL_QUERIES[0], chunks[0].page_content)])  # warm-up
+    reference = None
+    print(f"{'mode':>24} | {'pairs':>6} | {'ms/q':>7} | {'speedup':>7} | {'recall':>6} | {'top1':>5}")
+    for name, run in modes.items():
+        best = float("inf")
+        for _ in range(args.repeats):
+            pairs_scored[0] = 0
+            t0 = time.perf_counter()
+            tops = [top_resumes(run(q, hits), chunk_index, args.top_n) for q, hits in zip(EVAL_QUERIES, fused)]
+            best = min(best, time.perf_counter() - t0)
+        if reference is None:
+            reference, ref_time = tops, best
+        recall = np.mean([len(set(r) & set(t)) / max(len(r), 1) for r, t in zip(reference, tops)])
+        top1 = np.mean([r[:1] == t[:1] for r, t in zip(reference, tops)])
+        print(f"{name:>24} | {pairs_scored[0] / len(fused):>6.0f} | {best / len(fused) * 1000:>7.1f} | "
+              f"{ref_time / best:>6.2f}x | {recall:>6.2f} | {top1:>5.2f}")
+
+
+if __name__ == "__main__":
+    main()
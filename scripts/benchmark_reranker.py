@@ -0,0 +1,130 @@
+"""
+Compare cross-encoder reranker backends: rank-order parity with the torch path
+and throughput (pairs/sec) for torch with fixed-size batches (the reference),
+and torch, ONNX FP32 and ONNX INT8 with length-bucketed batching.
+
+The eval set is fixed: each query below is paired with its top BM25 candidates
+from the corpus, so no API calls are needed and runs are comparable.
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import (
+    CHUNKS_PATH, CORPUS_DIR, ONNX_DIR, RERANK_BATCH_TOKENS, RERANK_TOP_K, RERANKER_MODEL,
+)
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.reranker import CrossEncoderReranker
+
+EVAL_QUERIES = [
+    "python developer with machine learning experience",
+    "senior java backend engineer spring microservices",
+    "data scientist with nlp and deep learning",
+    "devops engineer kubernetes docker aws",
+    "frontend developer react typescript",
+    "project manager agile scrum certification",
+    "financial analyst excel modeling",
+    "registered nurse icu experience",
+    "sales manager b2b saas",
+    "android developer kotlin",
+    "sql database administrator oracle",
+    "graphic designer adobe photoshop illustrator",
+]
+
+
+def load_chunks():
+    if CorpusStore.exists(CORPUS_DIR):
+        return CorpusStore(CORPUS_DIR).chunks()
+    with open(CHUNKS_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+def eval_pairs(chunks, n_candidates: int) -> List[List[Tuple[str, str]]]:
+    bm25 = BM25Retriever()
+    bm25.fit(chunks)
+    sets = []
+    for q in EVAL_QUERIES:
+        hits = bm25.bm25.top_k(bm25.clean_and_tokenize(q), n_candidates)[0]
+        sets.append([(q, chunks[int(i)].page_content) for i in hits])
+    return sets
+
+
+def rank_agreement(ref: np.ndarray, other: np.ndarray, top: int = 10) -> Dict[str, float]:
+    """Spearman correlation of the two orderings, top-N overlap and top-1 match."""
+    ref_order, other_order = np.argsort(-ref, kind="stable"), np.argsort(-other, kind="stable")
+    ref_rank, other_rank = np.empty(len(ref)), np.empty(len(ref))
+    ref_rank[ref_order] = np.arange(len(ref))
+    other_rank[other_order] = np.arange(len(ref))
+    spearman = float(np.corrcoef(ref_rank, other_rank)[0, 1]) if len(ref) > 1 else 1.0
+    top = min(top, len(ref))
+    overlap = len(set(ref_order[:top].tolist()) & set(other_order[:top].tolist())) / max(top, 1)
+    return {"spearman": spearman, "top_overlap": overlap, "top1": float(ref_order[0] == other_order[0])}
+
+
+def run(reranker: CrossEncoderReranker, sets, repeats: int) -> Tuple[List[np.ndarray], float]:
+    """Scores per query set and pairs/sec (best of ``repeats``, after one warm-up set)."""
+    reranker._predict(sets[0][:reranker.batch_size])
+    best, scores = float("inf"), []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        scores = [np.asarray(reranker._predict(s)) for s in sets]
+        best = min(best, time.perf_counter() - t0)
+    return scores, sum(len(s) for s in sets) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reranker backend parity and throughput")
+    parser.add_argument("--model", default=RERANKER_MODEL)
+    parser.add_argument("--candidates", type=int, default=RERANK_TOP_K, help="Pairs per query")
+    parser.add_argument("--batch-size", type=int, default=32, help="Fixed batch size of the reference")
+    parser.add_argument("--max-batch-tokens", type=int, default=RERANK_BATCH_TOKENS, help="Padded-token budget per batch")
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--onnx-dir", default=str(ONNX_DIR))
+    parser.add_argument("--min-spearman", type=float, default=0.95,
+                        help="Exit non-zero if any ONNX backend's mean Spearman falls below this")
+    args = parser.parse_args()
+
+    sets = eval_pairs(load_chunks(), args.candidates)
+    print(f"Eval set: {len(sets)} queries, {sum(len(s) for s in sets)} pairs\n")
+
+    onnx = dict(backend="onnx", onnx_dir=args.onnx_dir, onnx_threads=args.threads)
+    backends = {
+        "torch-fixed": dict(backend="torch", max_batch_tokens=None),
+        "torch": dict(backend="torch", max_batch_tokens=args.max_batch_tokens),
+        "onnx-fp32": dict(onnx, onnx_quantize=False, max_batch_tokens=args.max_batch_tokens),
+        "onnx-int8": dict(onnx, onnx_quantize=True, max_batch_tokens=args.max_batch_tokens),
+    }
+    results = {}
+    for name, kwargs in backends.items():
+        reranker = CrossEncoderReranker(args.model, batch_size=args.batch_size, **kwargs)
+        results[name] = run(reranker, sets, args.repeats)
+
+    ref_scores, ref_rate = results["torch-fixed"]
+    print(f"{'backend':>11} | {'pairs/s':>9} | {'speedup':>7} | {'spearman':>8} | {'top10':>6} | {'top1':>5} | {'max|d|':>8}")
+    failed = False
+    for name, (scores, rate) in results.items():
+        agree = [rank_agreement(r, s) for r, s in zip(ref_scores, scores)]
+        spearman = float(np.mean([a["spearman"] for a in agree]))
+        max_diff = max(float(np.abs(r - s).max()) for r, s in zip(ref_scores, scores) if len(r))
+        print(f"{name:>11} | {rate:>9.1f} | {rate / ref_rate:>6.2f}x | {spearman:>8.4f} | "
+              f"{np.mean([a['top_overlap'] for a in agree]):>6.2f} | "
+              f"{np.mean([a['top1'] for a in agree]):>5.2f} | {max_diff:>8.4f}")
+        failed |= name.startswith("onnx") and spearman < args.min_spearman
+
+    if failed:
+        print(f"\nRank parity below {args.min_spearman} Spearman; keep RERANKER_BACKEND = \"torch\"")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
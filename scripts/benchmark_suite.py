@@ -0,0 +1,491 @@
+"""
+Reproducible benchmark suite on a synthetic resume corpus (data/synthetic.py).
+
+    python scripts/benchmark_suite.py --chunks 100000 --out bench.json
+    python scripts/benchmark_suite.py --compare base.json bench.json
+
+Builds a corpus store of synthetic resumes with deterministic hash embeddings
+(once per --chunks/--seed/--dim, cached under BENCH_DIR), then measures:
+
+- build:       generation, chunking, dedup, embedding and store/BM25 build time
+- startup.*:   cold start in fresh processes (--startup-runs): importing
+               src.pipeline, constructing it, the first retrieval, warmup()
+               and the first full search
+- stage.*:     per-query latency of chunking (per resume), BM25, exact and
+               batched dense search, IVF search (--ann), fusion and
+               cross-encoder reranking, each in isolation
+- e2e.*:       ResumeRAGPipeline.search, search_many and concurrent asearch
+               with the OpenAI clients replaced by an in-process stub
+               (--embed-latency-ms, --llm-latency-ms), so no key or network
+               is needed; ``breakdown`` is the mean per-stage time from the
+               queries' traces
+
+Latencies are p50/p95/p99/mean in ms, with QPS. Results are written as JSON
+together with the environment (git commit, library versions, CPU count), and
+``--compare`` prints the change between two result files, exiting non-zero
+when a p50 or p95 latency regressed by more than --threshold.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from data.chunker import _container_chunking, assign_clusters
+from data.dedup import NearDuplicateIndex
+from data.synthetic import HashEmbedder, synthetic_queries, synthetic_resumes
+from src.config import (
+    ANN_NPROBE, BENCH_DIR, BM25_TOP_K, DENSE_TOP_K, RERANK_TOP_K, RERANKER_MODEL, SUMMARY_TOP_N,
+)
+from src.pipeline import ResumeRAGPipeline
+from src.retrieval.ann_index import IVFIndex
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.corpus_store import CorpusStore
+
+SCHEMA_VERSION = 1
+
+
+class StubOpenAI:
+    """
+    In-process stand-in for the ``OpenAI`` client: ``HashEmbedder`` embeddings
+    and a canned summary, each after a fixed latency.
+    """
+
+    def __init__(self, embedder: HashEmbedder, embed_latency: float = 0.0, llm_latency: float = 0.0):
+        self.embedder = embedder
+        self.embed_latency = embed_latency
+        self.llm_latency = llm_latency
+        self.embeddings = types.SimpleNamespace(create=self._embed)
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._complete))
+
+    def _embedding_response(self, inputs: Sequence[str]) -> Any:
+        X = self.embedder.embed(list(inputs))
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=x) for x in X],
+            usage=types.SimpleNamespace(prompt_tokens=sum(len(t) // 4 for t in inputs), completion_tokens=0),
+        )
+
+    @staticmethod
+    def _summary(messages: List[Dict[str, str]]) -> str:
+        return f"Synthetic summary of a {len(messages[-1]['content'])}-character prompt."
+
+    @staticmethod
+    def _usage(messages: List[Dict[str, str]], content: str) -> Any:
+        return types.SimpleNamespace(
+            prompt_tokens=len(messages[-1]["content"]) // 4, completion_tokens=len(content) // 4
+        )
+
+    def _response(self, messages: List[Dict[str, str]]) -> Any:
+        content = self._summary(messages)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))],
+            usage=self._usage(messages, content),
+        )
+
+    def _chunks(self, messages: List[Dict[str, str]]) -> List[Any]:
+        content = self._summary(messages)
+        words = content.split(" ")
+        return [
+            types.SimpleNamespace(choices=[types.SimpleNamespace(
+                delta=types.SimpleNamespace(content=word if i == 0 else " " + word)
+            )])
+            for i, word in enumerate(words)
+        ]
+
+    def _embed(self, model: str, input: Sequence[str], **kwargs: Any) -> Any:
+        time.sleep(self.embed_latency)
+        return self._embedding_response(input)
+
+    def _complete(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any) -> Any:
+        time.sleep(self.llm_latency)
+        return iter(self._chunks(messages)) if stream else self._response(messages)
+
+
+class AsyncStubOpenAI(StubOpenAI):
+    """``StubOpenAI`` with the ``AsyncOpenAI`` interface."""
+
+    async def _embed(self, model: str, input: Sequence[str], **kwargs: Any) -> Any:
+        await asyncio.sleep(self.embed_latency)
+        return self._embedding_response(input)
+
+    async def _complete(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any) -> Any:
+        await asyncio.sleep(self.llm_latency)
+        if not stream:
+            return self._response(messages)
+
+        async def chunks():
+            for chunk in self._chunks(messages):
+                yield chunk
+        return chunks()
+
+
+def latency_stats(seconds: Sequence[float], wall: float = None) -> Dict[str, float]:
+    """Percentiles and mean in ms; QPS over ``wall`` seconds (default: their sum, i.e. run serially)."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    wall = float(ms.sum() / 1000) if wall is None else wall
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "qps": round(len(ms) / wall, 2) if wall > 0 else None,
+    }
+
+
+def timed(fn: Callable[[Any], Any], items: Sequence[Any], warmup: int) -> List[float]:
+    """Per-item latency of ``fn`` (the first ``warmup`` items run unrecorded)."""
+    for item in items[:warmup]:
+        fn(item)
+    seconds = []
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        seconds.append(time.perf_counter() - t0)
+    return seconds
+
+
+def build_corpus(path: Path, n_chunks: int, seed: int, embedder: HashEmbedder) -> Dict[str, Any]:
+    """Write the synthetic corpus store at ``path`` (if not already there); returns its build statistics."""
+    stats_path = path / "build.json"
+    if CorpusStore.exists(path / "corpus") and stats_path.exists():
+        return {**json.loads(stats_path.read_text()), "cached": True}
+
+    stats: Dict[str, Any] = {"generate_s": 0.0, "chunk_s": 0.0}
+    chunks, n_resumes = [], 0
+    resumes = synthetic_resumes(1 << 62, seed)
+    while len(chunks) < n_chunks:
+        t0 = time.perf_counter()
+        rid, text = next(resumes)
+        t1 = time.perf_counter()
+        chunks.extend(_container_chunking(text, rid))
+        stats["generate_s"] += t1 - t0
+        stats["chunk_s"] += time.perf_counter() - t1
+        n_resumes += 1
+
+    t0 = time.perf_counter()
+    duplicates = assign_clusters(chunks, NearDuplicateIndex())
+    stats["dedup_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    X = embedder.embed([c.page_content for c in chunks])
+    stats["embed_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+    store = CorpusStore.write(
+        path / "corpus", chunks, X, embedding_model=f"hash-{embedder.dim}", bm25_index=BM25Index().fit(tokens),
+    )
+    stats["index_s"] = time.perf_counter() - t0
+
+    stats = {k: round(v, 3) for k, v in stats.items()}
+    stats.update(n_resumes=n_resumes, n_chunks=len(chunks), n_vectors=store.n_vectors,
+                 near_duplicates=duplicates, dim=embedder.dim, seed=seed)
+    stats_path.write_text(json.dumps(stats, indent=2))
+    return {**stats, "cached": False}
+
+
+def use_stub_clients(pipeline: ResumeRAGPipeline, embedder: HashEmbedder, embed_latency: float, llm_latency: float):
+    """Send the pipeline's embedding and chat requests to the in-process stubs, with no query cache."""
+    pipeline.dense.client = StubOpenAI(embedder, embed_latency, llm_latency)
+    pipeline.dense.aclient = AsyncStubOpenAI(embedder, embed_latency, llm_latency)
+    pipeline.summarizer.client = pipeline.dense.client
+    pipeline.summarizer.aclient = pipeline.dense.aclient
+    pipeline.dense.query_cache = None
+
+
+def load_pipeline(corpus_dir: Path, args: argparse.Namespace, embedder: HashEmbedder) -> ResumeRAGPipeline:
+    """Pipeline over the synthetic store with stub OpenAI clients and no (persistent) caches."""
+    pipeline = ResumeRAGPipeline(
+        api_key="stub", corpus_dir=str(corpus_dir), shards_dir=str(corpus_dir / "no-shards"),
+        reranker_model=args.reranker, verbose=False, query_cache_path=None, score_cache_path=None,
+    )
+    use_stub_clients(pipeline, embedder, args.embed_latency_ms / 1000, args.llm_latency_ms / 1000)
+    # Cached scores would make every run after the first faster than the last.
+    pipeline.reranker.score_cache = None
+    return pipeline
+
+
+# Run in a fresh interpreter per sample: argv = project root, corpus dir, reranker, query, dim.
+STARTUP_PROBE = """
+import json, sys, time
+sys.path[:0] = [sys.argv[1], sys.argv[1] + "/scripts"]
+t0 = time.perf_counter()
+from src.pipeline import ResumeRAGPipeline
+t1 = time.perf_counter()
+pipeline = ResumeRAGPipeline(api_key="stub", corpus_dir=sys.argv[2], shards_dir=sys.argv[2] + "/no-shards",
+                             reranker_model=sys.argv[3], verbose=False, query_cache_path=None,
+                             score_cache_path=None)
+t2 = time.perf_counter()
+from benchmark_suite import HashEmbedder, use_stub_clients
+use_stub_clients(pipeline, HashEmbedder(int(sys.argv[5])), 0.0, 0.0)
+t3 = time.perf_counter()
+bm25, dense, _ = pipeline._snapshot()
+bm25.search_rows(sys.argv[4], top_k=10)
+dense.search_rows(sys.argv[4], top_k=10)
+t4 = time.perf_counter()
+pipeline.warmup()
+pipeline.reranker.score_cache = None
+t5 = time.perf_counter()
+pipeline.search(sys.argv[4])
+t6 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "ready": t2 - t1, "retrieve": t4 - t3, "warmup": t5 - t4,
+                  "search": t6 - t5}))
+"""
+
+
+def startup_benchmarks(corpus_dir: Path, query: str, args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """
+    Cold start, one fresh interpreter per sample: importing ``src.pipeline``
+    (``import``), constructing the pipeline (``ready``), the first BM25 + dense
+    retrieval (``retrieve``), ``warmup()`` (cross-encoder load) and the first
+    full ``search``.
+    """
+    samples: Dict[str, List[float]] = {}
+    for _ in range(args.startup_runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE, str(project_root), str(corpus_dir), args.reranker, query,
+             str(args.dim)],
+            capture_output=True, text=True, check=True,
+        )
+        for phase, seconds in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    return {f"startup.{phase}": latency_stats(seconds) for phase, seconds in samples.items()}
+
+
+def stage_benchmarks(
+    pipeline: ResumeRAGPipeline, queries: List[str], embedder: HashEmbedder, args: argparse.Namespace
+) -> Dict[str, Dict[str, float]]:
+    bm25, dense, chunk_index = pipeline._snapshot()
+    Q = embedder.embed(queries)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12
+    items = list(range(len(queries)))
+    results = {}
+
+    sample = [text for _, text in synthetic_resumes(min(500, len(queries) * 5), args.seed + 1)]
+    results["stage.chunk"] = latency_stats(timed(lambda text: _container_chunking(text, "r"), sample, args.warmup))
+
+    results["stage.bm25"] = latency_stats(
+        timed(lambda i: bm25.search_rows(queries[i], BM25_TOP_K), items, args.warmup))
+    exact = copy.copy(dense)
+    exact.ann = None
+    results["stage.dense"] = latency_stats(timed(lambda i: exact._top_k(Q[i], DENSE_TOP_K, exact=True), items, args.warmup))
+
+    batches = [Q[lo:lo + args.batch_size] for lo in range(0, len(Q), args.batch_size)]
+    seconds = timed(lambda B: exact.search_vectors(B, DENSE_TOP_K, exact=True), batches, min(args.warmup, 1))
+    # Per query: each batch's time spread over its queries.
+    results["stage.dense_batch"] = latency_stats(
+        [s / len(B) for s, B in zip(seconds, batches) for _ in range(len(B))], wall=sum(seconds)
+    )
+
+    if args.ann:
+        t0 = time.perf_counter()
+        ivf = copy.copy(exact)
+        ivf.use_ann(IVFIndex(nprobe=ANN_NPROBE).fit(exact.Xn))
+        build = time.perf_counter() - t0
+        results["stage.dense_ivf"] = {
+            **latency_stats(timed(lambda i: ivf._top_k(Q[i], DENSE_TOP_K), items, args.warmup)),
+            "build_s": round(build, 3),
+        }
+
+    hits = [(bm25.search_rows(q, BM25_TOP_K), exact._top_k(Q[i], DENSE_TOP_K, exact=True)) for i, q in enumerate(queries)]
+    results["stage.fuse"] = latency_stats(
+        timed(lambda i: pipeline._fuse(*hits[i], RERANK_TOP_K, chunk_index), items, args.warmup))
+
+    fused = [pipeline._fuse(*h, RERANK_TOP_K, chunk_index) for h in hits]
+    rerank_items = items[:args.rerank_queries]
+    results["stage.rerank"] = {
+        **latency_stats(timed(
+            lambda i: pipeline._rerank(queries[i], fused[i], chunk_index, RERANK_TOP_K, SUMMARY_TOP_N),
+            rerank_items, min(args.warmup, len(rerank_items)),
+        )),
+        "pairs_per_query": round(float(np.mean([len(fused[i]) for i in rerank_items])), 1),
+    }
+    return results
+
+
+def end_to_end_benchmarks(
+    pipeline: ResumeRAGPipeline, queries: List[str], args: argparse.Namespace
+) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    breakdown: Dict[str, List[float]] = {}
+
+    def search(query: str):
+        for result in pipeline.search(query)[:1]:
+            for name, ms in result.get("trace", {}).get("stages", {}).items():
+                breakdown.setdefault(name, []).append(ms)
+
+    for query in queries[:args.warmup]:
+        pipeline.search(query)
+    breakdown.clear()
+    t0 = time.perf_counter()
+    seconds = timed(search, queries, 0)
+    results["e2e.search"] = {
+        **latency_stats(seconds, wall=time.perf_counter() - t0),
+        "breakdown_ms": {name: round(float(np.mean(ms)), 3) for name, ms in breakdown.items()},
+    }
+
+    # Each query in a batch waits for the whole batch: its latency is the batch's.
+    batches = [queries[lo:lo + args.batch_size] for lo in range(0, len(queries), args.batch_size)]
+    seconds = timed(pipeline.search_many, batches, 0)
+    results["e2e.search_many"] = {
+        **latency_stats([s for s, b in zip(seconds, batches) for _ in b], wall=sum(seconds)),
+        "batch_size": args.batch_size,
+    }
+
+    async def concurrent() -> List[float]:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(query: str) -> float:
+            async with semaphore:
+                t0 = time.perf_counter()
+                await pipeline.asearch(query)
+                return time.perf_counter() - t0
+        return await asyncio.gather(*(one(q) for q in queries))
+
+    t0 = time.perf_counter()
+    seconds = asyncio.run(concurrent())
+    results["e2e.asearch"] = {
+        **latency_stats(seconds, wall=time.perf_counter() - t0),
+        "concurrency": args.concurrency,
+    }
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=project_root,
+            capture_output=True, text=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    import torch
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'benchmark':>18} | {'n':>5} | {'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | {'QPS':>9}")
+    for name, r in results.items():
+        qps = f"{r['qps']:>9.1f}" if r.get("qps") is not None else f"{'-':>9}"
+        print(f"{name:>18} | {r['n']:>5} | {r['p50_ms']:>9.3f} | {r['p95_ms']:>9.3f} | {r['p99_ms']:>9.3f} | {qps}")
+
+
+def compare(base_path: Path, new_path: Path, threshold: float) -> int:
+    """Print the change of every shared benchmark; returns the number of regressions."""
+    base, new = json.loads(base_path.read_text()), json.loads(new_path.read_text())
+    for key in ("n_chunks", "dim", "seed"):
+        if base["corpus"].get(key) != new["corpus"].get(key):
+            print(f"warning: corpus {key} differs ({base['corpus'].get(key)} vs {new['corpus'].get(key)})")
+    for key in ("cpu_count", "platform"):
+        if base["env"].get(key) != new["env"].get(key):
+            print(f"warning: {key} differs ({base['env'].get(key)} vs {new['env'].get(key)})")
+    print(f"{base['env'].get('git_commit')} -> {new['env'].get('git_commit')}\n")
+
+    print(f"{'benchmark':>18} | {'p50 ms':>19} | {'change':>7} | {'p95 ms':>19} | {'change':>7}")
+    regressions = 0
+    for name in base["results"]:
+        if name not in new["results"]:
+            continue
+        old, cur = base["results"][name], new["results"][name]
+        cells, flag = [], ""
+        for metric in ("p50_ms", "p95_ms"):
+            change = cur[metric] / old[metric] - 1 if old[metric] else 0.0
+            if change > threshold:
+                flag = "  REGRESSION"
+            cells.append(f"{old[metric]:>8.3f} -> {cur[metric]:>8.3f} | {change:>+7.1%}")
+        regressions += bool(flag)
+        print(f"{name:>18} | {' | '.join(cells)}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite on a synthetic resume corpus")
+    parser.add_argument("--chunks", type=int, default=10_000, help="Corpus size in chunks (1k to 1M)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--reranker", default=RERANKER_MODEL, help="Cross-encoder name or local path")
+    parser.add_argument("--rerank-queries", type=int, default=50, help="Queries for the rerank stage benchmark")
+    parser.add_argument("--batch-size", type=int, default=16, help="Queries per search_many / dense batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent asearch calls")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Stub embedding API latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Stub chat completion latency")
+    parser.add_argument("--ann", action="store_true", help="Also benchmark IVF dense search")
+    parser.add_argument("--skip-e2e", action="store_true", help="Stage benchmarks only")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--startup-runs", type=int, default=3, help="Fresh processes for the startup benchmark (0: skip)")
+    parser.add_argument("--workdir", type=Path, default=BENCH_DIR)
+    parser.add_argument("--out", type=Path, help="Results JSON (default: <workdir>/results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("BASE", "NEW"), help="Compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    embedder = HashEmbedder(args.dim)
+    corpus_path = args.workdir / f"synthetic-{args.chunks}-s{args.seed}-d{args.dim}"
+    print(f"Corpus: {corpus_path}")
+    corpus = build_corpus(corpus_path, args.chunks, args.seed, embedder)
+    print(f"{corpus['n_chunks']} chunks of {corpus['n_resumes']} resumes"
+          f"{' (cached)' if corpus['cached'] else ''}")
+
+    queries = synthetic_queries(args.queries, args.seed)
+    results = startup_benchmarks(corpus_path / "corpus", queries[0], args) if args.startup_runs else {}
+    pipeline = load_pipeline(corpus_path / "corpus", args, embedder)
+    results.update(stage_benchmarks(pipeline, queries, embedder, args))
+    if not args.skip_e2e:
+        results.update(end_to_end_benchmarks(pipeline, queries, args))
+    pipeline.close()
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "env": environment(),
+        "params": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k != "compare"},
+        "config": {"bm25_top_k": BM25_TOP_K, "dense_top_k": DENSE_TOP_K, "rerank_top_k": RERANK_TOP_K,
+                   "summary_top_n": SUMMARY_TOP_N},
+        "corpus": corpus,
+        "results": results,
+    }
+    print()
+    print_results(results)
+    if "e2e.search" in results:
+        print("\nsearch breakdown (mean ms):",
+              ", ".join(f"{k}={v:.2f}" for k, v in results["e2e.search"]["breakdown_ms"].items()))
+
+    out = args.out or args.workdir / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nResults -> {out}")
+
+
+if __name__ == "__main__":
+    main()
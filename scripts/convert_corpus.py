@@ -0,0 +1,36 @@
+"""
+Convert the chunk/embedding pickles into a memory-mapped corpus store
+(text arena, columnar metadata, float32 embeddings and BM25 postings).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import CHUNKS_PATH, CORPUS_DIR, EMBEDDING_MODEL, EMBEDDINGS_PATH
+from src.retrieval.corpus_store import CorpusStore, convert_pickles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickles to a corpus store")
+    parser.add_argument("--chunks", type=Path, default=CHUNKS_PATH, help="Chunks pickle")
+    parser.add_argument("--embeddings", type=Path, default=EMBEDDINGS_PATH, help="Embeddings pickle")
+    parser.add_argument("--out", type=Path, default=CORPUS_DIR, help="Output store directory")
+    parser.add_argument("--model", type=str, default=EMBEDDING_MODEL, help="Embedding model name")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    store = convert_pickles(args.chunks, args.embeddings, args.out, embedding_model=args.model)
+    print(f"Wrote {store.n_chunks} chunks -> {args.out} in {time.perf_counter() - t0:.1f}s")
+    print(f"{store.n_vectors} distinct vectors ({store.duplication_rate:.1%} of chunks are duplicates)")
+
+    t0 = time.perf_counter()
+    CorpusStore(args.out).bm25_index()
+    print(f"Store opens in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Sweep retrieval parameters and pick the cheapest configuration that meets a
+quality target (see src/evaluation.py).
+
+    python scripts/evaluate_retrieval.py --qrels labels.jsonl --target 0.8
+    python scripts/evaluate_retrieval.py --synthetic 10000 --rerank-top-k 30 60 180
+
+Labeled queries come from ``--qrels`` (JSONL, searched against the
+configured corpus) or are generated with a synthetic corpus
+(``--synthetic N_CHUNKS``, as in benchmark_suite.py: no PDFs or API key).
+Every combination of the given parameter values is evaluated; the table
+lists each configuration's quality and latency, ``*`` marks the Pareto
+frontier of --metric against --cost, and the cheapest frontier
+configuration reaching --target is printed last.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmark_suite import build_corpus, load_pipeline
+from data.synthetic import HashEmbedder, synthetic_qrels
+from src.config import (
+    BENCH_DIR, BM25_TOP_K, DENSE_TOP_K, RERANK_TOP_K, RERANKER_MODEL, RRF_K, RRF_WEIGHTS, SUMMARY_TOP_N,
+)
+from src.evaluation import cheapest, labeled_query, load_qrels, metric, parameter_grid, pareto_frontier, sweep
+from src.pipeline import ResumeRAGPipeline
+
+
+def parse_weights(value: str):
+    """``"2:1"`` -> ``{"bm25": 2.0, "dense": 1.0}``"""
+    bm25, dense = value.split(":")
+    return {"bm25": float(bm25), "dense": float(dense)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality vs latency parameter sweep")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--qrels", type=Path, help="Labeled queries (JSONL)")
+    source.add_argument("--synthetic", type=int, metavar="N_CHUNKS", help="Generate a labeled synthetic corpus")
+    parser.add_argument("--queries", type=int, default=50, help="Labeled queries (--synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=256, help="Fake embedding dimension (--synthetic)")
+    parser.add_argument("--reranker", default=RERANKER_MODEL, help="Cross-encoder name or local path")
+    parser.add_argument("--bm25-top-k", type=int, nargs="+", default=[BM25_TOP_K])
+    parser.add_argument("--dense-top-k", type=int, nargs="+", default=[DENSE_TOP_K])
+    parser.add_argument("--rerank-top-k", type=int, nargs="+", default=[RERANK_TOP_K])
+    parser.add_argument("--rrf-k", type=int, nargs="+", default=[RRF_K])
+    parser.add_argument("--rrf-weights", type=parse_weights, nargs="+", default=[RRF_WEIGHTS],
+                        help="BM25:dense weights, e.g. 2:1 1:1")
+    parser.add_argument("--ks", type=int, nargs="+", default=[10, 50], help="Cutoffs for recall@k and nDCG@k")
+    parser.add_argument("--metric", default="resume.ndcg@10", help="Quality metric of the frontier")
+    parser.add_argument("--cost", default="p95_ms", help="Cost of the frontier: p50_ms, p95_ms, mean_ms or a counter")
+    parser.add_argument("--target", type=float, help="Quality the chosen configuration must reach")
+    parser.add_argument("--workdir", type=Path, default=BENCH_DIR)
+    parser.add_argument("--out", type=Path, help="Write every row and the frontier as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        embedder = HashEmbedder(args.dim)
+        corpus_path = args.workdir / f"synthetic-{args.synthetic}-s{args.seed}-d{args.dim}"
+        corpus = build_corpus(corpus_path, args.synthetic, args.seed, embedder)
+        args.embed_latency_ms = args.llm_latency_ms = 0.0
+        pipeline = load_pipeline(corpus_path / "corpus", args, embedder)
+        labeled = [labeled_query(q["query"], q["relevant"])
+                   for q in synthetic_qrels(args.queries, corpus["n_resumes"], args.seed)]
+    else:
+        # The sweep replaces both caches (see evaluation_caches); don't open the shared files.
+        pipeline = ResumeRAGPipeline(
+            reranker_model=args.reranker, verbose=False, query_cache_path=None, score_cache_path=None,
+        )
+        labeled = load_qrels(args.qrels)
+
+    configs = parameter_grid(
+        bm25_top_k=args.bm25_top_k, dense_top_k=args.dense_top_k, top_k_rerank=args.rerank_top_k,
+        rrf_k=args.rrf_k, rrf_weights=args.rrf_weights,
+    )
+    print(f"Evaluating {len(configs)} configurations on {len(labeled)} queries\n")
+    rows = sweep(pipeline, labeled, configs, ks=args.ks, top_n=SUMMARY_TOP_N)
+    pipeline.close()
+
+    frontier = pareto_frontier(rows, args.metric, args.cost)
+    on_frontier = {id(row) for row in frontier}
+    k = args.ks[0]
+    columns = [args.metric, f"chunk.recall@{k}", f"resume.recall@{k}", "resume.mrr", args.cost, "cross_encoder_pairs"]
+    columns = list(dict.fromkeys(columns))
+    print(f"  {'bm25':>5} {'dense':>5} {'rerank':>6} {'rrf_k':>5} {'weights':>8} | "
+          + " | ".join(f"{c:>17}" for c in columns))
+    for row in sorted(rows, key=lambda r: metric(r, args.cost)):
+        c = row["config"]
+        weights = f"{c['rrf_weights'].get('bm25', 1.0):g}:{c['rrf_weights'].get('dense', 1.0):g}"
+        cells = [f"{row['counters'].get(name, 0.0) if name == 'cross_encoder_pairs' else metric(row, name):>17.4g}"
+                 for name in columns]
+        print(f"{'*' if id(row) in on_frontier else ' '} {c['bm25_top_k']:>5} {c['dense_top_k']:>5} "
+              f"{c['top_k_rerank']:>6} {c['rrf_k']:>5} {weights:>8} | " + " | ".join(cells))
+
+    if args.target is not None:
+        choice = cheapest(rows, args.target, args.metric, args.cost)
+        if choice is None:
+            print(f"\nNo configuration reaches {args.metric} >= {args.target}")
+        else:
+            print(f"\nCheapest with {args.metric} >= {args.target}: {json.dumps(choice['config'])} "
+                  f"({args.metric}={metric(choice, args.metric):.4f}, {args.cost}={metric(choice, args.cost):.4g})")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps({
+            "metric": args.metric, "cost": args.cost, "target": args.target,
+            "rows": rows, "frontier": [row["config"] for row in frontier],
+        }, indent=2))
+        print(f"Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import sys
 import os
 import pickle
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 project_root = Path(__file__).parent.parent
@@ -13,7 +14,10 @@ sys.path.insert(0, str(project_root))
 
 from data.loader import convert_pdfs_to_markdown
 from data.chunker import chunk_markdown_files
-from data.embed import EmbeddingGenerator
+from data.embed import EmbeddingGenerator, EmbeddingStore
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.corpus_store import CorpusStore
 
 load_dotenv()
 API_KEY = os.getenv("OPENAI_API_KEY")
@@ -28,18 +32,33 @@ EMBEDDINGS_DIR = project_root / "data" / "processed" / "embeddings"
 
 CHUNKS_PATH = CHUNKS_DIR / "resume_chunks_openai.pkl"
 EMBEDDINGS_PATH = EMBEDDINGS_DIR / "resume_embeddings_openai.pkl"
+CORPUS_DIR = project_root / "data" / "processed" / "corpus"
+CHECKPOINT_DIR = EMBEDDINGS_DIR / "checkpoints"
+# Content-addressed: reruns only pay for chunk texts not embedded before.
+EMBEDDING_STORE_PATH = EMBEDDINGS_DIR / "embedding_store.sqlite"
 
 # Create directories
 MARKDOWN_DIR.mkdir(parents=True, exist_ok=True)
 CHUNKS_DIR.mkdir(parents=True, exist_ok=True)
 EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
 
-def main(max_resumes: int = 200):
+def main(
+    max_resumes: Optional[int] = None,
+    workers: Optional[int] = None,
+    timeout: float = 120.0,
+    force: bool = False,
+    concurrency: int = 4,
+    rpm: Optional[float] = 3000,
+    tpm: Optional[float] = 1_000_000,
+):
     print("STEP 1: Converting PDFs to Markdown")
-    converted = convert_pdfs_to_markdown(PDF_DIR, MARKDOWN_DIR, max_resumes=max_resumes)
+    converted = convert_pdfs_to_markdown(
+        PDF_DIR, MARKDOWN_DIR,
+        max_resumes=max_resumes, workers=workers, timeout=timeout, force=force,
+    )
     if converted == 0:
         raise RuntimeError("No PDFs converted")
-    print(f"Converted {converted} PDFs\n")
+    print(f"{converted} PDFs converted or up to date\n")
 
     print("STEP 2: Chunking Markdown Files")
     chunks = chunk_markdown_files(MARKDOWN_DIR)
@@ -49,9 +68,17 @@ def main(max_resumes: int = 200):
 
     print("STEP 3: Generating Embeddings")
     texts = [d.page_content for d in chunks]
-    gen = EmbeddingGenerator(api_key=API_KEY)
-    embeddings = gen.generate(texts, model="text-embedding-3-small", batch_size=100)
-    print(f"Generated embeddings: {embeddings.shape}\n")
+    gen = EmbeddingGenerator(
+        api_key=API_KEY, base_url=os.getenv("OPENAI_BASE_URL") or None,
+        max_concurrency=concurrency, requests_per_minute=rpm, tokens_per_minute=tpm,
+    )
+    # An interrupted run resumes from the batches checkpointed here.
+    vectors, vector_ids = gen.generate_unique(
+        texts, model="text-embedding-3-small",
+        checkpoint_dir=CHECKPOINT_DIR, store=EmbeddingStore(EMBEDDING_STORE_PATH),
+    )
+    embeddings = vectors[vector_ids]
+    print(f"Generated embeddings: {embeddings.shape} ({len(vectors)} distinct)\n")
 
     print("STEP 4: Saving to Disk")
     with open(CHUNKS_PATH, "wb") as f:
@@ -61,12 +88,31 @@ def main(max_resumes: int = 200):
     with open(EMBEDDINGS_PATH, "wb") as f:
         pickle.dump(embeddings, f)
     print(f"Saved embeddings -> {EMBEDDINGS_PATH}")
+
+    tokens = [BM25Retriever.clean_and_tokenize(d.page_content) for d in chunks]
+    store = CorpusStore.write(
+        CORPUS_DIR, chunks, vectors,
+        embedding_model="text-embedding-3-small",
+        bm25_index=BM25Index().fit(tokens),
+        vector_ids=vector_ids,
+    )
+    print(f"Saved corpus store -> {CORPUS_DIR} "
+          f"({store.n_vectors} vectors for {store.n_chunks} chunks, {store.duplication_rate:.1%} duplicates)")
     
     print("\nDone. Pipeline ready to use.")
 
 if __name__ == "__main__":
     import argparse
     p = argparse.ArgumentParser()
-    p.add_argument("--max-resumes", type=int, default=200, help="Max PDFs to process")
+    p.add_argument("--max-resumes", type=int, default=None, help="Max PDFs to process (default: all)")
+    p.add_argument("--workers", type=int, default=None, help="PDF conversion processes (default: CPU count)")
+    p.add_argument("--timeout", type=float, default=120.0, help="Per-PDF conversion timeout in seconds")
+    p.add_argument("--force", action="store_true", help="Reconvert PDFs even if unchanged")
+    p.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    p.add_argument("--rpm", type=float, default=3000, help="Embedding requests per minute (0 = unlimited)")
+    p.add_argument("--tpm", type=float, default=1_000_000, help="Embedding tokens per minute (0 = unlimited)")
     args = p.parse_args()
-    main(max_resumes=args.max_resumes)
\ No newline at end of file
+    main(
+        max_resumes=args.max_resumes, workers=args.workers, timeout=args.timeout, force=args.force,
+        concurrency=args.concurrency, rpm=args.rpm or None, tpm=args.tpm or None,
+    )
\ No newline at end of file
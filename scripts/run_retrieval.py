@@ -13,6 +13,7 @@ sys.path.insert(0, str(project_root))
 
 from src.pipeline import ResumeRAGPipeline
 from src.config import CHUNKS_PATH, EMBEDDINGS_PATH, OPENAI_API_KEY
+from src.retrieval.metadata_index import DEGREES
 
 def print_results(query, results):
     """Pretty-print search results for a single query."""
@@ -31,20 +32,71 @@ def print_results(query, results):
         print("-" * 60)
 
 
+def print_trace(trace):
+    """Per-stage latency (ms, summed over concurrent spans) and counters of one query."""
+    print(f"Trace {trace['trace_id'][:8]}: {trace['total_ms']:.1f} ms")
+    for name, ms in trace["stages"].items():
+        print(f"  {name:<24} {ms:9.1f} ms")
+    for name, n in trace["counters"].items():
+        print(f"  {name:<24} {n:>9}")
+
+
+def print_stream(query, events, show_trace=False):
+    """Render a search_stream incrementally: candidates first, then each summary as it completes."""
+    print(f"\n{'='*60}")
+    print(f"Query: {query}")
+    print(f"{'='*60}\n")
+
+    rank_of = {}
+    for event in events:
+        if event["type"] == "candidates":
+            print("Candidates (summaries follow as they arrive):")
+            for i, result in enumerate(event["results"], 1):
+                rank_of[result["resume_id"]] = i
+                rrf = result.get('rrf_score')
+                ce = result.get('ce_score')
+                rrf_str = f"{rrf:.5f}" if rrf is not None else "N/A"
+                ce_str = f"{ce:.4f}" if ce is not None else "N/A"
+                print(f"  RANK {i} | Resume ID: {result['resume_id']} | RRF: {rrf_str} | CE: {ce_str}")
+            print()
+        elif event["type"] == "summary":
+            print(f"RANK {rank_of.get(event['resume_id'])} | Resume ID: {event['resume_id']}")
+            print(f"\n{event['summary']}\n")
+            print("-" * 60, flush=True)
+        elif event["type"] == "error":
+            print(f"RANK {rank_of.get(event['resume_id'])} | Resume ID: {event['resume_id']}")
+            print(f"\nSummary failed: {event['error']}\n")
+            print("-" * 60, flush=True)
+        elif event["type"] == "trace" and show_trace:
+            print_trace(event["trace"])
+
+
 def main():
     load_dotenv()
 
     parser = argparse.ArgumentParser(description="Resume RAG Search")
     parser.add_argument("--query", type=str, help="Search query")
     parser.add_argument("--top-k", type=int, default=5, help="Number of results")
+    parser.add_argument("--section", nargs="*", help="Only search these sections (e.g. experience skills)")
+    parser.add_argument("--min-degree", choices=DEGREES, help="Only resumes with at least this degree")
+    parser.add_argument("--skills", nargs="*", help="Only resumes listing all these skills")
     parser.add_argument(
         "--interactive", "-i", action="store_true",
         help="Reuse one loaded pipeline to answer many queries (avoids cold start per query)",
     )
+    parser.add_argument("--trace", action="store_true", help="Print per-stage latency and counters")
+    parser.add_argument("--quiet", "-q", action="store_true", help="No pipeline progress messages")
     args = parser.parse_args()
 
     if not args.interactive and not args.query:
         parser.error("provide --query or run with --interactive")
+    filters = {}
+    if args.section:
+        filters["section"] = args.section
+    if args.min_degree:
+        filters["min_degree"] = args.min_degree
+    if args.skills:
+        filters["skills"] = args.skills
 
     # Initialize pipeline
     api_key = os.getenv("OPENAI_API_KEY") or OPENAI_API_KEY
@@ -53,7 +105,7 @@ def main():
 
     # Loading pickles, fitting BM25/dense, and loading the cross-encoder happens
     # once here; interactive mode amortizes it across every query in the session.
-    pipeline = ResumeRAGPipeline(api_key=api_key)
+    pipeline = ResumeRAGPipeline(api_key=api_key, verbose=not args.quiet, trace=args.trace or None)
 
     if args.interactive:
         print("\nInteractive mode. Enter a query (blank line or Ctrl-D to exit).")
@@ -64,11 +116,13 @@ def main():
                 break
             if not query:
                 break
-            results = pipeline.search(query, top_k_summarize=args.top_k)
-            print_results(query, results)
+            events = pipeline.search_stream(query, top_k_summarize=args.top_k, filters=filters)
+            print_stream(query, events, show_trace=args.trace)
     else:
-        results = pipeline.search(args.query, top_k_summarize=args.top_k)
+        results = pipeline.search(args.query, top_k_summarize=args.top_k, filters=filters)
         print_results(args.query, results)
+        if args.trace and results:
+            print_trace(results[0]["trace"])
 
 
 if __name__ == "__main__":
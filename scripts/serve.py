@@ -0,0 +1,66 @@
+"""
+Run the Resume RAG HTTP query service (see src/service.py).
+
+    python scripts/serve.py --port 8000 --workers 4
+
+    curl -s localhost:8000/search -d '{"query": "docker kubernetes", "top_k": 5}'
+    curl -sN localhost:8000/search/stream -d '{"query": "data engineer", "filters": {"min_degree": "masters"}}'
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import (
+    BATCH_WINDOW_MS, MAX_BATCH_SIZE, MAX_PENDING_REQUESTS, OPENAI_API_KEY, SERVICE_HOST, SERVICE_PORT,
+    SERVICE_WORKERS,
+)
+from src.instrumentation import LoggingSink
+from src.pipeline import ResumeRAGPipeline
+from src.service import serve
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Resume RAG HTTP service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Pre-forked worker processes")
+    parser.add_argument(
+        "--preload", action="store_true",
+        help="Load the pipeline before forking, so workers share the model weights copy-on-write",
+    )
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS,
+                        help="How long a query waits for others to share its batch")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING_REQUESTS,
+                        help="Requests in progress per worker before answering 503")
+    parser.add_argument("--log-traces", action="store_true",
+                        help="Log each request's stage timings and counters (also at GET /metrics)")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY") or OPENAI_API_KEY
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment")
+
+    sinks = []
+    if args.log_traces:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+        sinks.append(LoggingSink())
+
+    # Progress prints are off: on a busy service they cost more than the stages they announce.
+    serve(
+        lambda: ResumeRAGPipeline(api_key=api_key, verbose=False, sinks=sinks),
+        host=args.host, port=args.port, workers=args.workers, preload=args.preload,
+        batch_window_ms=args.batch_window_ms, max_batch=args.max_batch, max_pending=args.max_pending,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Partition the corpus store into shards for multi-process retrieval.
+
+Chunks are assigned to shards by a hash of their resume id. Each shard is a
+corpus store with its own embeddings and BM25 postings, which keep the global
+IDF statistics. Once the shards directory exists, ResumeRAGPipeline serves
+BM25 and dense search from one worker process per shard. Delete the directory
+to go back to single-process retrieval.
+
+Shards are a fixed snapshot: after updating the corpus (scripts/update_corpus.py),
+compact it and rerun this script.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import CORPUS_DIR, SHARDS_DIR
+from src.retrieval.live_corpus import LiveCorpus
+from src.retrieval.sharding import write_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard the corpus store")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="Corpus store directory")
+    parser.add_argument("--out", type=Path, default=SHARDS_DIR, help="Output shards directory")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1, help="Number of shards (worker processes)")
+    args = parser.parse_args()
+
+    corpus = LiveCorpus(args.corpus)
+    if corpus.n_pending:
+        sys.exit(f"{corpus.n_pending} rows of pending updates; run scripts/update_corpus.py --compact first")
+
+    t0 = time.perf_counter()
+    manifest = write_shards(corpus.base, args.out, args.shards)
+    print(f"Wrote {manifest['n_shards']} shards of {manifest['n_chunks']} chunks -> {args.out} "
+          f"in {time.perf_counter() - t0:.1f}s")
+    for shard in manifest["shards"]:
+        print(f"  {shard['name']}: {shard['n_chunks']} chunks, {shard['n_vectors']} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Incrementally update the corpus store: add, replace or remove resumes without
+re-embedding or refitting the rest of the corpus. Running pipelines pick the
+update up within CORPUS_REFRESH_SECONDS.
+
+    python scripts/update_corpus.py --add new/alice.md new/bob.md
+    python scripts/update_corpus.py --remove alice
+    python scripts/update_corpus.py --sync      # corpus := MARKDOWN_DIR
+    python scripts/update_corpus.py --compact
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from data.chunker import assign_clusters, chunk_markdown_file
+from data.dedup import NearDuplicateIndex
+from src.config import (
+    CORPUS_COMPACT_RATIO, CORPUS_DIR, EMBEDDING_MODEL, EMBEDDING_STORE_PATH, MARKDOWN_DIR, OPENAI_API_KEY,
+)
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.live_corpus import CorpusWriter, LiveCorpus
+
+
+def changed_resumes(store: LiveCorpus, markdown_dir: Path):
+    """(chunks of new or modified resumes, ids of resumes whose Markdown is gone)."""
+    index = store.chunk_index()
+    indexed = set(index.resume_ids())
+    md_files = sorted(markdown_dir.glob("*.md"))
+    if not md_files:
+        # Most likely a wrong path; don't empty the corpus.
+        raise ValueError(f"No markdown files found in {markdown_dir}")
+    chunks, seen = [], set()
+    for md in md_files:
+        seen.add(md.stem)
+        docs = chunk_markdown_file(md)
+        if [d.page_content for d in docs] != [c.page_content for c in index.resume_chunks(md.stem)]:
+            chunks.extend(docs)
+    return chunks, sorted(indexed - seen, key=str)
+
+
+def assign_live_clusters(store: LiveCorpus, chunks, removed) -> int:
+    """Cluster added resumes against the near-duplicate clusters of the resumes staying in the corpus."""
+    index = store.chunk_index()
+    replaced = {c.metadata["resume_id"] for c in chunks} | set(removed)
+    dedup = NearDuplicateIndex()
+    for rid in index.resume_ids():
+        if rid not in replaced:
+            dedup.add(rid, index.resume_text(rid), cluster_id=index.cluster_of(rid))
+    return assign_clusters(chunks, dedup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental corpus store updates")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="Corpus store directory")
+    parser.add_argument("--add", type=Path, nargs="*", default=[], help="Markdown resumes to add or replace")
+    parser.add_argument("--remove", nargs="*", default=[], help="Resume ids to remove")
+    parser.add_argument("--sync", action="store_true", help="Add/replace/remove so the corpus matches --markdown-dir")
+    parser.add_argument("--markdown-dir", type=Path, default=MARKDOWN_DIR)
+    parser.add_argument("--compact", action="store_true", help="Fold deltas and tombstones into the base store")
+    args = parser.parse_args()
+
+    if not CorpusStore.exists(args.corpus):
+        raise SystemExit(f"No corpus store at {args.corpus}; build one with scripts/generate_embeddings.py")
+    writer = CorpusWriter(args.corpus, compact_ratio=CORPUS_COMPACT_RATIO)
+    store = LiveCorpus(args.corpus)
+
+    chunks = [doc for md in args.add for doc in chunk_markdown_file(md)]
+    removed = list(args.remove)
+    if args.sync:
+        synced, gone = changed_resumes(store, args.markdown_dir)
+        chunks.extend(synced)
+        removed.extend(gone)
+
+    if chunks:
+        duplicates = assign_live_clusters(store, chunks, removed)
+        if duplicates:
+            print(f"{duplicates} added resumes are near-duplicates of indexed ones")
+
+        from data.embed import EmbeddingGenerator, EmbeddingStore
+
+        if not OPENAI_API_KEY:
+            raise SystemExit("OPENAI_API_KEY not found in .env")
+        gen = EmbeddingGenerator(api_key=OPENAI_API_KEY)
+        embedding_store = EmbeddingStore(EMBEDDING_STORE_PATH)
+        model = store.embedding_model or EMBEDDING_MODEL
+        t0 = time.perf_counter()
+        generation = writer.add_resumes(
+            chunks, lambda texts: gen.generate(texts, model=model, store=embedding_store)
+        )
+        n_resumes = len({c.metadata["resume_id"] for c in chunks})
+        print(f"Added {n_resumes} resumes ({len(chunks)} chunks) in {time.perf_counter() - t0:.1f}s "
+              f"-> generation {generation}")
+    if removed:
+        generation = writer.remove_resumes(removed)
+        print(f"Removed {len(removed)} resumes -> generation {generation}")
+
+    if args.compact or writer.needs_compaction():
+        t0 = time.perf_counter()
+        generation = writer.compact()
+        print(f"Compacted in {time.perf_counter() - t0:.1f}s -> generation {generation}")
+
+    store = LiveCorpus(args.corpus)
+    n_dead = int(store.dead.sum()) if store.dead is not None else 0
+    print(f"Corpus: {store.n_chunks - n_dead} live chunks, {len(store.deltas)} delta segments, "
+          f"{n_dead} tombstones")
+
+
+if __name__ == "__main__":
+    main()
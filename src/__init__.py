@@ -2,9 +2,13 @@
 Resume RAG System - Main package
 """
 
-from .pipeline import ResumeRAGPipeline
-from . import config
+from ._lazy import lazy_exports
 
 __version__ = "0.1.0"
 
-__all__ = ["ResumeRAGPipeline", "config"]
\ No newline at end of file
+__all__ = ["ResumeRAGPipeline", "config"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "ResumeRAGPipeline": (".pipeline", "ResumeRAGPipeline"),
+    "config": (".config", None),
+})
@@ -0,0 +1,39 @@
+"""
+PEP 562 lazy attributes for package ``__init__`` modules.
+
+``__getattr__, __dir__ = lazy_exports(__name__, {"Name": ".module"})``
+makes ``package.Name`` import ``.module`` on first access and caches the
+result in the package namespace. Importing the package itself then costs
+nothing; torch, sentence-transformers and openai load only with the
+components that need them.
+"""
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def lazy_exports(
+    package: str, exports: Dict[str, Tuple[str, Optional[str]]]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    Module ``__getattr__`` and ``__dir__`` for ``package``.
+
+    ``exports`` maps each attribute to ``(module, name)``: the (relative)
+    module defining it and its name there, or None for the module itself.
+    """
+    namespace = sys.modules[package].__dict__
+
+    def __getattr__(name: str) -> Any:
+        try:
+            module_name, attr = exports[name]
+        except KeyError:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}") from None
+        module = importlib.import_module(module_name, package)
+        value = module if attr is None else getattr(module, attr)
+        namespace[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
@@ -6,11 +6,18 @@ load_dotenv()
 
 # API Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# OpenAI-compatible endpoint override (e.g. a local server); None = api.openai.com
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Model Configuration
 EMBEDDING_MODEL = "text-embedding-3-small"
 LLM_MODEL = "gpt-3.5-turbo"
 RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# "torch" (sentence-transformers) or "onnx" (onnxruntime, optional dependency).
+# Compare the two with scripts/benchmark_reranker.py.
+RERANKER_BACKEND = "torch"
+RERANKER_ONNX_QUANTIZE = True  # dynamic INT8 weights
+RERANKER_THREADS = 0  # onnxruntime intra-op threads; 0 = one per physical core
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -19,15 +26,86 @@ PROCESSED_DIR = DATA_DIR / "processed"
 CHUNKS_PATH = PROCESSED_DIR / "chunks" / "resume_chunks_openai.pkl"
 EMBEDDINGS_PATH = PROCESSED_DIR / "embeddings" / "resume_embeddings_openai.pkl"
 BM25_CACHE_PATH = PROCESSED_DIR / "chunks" / "bm25_index.pkl"
+# Memory-mapped corpus store (see src/retrieval/corpus_store.py); preferred over
+# the pickles above when present. Build it with scripts/convert_corpus.py.
+CORPUS_DIR = PROCESSED_DIR / "corpus"
+# Content-addressed embeddings of every chunk text seen (data/embed.py)
+EMBEDDING_STORE_PATH = PROCESSED_DIR / "embeddings" / "embedding_store.sqlite"
+# Incremental updates (scripts/update_corpus.py): a running pipeline checks the
+# store for new updates at most this often (None disables), and deltas plus
+# tombstones are compacted into the base store once they exceed this fraction.
+CORPUS_REFRESH_SECONDS = 10.0
+CORPUS_COMPACT_RATIO = 0.1
+# Sharded retrieval (scripts/shard_corpus.py): when this directory holds shards
+# of the corpus store, BM25 and dense search run in one worker process per
+# shard. Shards are a fixed snapshot; rebuild them after corpus updates.
+SHARDS_DIR = PROCESSED_DIR / "shards"
+CACHE_DIR = PROCESSED_DIR / "cache"
+BENCH_DIR = PROCESSED_DIR / "bench"  # synthetic corpora and results of scripts/benchmark_suite.py
+ONNX_DIR = CACHE_DIR / "onnx"
 MARKDOWN_DIR = PROCESSED_DIR / "markdown" / "Resume-markdown-docling"
 # Retrieval Configuration
+BM25_BACKEND = "native"  # "native" (inverted index) or "rank_bm25"
 BM25_TOP_K = 200
 DENSE_TOP_K = 200
 RERANK_TOP_K = 180
+# Cross-encoder batches are length-bucketed and capped at this many padded
+# tokens; None falls back to fixed batches of 32 pairs.
+RERANK_BATCH_TOKENS = 4096
+# Before reranking, fused chunks are pruned to those of the best
+# RERANK_TOP_RESUMES resumes, scored by their best chunk ("max") or the sum of
+# their RESUME_TOP_M best chunks ("sum"); None reranks every fused chunk.
+# Kept at None (full reranking) until scripts/benchmark_candidates.py has
+# measured recall and latency of a cutoff with RERANKER_MODEL on the corpus.
+RERANK_TOP_RESUMES = None
+RESUME_AGGREGATION = "max"
+RESUME_TOP_M = 3
+# Cascaded reranking scores CASCADE_ROUND_RESUMES resumes per round and stops
+# once the top-N (summarized) resumes are unchanged for CASCADE_PATIENCE rounds.
+RERANK_CASCADE = False
+CASCADE_ROUND_RESUMES = 5
+CASCADE_PATIENCE = 1
+# Dense index: "exact" (brute-force matmul) or "ivf" (approximate, see
+# src/retrieval/ann_index.py). Tune with scripts/ann_recall.py.
+DENSE_INDEX = "exact"
+ANN_NPROBE = 16
+ANN_PQ_M = 0  # product-quantization subspaces; 0 disables PQ
+# Query-embedding cache: in-process LRU entries, backed by a SQLite file shared
+# across worker processes (set the path to None for memory only).
+QUERY_CACHE_SIZE = 10_000
+QUERY_CACHE_PATH = CACHE_DIR / "query_embeddings.sqlite"
+# Cross-encoder score cache, scoped to the loaded corpus (None path = memory only).
+# The SQLite file keeps the SCORE_CACHE_DISK_SIZE most recent scores (None = no limit).
+SCORE_CACHE_SIZE = 100_000
+SCORE_CACHE_PATH = CACHE_DIR / "ce_scores.sqlite"
+SCORE_CACHE_DISK_SIZE = 1_000_000
 RRF_K = 60
 RRF_WEIGHTS = {"bm25": 2.0, "dense": 1.0}
 
+# HTTP query service (scripts/serve.py). Concurrent queries are coalesced
+# into one batched retrieval + rerank call, waiting at most BATCH_WINDOW_MS for
+# up to MAX_BATCH_SIZE queries. Each worker admits MAX_PENDING_REQUESTS at once
+# (queued, ranking or summarizing) and answers 503 beyond that.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+SERVICE_WORKERS = 1  # pre-forked processes sharing the listening socket
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH_SIZE = 32
+MAX_PENDING_REQUESTS = 128
+
+# Per-query tracing (src/instrumentation.py): stage timings and counters are
+# attached to each result as "trace" and handed to the pipeline's sinks.
+# VERBOSE=False silences the pipeline's progress prints, which cost more than
+# the stages they announce on a busy service.
+TRACE_QUERIES = os.getenv("RAG_TRACE", "1") != "0"
+VERBOSE = os.getenv("RAG_VERBOSE", "1") != "0"
+
 # Generation Configuration
 SUMMARY_TOP_N = 5
 MAX_RESUME_CHARS = 6000
-MAX_CONTEXT_CHARS = 2000
\ No newline at end of file
+MAX_CONTEXT_CHARS = 2000
+# Async summarization (ResumeRAGPipeline.asearch)
+SUMMARY_CONCURRENCY = 5
+LLM_TIMEOUT = 30.0  # seconds per chat completion
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BACKOFF = 0.5  # seconds, doubled per retry
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+Retrieval quality against latency: labeled-query evaluation and parameter sweeps.
+
+Every retrieval knob (``BM25_TOP_K``, ``DENSE_TOP_K``, ``RERANK_TOP_K``,
+``RRF_K``, ``RRF_WEIGHTS``) trades quality for speed. ``evaluate`` runs the
+pipeline's ranking (retrieval, fusion, reranking; no summaries) over labeled
+queries under one configuration and reports recall@k, MRR and nDCG@k at the
+chunk and the resume level, next to the latency and per-stage time taken
+from the queries' traces. ``sweep`` does so for a grid of configurations and
+``pareto_frontier`` / ``cheapest`` keep the ones worth choosing from.
+
+Labels are JSONL, one query per line::
+
+    {"query": "python developer", "relevant": {"resume_12": 2, "resume_40": 1}}
+
+``relevant`` maps resume ids to graded relevance (a list means grade 1).
+Optional ``relevant_chunks`` (``{"<resume_id>::<chunk_id>": grade}``) label
+chunks directly; otherwise every chunk of a relevant resume counts with its
+resume's grade. Optional ``filters`` are passed to the search.
+"""
+import itertools
+import json
+import math
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from .config import BM25_TOP_K, DENSE_TOP_K, RERANK_TOP_K, RRF_K, RRF_WEIGHTS, SUMMARY_TOP_N
+from .instrumentation import Trace, activate
+from .retrieval.cache import QueryEmbeddingCache
+
+PathLike = Union[str, Path]
+
+# Swept parameters; the first three are ``search`` arguments, the RRF ones pipeline attributes.
+PARAMETERS = ("bm25_top_k", "dense_top_k", "top_k_rerank", "rrf_k", "rrf_weights")
+
+
+def default_config() -> Dict[str, Any]:
+    """The configuration in ``src/config.py``."""
+    return {
+        "bm25_top_k": BM25_TOP_K, "dense_top_k": DENSE_TOP_K, "top_k_rerank": RERANK_TOP_K,
+        "rrf_k": RRF_K, "rrf_weights": dict(RRF_WEIGHTS),
+    }
+
+
+def parameter_grid(**choices: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Every combination of ``choices`` (parameter -> values), other parameters at their defaults."""
+    unknown = set(choices) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}; expected some of {PARAMETERS}")
+    names = list(choices)
+    return [
+        {**default_config(), **dict(zip(names, values))}
+        for values in itertools.product(*(choices[name] for name in names))
+    ]
+
+
+def _grades(labels: Union[Mapping[str, float], Iterable[str], None]) -> Dict[str, float]:
+    if labels is None:
+        return {}
+    if isinstance(labels, Mapping):
+        return {str(key): float(grade) for key, grade in labels.items() if grade > 0}
+    return {str(key): 1.0 for key in labels}
+
+
+def labeled_query(
+    query: str,
+    relevant: Union[Mapping[str, float], Iterable[str]],
+    relevant_chunks: Union[Mapping[str, float], Iterable[str], None] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """One labeled query, with graded resume (and optionally chunk) relevance."""
+    return {
+        "query": query,
+        "relevant": _grades(relevant),
+        "relevant_chunks": _grades(relevant_chunks) or None,
+        "filters": filters,
+    }
+
+
+def load_qrels(path: PathLike) -> List[Dict[str, Any]]:
+    """Labeled queries from a JSONL file (see the module docstring)."""
+    labeled = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "query" not in record or "relevant" not in record:
+                raise ValueError(f"{path}:{line_no}: expected 'query' and 'relevant'")
+            labeled.append(labeled_query(
+                record["query"], record["relevant"], record.get("relevant_chunks"), record.get("filters")
+            ))
+    return labeled
+
+
+def recall_at_k(ranked: Sequence[str], relevant: Mapping[str, float], k: int) -> float:
+    """Share of the relevant items found in the top ``k``."""
+    if not relevant:
+        return 0.0
+    return sum(1 for key in ranked[:k] if key in relevant) / len(relevant)
+
+
+def reciprocal_rank(ranked: Sequence[str], relevant: Mapping[str, float]) -> float:
+    """1 / rank of the first relevant item (0 if none was retrieved)."""
+    for i, key in enumerate(ranked, 1):
+        if key in relevant:
+            return 1.0 / i
+    return 0.0
+
+
+def ndcg_at_k(ranked: Sequence[str], relevant: Mapping[str, float], k: int) -> float:
+    """Normalized DCG of the top ``k`` with gains ``2**grade - 1``."""
+    dcg = sum((2 ** relevant.get(key, 0.0) - 1) / math.log2(i + 2) for i, key in enumerate(ranked[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(i + 2) for i, grade in enumerate(ideal))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def ranking_metrics(
+    ranked: Sequence[str], relevant: Mapping[str, float], ks: Sequence[int], prefix: str
+) -> Dict[str, float]:
+    """``<prefix>.recall@k``, ``<prefix>.mrr`` and ``<prefix>.ndcg@k`` of one ranking."""
+    metrics = {f"{prefix}.mrr": reciprocal_rank(ranked, relevant)}
+    for k in ks:
+        metrics[f"{prefix}.recall@{k}"] = recall_at_k(ranked, relevant, k)
+        metrics[f"{prefix}.ndcg@{k}"] = ndcg_at_k(ranked, relevant, k)
+    return metrics
+
+
+def score_results(
+    results: Sequence[Mapping[str, Any]], labels: Mapping[str, Any], ks: Sequence[int], chunk_index: Any
+) -> Dict[str, float]:
+    """
+    Chunk- and resume-level metrics of one query's ranked hits.
+
+    The resume ranking is the order in which resumes first appear among the
+    chunks. Without chunk labels, a chunk is as relevant as its resume, and
+    recall counts every chunk of the relevant resumes.
+    """
+    resumes = labels["relevant"]
+    chunk_keys = [f"{r.get('resume_id')}::{r.get('chunk_id')}" for r in results]
+    chunks = labels.get("relevant_chunks")
+    if chunks is None:
+        chunks = {
+            f"{rid}::{chunk.metadata.get('chunk_id')}": grade
+            for rid, grade in resumes.items()
+            for chunk in chunk_index.resume_chunks(rid)
+        }
+    ranked_resumes = list(dict.fromkeys(str(r.get("resume_id")) for r in results))
+    return {
+        **ranking_metrics(chunk_keys, chunks, ks, "chunk"),
+        **ranking_metrics(ranked_resumes, resumes, ks, "resume"),
+    }
+
+
+@contextmanager
+def configured(pipeline: Any, config: Mapping[str, Any]) -> Iterator[None]:
+    """Apply the RRF parameters of ``config`` to ``pipeline`` for the duration of the block."""
+    saved = pipeline.rrf_k, pipeline.rrf_weights
+    pipeline.rrf_k = config.get("rrf_k", pipeline.rrf_k)
+    pipeline.rrf_weights = dict(config.get("rrf_weights", pipeline.rrf_weights))
+    try:
+        yield
+    finally:
+        pipeline.rrf_k, pipeline.rrf_weights = saved
+
+
+@contextmanager
+def evaluation_caches(pipeline: Any, labeled: Sequence[Mapping[str, Any]]) -> Iterator[None]:
+    """
+    Query embeddings computed once up front, and no cross-encoder score cache.
+
+    Embeddings don't depend on any swept parameter, so every configuration
+    gets them for free instead of the first one paying the API calls; cached
+    scores would make each configuration faster than the one before it.
+    """
+    dense, reranker = pipeline.dense, pipeline.reranker
+    saved = dense.query_cache, reranker.score_cache
+    dense.query_cache = QueryEmbeddingCache(max(len(labeled), 1))
+    reranker.score_cache = None
+    try:
+        if labeled:
+            dense._embed_queries([item["query"] for item in labeled])
+        yield
+    finally:
+        dense.query_cache, reranker.score_cache = saved
+
+
+def evaluate(
+    pipeline: Any,
+    labeled: Sequence[Mapping[str, Any]],
+    config: Optional[Mapping[str, Any]] = None,
+    ks: Sequence[int] = (10, 50),
+    top_n: int = SUMMARY_TOP_N,
+) -> Dict[str, Any]:
+    """
+    Quality and latency of one configuration over ``labeled`` queries.
+
+    Returns ``config``, mean ``quality`` metrics (see ``ranking_metrics``),
+    ``latency`` (p50/p95/mean ms per query), mean ``stages_ms`` and mean
+    ``counters`` (e.g. ``cross_encoder_pairs``) from the queries' traces.
+    """
+    config = {**default_config(), **(config or {})}
+    quality: Dict[str, List[float]] = {}
+    totals: List[float] = []
+    stages: Dict[str, float] = {}
+    counters: Dict[str, float] = {}
+    with configured(pipeline, config):
+        for item in labeled:
+            trace = Trace("evaluate", query=item["query"])
+            with activate(trace):
+                results, chunk_index = pipeline._rank(
+                    item["query"], config["bm25_top_k"], config["dense_top_k"], config["top_k_rerank"],
+                    top_n, item.get("filters"),
+                )
+            trace.finish()
+            for name, value in score_results(results, item, ks, chunk_index).items():
+                quality.setdefault(name, []).append(value)
+            totals.append(trace.duration * 1000)
+            for name, seconds in trace.stages().items():
+                stages[name] = stages.get(name, 0.0) + seconds * 1000
+            for name, n in trace.counters.items():
+                counters[name] = counters.get(name, 0) + n
+
+    n = max(len(labeled), 1)
+    p50, p95 = np.percentile(totals, [50, 95]) if totals else (0.0, 0.0)
+    return {
+        "config": config,
+        "queries": len(labeled),
+        "quality": {name: round(float(np.mean(values)), 4) for name, values in quality.items()},
+        "latency": {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+                    "mean_ms": round(float(np.mean(totals)) if totals else 0.0, 3)},
+        "stages_ms": {name: round(ms / n, 3) for name, ms in stages.items()},
+        "counters": {name: round(total / n, 2) for name, total in counters.items()},
+    }
+
+
+def sweep(
+    pipeline: Any,
+    labeled: Sequence[Mapping[str, Any]],
+    configs: Iterable[Mapping[str, Any]],
+    ks: Sequence[int] = (10, 50),
+    top_n: int = SUMMARY_TOP_N,
+) -> List[Dict[str, Any]]:
+    """``evaluate`` every configuration, under ``evaluation_caches``."""
+    with evaluation_caches(pipeline, labeled):
+        return [evaluate(pipeline, labeled, config, ks, top_n) for config in configs]
+
+
+def metric(row: Mapping[str, Any], name: str) -> float:
+    """A quality metric, latency figure or counter of an ``evaluate`` row, by name."""
+    for group in ("quality", "latency", "counters"):
+        if name in row[group]:
+            return float(row[group][name])
+    raise KeyError(f"No metric {name!r} in {sorted(k for g in ('quality', 'latency', 'counters') for k in row[g])}")
+
+
+def pareto_frontier(
+    rows: Sequence[Mapping[str, Any]], quality: str = "resume.ndcg@10", cost: str = "p95_ms"
+) -> List[Mapping[str, Any]]:
+    """
+    Rows no other row beats on both ``quality`` (higher is better) and ``cost``
+    (lower is better), cheapest first.
+    """
+    frontier = []
+    best = -math.inf
+    for row in sorted(rows, key=lambda r: (metric(r, cost), -metric(r, quality))):
+        if metric(row, quality) > best:
+            frontier.append(row)
+            best = metric(row, quality)
+    return frontier
+
+
+def cheapest(
+    rows: Sequence[Mapping[str, Any]], target: float, quality: str = "resume.ndcg@10", cost: str = "p95_ms"
+) -> Optional[Mapping[str, Any]]:
+    """The lowest-``cost`` row whose ``quality`` reaches ``target``, or None."""
+    for row in pareto_frontier(rows, quality, cost):
+        if metric(row, quality) >= target:
+            return row
+    return None
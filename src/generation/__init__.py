@@ -2,7 +2,12 @@
 Generation components for resume summarization
 """
 
-from .summarizer import ResumeSummarizer
-from .utils import split_resume_into_sections, smart_truncate_resume
+from .._lazy import lazy_exports
 
-__all__ = ["ResumeSummarizer", "split_resume_into_sections", "smart_truncate_resume"]
\ No newline at end of file
+__all__ = ["ResumeSummarizer", "split_resume_into_sections", "smart_truncate_resume"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "ResumeSummarizer": (".summarizer", "ResumeSummarizer"),
+    "split_resume_into_sections": (".utils", "split_resume_into_sections"),
+    "smart_truncate_resume": (".utils", "smart_truncate_resume"),
+})
@@ -1,26 +1,73 @@
-from typing import List, Dict, Any
-from openai import OpenAI
+import asyncio
+import contextvars
+import math
+import queue
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+import openai
+from openai import AsyncOpenAI, OpenAI
 
+from ..instrumentation import count, count_usage, stage
 from ..retrieval.chunk_index import ChunkIndex
+from ..retrieval.fusion import collapse_duplicates
 from .utils import split_resume_into_sections, smart_truncate_resume
 
+# Transient failures worth retrying; anything else (auth, bad request) is not.
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
 class ResumeSummarizer:
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-3.5-turbo",
+        base_url: Optional[str] = None,
+        max_concurrency: int = 5,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        """
+        Args:
+            api_key: OpenAI API key
+            model: Chat model used for summaries
+            base_url: OpenAI-compatible endpoint (None uses the client default)
+            max_concurrency: Max in-flight requests in the async/streaming paths
+            timeout: Per-request timeout in seconds, covering the whole
+                response in the streaming paths
+            max_retries: Retries per request on transient errors in ``asummarize``
+            retry_backoff: Base delay in seconds, doubled on every retry
+        """
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # Retries are handled in _acomplete so timeouts and backoff are explicit.
+        self.aclient = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
 
-    def summarize(
-        self,
-        query: str,
-        fused_results: List[Dict[str, Any]],
-        chunk_index: ChunkIndex,
-        top_n: int = 5,
-        max_resume_chars: int = 6000,
-        max_context_chars: int = 2000
-    ) -> List[Dict[str, Any]]:
-        """Generate summaries for top N resumes"""
+    @staticmethod
+    def _select(
+        fused_results: List[Dict[str, Any]], top_n: int, chunk_index: Optional[ChunkIndex] = None
+    ) -> Tuple[List[Any], Dict[Any, List[Dict[str, Any]]]]:
+        """
+        Top N distinct resume ids, and the matched chunks seen for each.
+
+        With a ``chunk_index``, at most one resume per near-duplicate cluster is
+        picked, so no summary is spent on a copy of a resume already selected.
+        """
         top_resume_ids = []
         resume_matched_chunks = {}
+        if chunk_index is not None:
+            fused_results = collapse_duplicates(fused_results, chunk_index.cluster_of)
 
         for r in fused_results:
             rid = r.get("resume_id")
@@ -35,23 +82,31 @@ class ResumeSummarizer:
                 if len(top_resume_ids) >= top_n:
                     break
 
-        summaries = []
-        for rid in top_resume_ids:
-            full_resume = chunk_index.resume_text(rid)
-            matched_chunks = resume_matched_chunks.get(rid, [])
+        return top_resume_ids, resume_matched_chunks
+
+    @staticmethod
+    def _build_prompt(
+        query: str,
+        rid: Any,
+        matched_chunks: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        max_resume_chars: int,
+        max_context_chars: int,
+    ) -> str:
+        full_resume = chunk_index.resume_text(rid)
+
+        matched_texts = []
+        for m in matched_chunks[:3]:
+            chunk = chunk_index.get(rid, m.get("chunk_id"))
+            if chunk:
+                matched_texts.append(chunk.page_content)
+
+        matched_context = "\n---\n".join(matched_texts) if matched_texts else "N/A"
 
-            matched_texts = []
-            for m in matched_chunks[:3]:
-                chunk = chunk_index.get(rid, m.get("chunk_id"))
-                if chunk:
-                    matched_texts.append(chunk.page_content)
-            
-            matched_context = "\n---\n".join(matched_texts) if matched_texts else "N/A"
-            
-            resume_sections = split_resume_into_sections(full_resume)
-            truncated_resume = smart_truncate_resume(resume_sections, max_resume_chars)
-            
-            prompt = f"""You are a recruiter assistant. Analyze this resume and provide:
+        resume_sections = split_resume_into_sections(full_resume)
+        truncated_resume = smart_truncate_resume(resume_sections, max_resume_chars)
+
+        return f"""You are a recruiter assistant. Analyze this resume and provide:
 1. A brief summary of the candidate's profile (2-3 sentences)
 2. How this candidate matches the query: "{query}"
 3. Key strengths relevant to the query
@@ -73,21 +128,264 @@ Following are some of the rules to follow while generating the summary:
 4. If the resume lacks relevant information, state that clearly in your summary.
 5. If the resume is not relevant to the query, do not generate a summary and state that there were not enough relevant resumes
 If """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=400
+
+    @staticmethod
+    def _result(rid: Any, summary: str, matched_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        top_hit = matched_chunks[0] if matched_chunks else {}
+        return {
+            "resume_id": rid,
+            "summary": summary,
+            "rrf_score": top_hit.get("rrf_score"),
+            "ce_score": top_hit.get("ce_score"),
+            "matched_sections": len(matched_chunks)
+        }
+
+    def _candidates_event(
+        self, top_resume_ids: List[Any], resume_matched_chunks: Dict[Any, List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        results = []
+        for rid in top_resume_ids:
+            result = self._result(rid, None, resume_matched_chunks.get(rid, []))
+            del result["summary"]
+            results.append(result)
+        return {"type": "candidates", "results": results}
+
+    def summarize(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_n: int = 5,
+        max_resume_chars: int = 6000,
+        max_context_chars: int = 2000
+    ) -> List[Dict[str, Any]]:
+        """Generate summaries for top N resumes"""
+        top_resume_ids, resume_matched_chunks = self._select(fused_results, top_n, chunk_index)
+
+        summaries = []
+        for rid in top_resume_ids:
+            matched_chunks = resume_matched_chunks.get(rid, [])
+            prompt = self._build_prompt(
+                query, rid, matched_chunks, chunk_index, max_resume_chars, max_context_chars
             )
-            
-            top_hit = matched_chunks[0] if matched_chunks else {}
-            summaries.append({
-                "resume_id": rid,
-                "summary": response.choices[0].message.content,
-                "rrf_score": top_hit.get("rrf_score"),
-                "ce_score": top_hit.get("ce_score"),
-                "matched_sections": len(matched_chunks)
-            })
-        
-        return summaries
\ No newline at end of file
+
+            count("llm_calls")
+            with stage("llm", resume_id=rid):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.3,
+                    max_tokens=400
+                )
+            count_usage("llm", getattr(response, "usage", None))
+
+            summaries.append(self._result(rid, response.choices[0].message.content, matched_chunks))
+
+        return summaries
+
+    async def _acomplete(self, prompt: str, semaphore: asyncio.Semaphore, rid: Any = None) -> str:
+        """One chat completion under the semaphore, with timeout and retry/backoff."""
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    count("llm_calls")
+                    with stage("llm", resume_id=rid, attempt=attempt):
+                        response = await asyncio.wait_for(
+                            self.aclient.chat.completions.create(
+                                model=self.model,
+                                messages=[{"role": "user", "content": prompt}],
+                                temperature=0.3,
+                                max_tokens=400
+                            ),
+                            timeout=self.timeout,
+                        )
+                count_usage("llm", getattr(response, "usage", None))
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                count("llm_retries")
+                # Sleep outside the semaphore so a backing-off request does
+                # not hold a slot other summaries could use.
+                delay = self.retry_backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+                attempt += 1
+
+    async def asummarize(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_n: int = 5,
+        max_resume_chars: int = 6000,
+        max_context_chars: int = 2000
+    ) -> List[Dict[str, Any]]:
+        """
+        Async ``summarize``: all top N requests are in flight at once (bounded by
+        ``max_concurrency``), so latency is roughly one LLM round-trip instead of
+        N. Results keep the ranked order.
+        """
+        top_resume_ids, resume_matched_chunks = self._select(fused_results, top_n, chunk_index)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        prompts = [
+            self._build_prompt(
+                query, rid, resume_matched_chunks.get(rid, []), chunk_index,
+                max_resume_chars, max_context_chars,
+            )
+            for rid in top_resume_ids
+        ]
+        contents = await asyncio.gather(
+            *(self._acomplete(p, semaphore, rid) for p, rid in zip(prompts, top_resume_ids))
+        )
+
+        return [
+            self._result(rid, content, resume_matched_chunks.get(rid, []))
+            for rid, content in zip(top_resume_ids, contents)
+        ]
+
+    def summarize_stream(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_n: int = 5,
+        max_resume_chars: int = 6000,
+        max_context_chars: int = 2000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming ``summarize``.
+
+        Yields a ``{"type": "candidates"}`` event with the selected resumes and
+        their scores before any LLM call, then ``{"type": "token"}`` deltas
+        (``resume_id``, ``delta``) and one ``{"type": "summary"}`` event per
+        resume as soon as its response completes, or ``{"type": "error"}`` if it
+        fails. Up to ``max_concurrency`` completions stream at once, each within
+        ``timeout``; resumes still unfinished once every wave of completions
+        has had its ``timeout`` get an ``"error"`` event.
+        """
+        top_resume_ids, resume_matched_chunks = self._select(fused_results, top_n, chunk_index)
+        yield self._candidates_event(top_resume_ids, resume_matched_chunks)
+        if not top_resume_ids:
+            return
+
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        timed_out = f"Timed out after {self.timeout}s"
+
+        def run(rid: Any):
+            matched_chunks = resume_matched_chunks.get(rid, [])
+            try:
+                prompt = self._build_prompt(
+                    query, rid, matched_chunks, chunk_index, max_resume_chars, max_context_chars
+                )
+                parts = []
+                count("llm_calls")
+                deadline = time.monotonic() + self.timeout
+                with stage("llm", resume_id=rid):
+                    # The request timeout also bounds each wait for the next chunk.
+                    stream = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.3,
+                        max_tokens=400,
+                        stream=True,
+                        timeout=self.timeout,
+                    )
+                    for chunk in stream:
+                        if time.monotonic() > deadline:
+                            stream.close()
+                            raise TimeoutError(timed_out)
+                        count_usage("llm", getattr(chunk, "usage", None))
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            events.put({"type": "token", "resume_id": rid, "delta": delta})
+                events.put({"type": "summary", **self._result(rid, "".join(parts), matched_chunks)})
+            except Exception as e:
+                events.put({"type": "error", "resume_id": rid, "error": str(e)})
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            for rid in top_resume_ids:
+                # Each worker records into the caller's trace (see instrumentation).
+                executor.submit(contextvars.copy_context().run, run, rid)
+            waves = math.ceil(len(top_resume_ids) / self.max_concurrency)
+            deadline = time.monotonic() + self.timeout * waves
+            pending = list(top_resume_ids)
+            while pending:
+                try:
+                    event = events.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    for rid in pending:
+                        yield {"type": "error", "resume_id": rid, "error": timed_out}
+                    return
+                if event["type"] != "token":
+                    pending.remove(event["resume_id"])
+                yield event
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def asummarize_stream(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_n: int = 5,
+        max_resume_chars: int = 6000,
+        max_context_chars: int = 2000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async-iterator ``summarize_stream`` over ``AsyncOpenAI``, yielding the same events."""
+        top_resume_ids, resume_matched_chunks = self._select(fused_results, top_n, chunk_index)
+        yield self._candidates_event(top_resume_ids, resume_matched_chunks)
+        if not top_resume_ids:
+            return
+
+        events: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(rid: Any):
+            matched_chunks = resume_matched_chunks.get(rid, [])
+            try:
+                prompt = self._build_prompt(
+                    query, rid, matched_chunks, chunk_index, max_resume_chars, max_context_chars
+                )
+                parts = []
+
+                async def complete():
+                    stream = await self.aclient.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.3,
+                        max_tokens=400,
+                        stream=True,
+                    )
+                    async for chunk in stream:
+                        count_usage("llm", getattr(chunk, "usage", None))
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            await events.put({"type": "token", "resume_id": rid, "delta": delta})
+
+                async with semaphore:
+                    count("llm_calls")
+                    with stage("llm", resume_id=rid):
+                        # One deadline for the request and every streamed chunk after it.
+                        await asyncio.wait_for(complete(), timeout=self.timeout)
+                await events.put({"type": "summary", **self._result(rid, "".join(parts), matched_chunks)})
+            except asyncio.TimeoutError:
+                await events.put({"type": "error", "resume_id": rid, "error": f"Timed out after {self.timeout}s"})
+            except Exception as e:
+                await events.put({"type": "error", "resume_id": rid, "error": str(e)})
+
+        tasks = [asyncio.create_task(run(rid)) for rid in top_resume_ids]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event = await events.get()
+                if event["type"] != "token":
+                    remaining -= 1
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
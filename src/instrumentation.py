@@ -0,0 +1,349 @@
+"""
+Per-query latency tracing: stage timers and counters.
+
+A ``Trace`` records timed spans (``stage``) and counters (``count``) for one
+search. The active trace lives in a context variable, so retrievers, the
+reranker and the summarizer record into it without it being passed down, and
+it follows the query into ``asyncio`` tasks and ``asyncio.to_thread`` calls.
+Outside a trace, ``stage`` and ``count`` are no-ops.
+
+Finished traces are handed to sinks (anything with ``emit(trace)``):
+``LoggingSink``, ``PrometheusSink`` (text exposition, served at ``/metrics``
+by the HTTP service) and ``OpenTelemetrySink`` (spans exported through the
+``opentelemetry`` SDK).
+"""
+import bisect
+import contextvars
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("rag_trace", default=None)
+# Index of the innermost open span in the current trace (the parent of new spans).
+_parent: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("rag_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "parent", "attrs")
+
+    def __init__(self, name: str, start: float, parent: Optional[int], attrs: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.parent = parent
+        self.attrs = attrs
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Trace:
+    """Spans and counters of one query (or one batch of queries). Thread-safe."""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.start_time = time.time()  # wall clock at ``start``, for exporters
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = {}
+        self._merged: set = set()
+        self._lock = threading.Lock()
+
+    def open_span(self, name: str, parent: Optional[int], attrs: Dict[str, Any]) -> int:
+        span = Span(name, time.perf_counter(), parent, attrs)
+        with self._lock:
+            self.spans.append(span)
+            return len(self.spans) - 1
+
+    def close_span(self, index: int):
+        self.spans[index].end = time.perf_counter()
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: "Trace", parent: Optional[int] = None):
+        """
+        Copy ``other``'s spans, under one span named after it (itself under
+        span ``parent``), and add its counters; merging the same trace again
+        is a no-op. Used for work shared by several queries, e.g. a service
+        batch, whose counters are batch totals.
+        """
+        with self._lock:
+            if other.trace_id in self._merged:
+                return
+            self._merged.add(other.trace_id)
+            root = Span(other.name, other.start, parent, other.attrs)
+            root.end = other.end if other.end is not None else time.perf_counter()
+            self.spans.append(root)
+            parent = len(self.spans) - 1
+            offset = len(self.spans)
+            for span in other.spans:
+                copy = Span(span.name, span.start, parent if span.parent is None else span.parent + offset, span.attrs)
+                copy.end = span.end
+                self.spans.append(copy)
+            for name, n in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def stages(self) -> Dict[str, float]:
+        """Seconds per stage name, summed over its spans (concurrent spans overlap)."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "total_ms": round(self.duration * 1000, 3),
+            "stages": {name: round(s * 1000, 3) for name, s in self.stages().items()},
+            "counters": dict(self.counters),
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "parent": span.parent,
+                    **({"attrs": span.attrs} if span.attrs else {}),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+def current() -> Optional[Trace]:
+    """The active trace, if any."""
+    return _current.get()
+
+
+@contextmanager
+def activate(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make ``trace`` the active trace in this context (``None`` disables tracing)."""
+    token = _current.set(trace)
+    parent_token = _parent.set(None)
+    try:
+        yield trace
+    finally:
+        _parent.reset(parent_token)
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str, **attrs: Any) -> Iterator[None]:
+    """Time the enclosed block as a span of the active trace, nested under the enclosing stage."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    index = trace.open_span(name, _parent.get(), attrs)
+    token = _parent.set(index)
+    try:
+        yield
+    finally:
+        _parent.reset(token)
+        trace.close_span(index)
+
+
+def count(name: str, n: int = 1):
+    """Add ``n`` to a counter of the active trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.incr(name, int(n))
+
+
+def merge(other: Optional[Trace]):
+    """Merge ``other`` into the active trace, under the current stage (see ``Trace.merge``)."""
+    trace = _current.get()
+    if trace is not None and other is not None:
+        trace.merge(other, _parent.get())
+
+
+def count_usage(prefix: str, usage: Any):
+    """Token counters from an OpenAI ``usage`` object (absent for some servers and streams)."""
+    if usage is None or _current.get() is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, field, None)
+        if n:
+            count(f"{prefix}_{field}", n)
+
+
+def iterate(trace: Optional[Trace], events: Iterable[Any]) -> Iterator[Any]:
+    """Iterate a generator with ``trace`` active while it runs, but not while the consumer does."""
+    it = iter(events)
+    while True:
+        with activate(trace):
+            try:
+                event = next(it)
+            except StopIteration:
+                return
+        yield event
+
+
+async def aiterate(trace: Optional[Trace], events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Async ``iterate``."""
+    while True:
+        with activate(trace):
+            try:
+                event = await events.__anext__()
+            except StopAsyncIteration:
+                return
+        yield event
+
+
+def emit(trace: Trace, sinks: Sequence[Any]):
+    """Finish ``trace`` and hand it to each sink; a failing sink is logged, never raised."""
+    trace.finish()
+    for sink in sinks:
+        try:
+            sink.emit(trace)
+        except Exception:
+            logger.exception("Trace sink %r failed", sink)
+
+
+class LoggingSink:
+    """One log line per trace: total, per-stage milliseconds and counters."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("resume_rag.trace")
+        self.level = level
+
+    def emit(self, trace: Trace):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        stages = " ".join(f"{name}={s * 1000:.1f}ms" for name, s in trace.stages().items())
+        counters = " ".join(f"{name}={n}" for name, n in trace.counters.items())
+        self.logger.log(
+            self.level, "%s %s %.1fms | %s | %s",
+            trace.name, trace.trace_id[:8], trace.duration * 1000, stages, counters,
+        )
+
+
+# Latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PrometheusSink:
+    """
+    Aggregates traces into Prometheus metrics, rendered by ``exposition()``.
+
+    ``<prefix>_request_seconds{name}`` and ``<prefix>_stage_seconds{stage}``
+    are latency histograms; each trace counter becomes ``<prefix>_<name>_total``.
+    """
+
+    def __init__(self, prefix: str = "rag", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        # (metric, label) -> [bucket counts..., +Inf count], sum
+        self._histograms: Dict[tuple, List[Any]] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, metric: str, label: str, seconds: float):
+        hist = self._histograms.get((metric, label))
+        if hist is None:
+            hist = self._histograms[(metric, label)] = [[0] * (len(self.buckets) + 1), 0.0]
+        hist[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        hist[1] += seconds
+
+    def emit(self, trace: Trace):
+        with self._lock:
+            self._observe("request", trace.name, trace.duration)
+            for span in trace.spans:
+                self._observe("stage", span.name, span.duration)
+            for name, n in trace.counters.items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def exposition(self) -> str:
+        """Metrics in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for metric, label_name in (("request", "name"), ("stage", "stage")):
+                name = f"{self.prefix}_{metric}_seconds"
+                lines += [f"# HELP {name} Latency per {label_name}.", f"# TYPE {name} histogram"]
+                for (kind, label), (counts, total) in sorted(self._histograms.items()):
+                    if kind != metric:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(self.buckets + (float("inf"),), counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_name}="{label}"}} {total:.6f}')
+                    lines.append(f'{name}_count{{{label_name}="{label}"}} {cumulative}')
+            for counter, n in sorted(self._counters.items()):
+                name = f"{self.prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', counter)}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {n}"]
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetrySink:
+    """
+    Exports each trace as OpenTelemetry spans: a root span per trace (counters
+    as attributes) with the stages nested under it.
+
+    Requires ``opentelemetry-api``; spans go wherever the configured tracer
+    provider exports them.
+    """
+
+    def __init__(self, tracer: Any = None):
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetrySink requires opentelemetry: pip install opentelemetry-api opentelemetry-sdk"
+            ) from e
+        self._otel = otel_trace
+        self.tracer = tracer or otel_trace.get_tracer("resume_rag")
+
+    def emit(self, trace: Trace):
+        def ns(t: float) -> int:
+            return int((trace.start_time + (t - trace.start)) * 1e9)
+
+        root = self.tracer.start_span(
+            trace.name, start_time=ns(trace.start),
+            attributes={"rag.trace_id": trace.trace_id, **_otel_attrs(trace.attrs),
+                        **{f"rag.{name}": n for name, n in trace.counters.items()}},
+        )
+        spans = []
+        for span in trace.spans:
+            parent = root if span.parent is None else spans[span.parent]
+            otel_span = self.tracer.start_span(
+                span.name, context=self._otel.set_span_in_context(parent),
+                start_time=ns(span.start), attributes=_otel_attrs(span.attrs),
+            )
+            spans.append(otel_span)
+        for span, otel_span in zip(trace.spans, spans):
+            otel_span.end(end_time=ns(span.end if span.end is not None else trace.end))
+        root.end(end_time=ns(trace.end if trace.end is not None else time.perf_counter()))
+
+
+def _otel_attrs(attrs: Dict[str, Any]) -> Dict[str, Any]:
+    """Attributes OpenTelemetry accepts (str, bool, int, float); anything else as str."""
+    return {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attrs.items()}
+
+
+def traced_call(trace: Optional[Trace], fn: Callable[..., Any], *args: Any) -> Any:
+    """``fn(*args)`` with ``trace`` active, e.g. in an executor thread."""
+    with activate(trace):
+        return fn(*args)
@@ -1,38 +1,92 @@
+import asyncio
+import copy
 import os
 import pickle
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, AsyncIterator, Iterator, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
 
 from .config import (
+    ANN_NPROBE,
+    ANN_PQ_M,
+    BM25_BACKEND,
     BM25_CACHE_PATH,
     BM25_TOP_K,
+    CASCADE_PATIENCE,
+    CASCADE_ROUND_RESUMES,
     CHUNKS_PATH,
+    CORPUS_COMPACT_RATIO,
+    CORPUS_DIR,
+    CORPUS_REFRESH_SECONDS,
+    DENSE_INDEX,
     DENSE_TOP_K,
     EMBEDDING_MODEL,
     EMBEDDINGS_PATH,
+    LLM_MAX_RETRIES,
     LLM_MODEL,
+    LLM_RETRY_BACKOFF,
+    LLM_TIMEOUT,
     MAX_CONTEXT_CHARS,
     MAX_RESUME_CHARS,
+    ONNX_DIR,
     OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    QUERY_CACHE_PATH,
+    QUERY_CACHE_SIZE,
+    RERANK_BATCH_TOKENS,
+    RERANK_CASCADE,
     RERANK_TOP_K,
+    RERANK_TOP_RESUMES,
+    RERANKER_BACKEND,
     RERANKER_MODEL,
+    RERANKER_ONNX_QUANTIZE,
+    RERANKER_THREADS,
+    RESUME_AGGREGATION,
+    RESUME_TOP_M,
     RRF_K,
     RRF_WEIGHTS,
+    SCORE_CACHE_DISK_SIZE,
+    SCORE_CACHE_PATH,
+    SCORE_CACHE_SIZE,
+    SHARDS_DIR,
+    SUMMARY_CONCURRENCY,
     SUMMARY_TOP_N,
+    TRACE_QUERIES,
+    VERBOSE,
 )
+from .instrumentation import Trace, activate, aiterate, count, emit, iterate, stage
+from .retrieval.ann_index import IVFIndex
 from .retrieval.bm25_retriever import BM25Retriever
+from .retrieval.cache import QueryEmbeddingCache, ScoreCache
 from .retrieval.chunk_index import ChunkIndex
+from .retrieval.corpus_store import CorpusStore
 from .retrieval.dense_retriever import DenseRetriever
-from .retrieval.fusion import rrf_fuse
+from .retrieval.fusion import collapse_duplicates, prune_resumes, rrf_fuse_rows, rrf_hits
+from .retrieval.live_corpus import CorpusWriter, LiveCorpus
 from .retrieval.reranker import CrossEncoderReranker
-from .generation.summarizer import ResumeSummarizer
+from .retrieval.sharding import ShardedRetriever, shards_fingerprint
+
+if TYPE_CHECKING:
+    from .generation.summarizer import ResumeSummarizer
 
 class ResumeRAGPipeline:
     def __init__(
         self, 
         api_key: Optional[str] = None,
         chunks_path: Optional[str] = None,
-        embeddings_path: Optional[str] = None
+        embeddings_path: Optional[str] = None,
+        corpus_dir: Optional[str] = None,
+        shards_dir: Optional[str] = None,
+        reranker_model: Optional[str] = None,
+        verbose: Optional[bool] = None,
+        trace: Optional[bool] = None,
+        sinks: Optional[Sequence[Any]] = None,
+        query_cache_path: Optional[Union[str, Path]] = QUERY_CACHE_PATH,
+        score_cache_path: Optional[Union[str, Path]] = SCORE_CACHE_PATH,
     ):
         """
         Initialize RAG pipeline
@@ -41,55 +95,350 @@ class ResumeRAGPipeline:
             api_key: OpenAI API key (uses config if not provided)
             chunks_path: Path to chunks pickle (uses config if not provided)
             embeddings_path: Path to embeddings pickle (uses config if not provided)
+            corpus_dir: Path to a memory-mapped ``CorpusStore``. Used (from
+                config if not provided) unless pickle paths are passed explicitly.
+            shards_dir: Shards of the corpus store (see ``ShardedRetriever``);
+                when present (from config if not provided), BM25 and dense
+                search run in one worker process per shard.
+            reranker_model: Cross-encoder name or local path (uses config if not provided)
+            verbose: Print progress messages (config ``VERBOSE`` if not provided)
+            trace: Trace each query and attach the trace to its results
+                (config ``TRACE_QUERIES`` if not provided)
+            sinks: Where finished traces go, e.g. ``LoggingSink``,
+                ``PrometheusSink``; see ``src.instrumentation``
+            query_cache_path: SQLite file backing the query-embedding cache
+                (None keeps it in memory only)
+            score_cache_path: SQLite file backing the cross-encoder score
+                cache (None keeps it in memory only)
         """
         # Use provided values or fall back to config
+        self.verbose = VERBOSE if verbose is None else verbose
+        self.trace_queries = TRACE_QUERIES if trace is None else trace
+        self.sinks: List[Any] = list(sinks or [])
+        self.score_cache_path = score_cache_path
+        # Fusion parameters, overridable per pipeline (e.g. by src.evaluation sweeps).
+        self.rrf_k = RRF_K
+        self.rrf_weights = dict(RRF_WEIGHTS)
         self.api_key = api_key or OPENAI_API_KEY
-        chunks_path = chunks_path or CHUNKS_PATH
-        embeddings_path = embeddings_path or EMBEDDINGS_PATH
-        
-        # Load data
-        print(f"Loading chunks from: {chunks_path}")
-        with open(chunks_path, 'rb') as f:
-            self.chunks = pickle.load(f)
+        corpus_dir = corpus_dir or CORPUS_DIR
+        self.store: Optional[LiveCorpus] = None
+        self.shards: Optional[ShardedRetriever] = None
+        self._writer: Optional[CorpusWriter] = None
+        self._refresh_lock = threading.Lock()
+        # Held only while swapping in (or reading) a retriever snapshot.
+        self._swap_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._checked_at = time.monotonic()
+        if chunks_path is None and embeddings_path is None and CorpusStore.exists(corpus_dir):
+            self._progress(f"Opening corpus store: {corpus_dir}")
+            self.store = LiveCorpus(corpus_dir)
+            self.chunks = self.store.chunks()
+            self.embeddings = self.store.vectors
+        else:
+            chunks_path = chunks_path or CHUNKS_PATH
+            embeddings_path = embeddings_path or EMBEDDINGS_PATH
+
+            # Load data
+            self._progress(f"Loading chunks from: {chunks_path}")
+            with open(chunks_path, 'rb') as f:
+                self.chunks = pickle.load(f)
 
-        print(f"Loading embeddings from: {embeddings_path}")
-        with open(embeddings_path, 'rb') as f:
-            self.embeddings = pickle.load(f)
+            self._progress(f"Loading embeddings from: {embeddings_path}")
+            with open(embeddings_path, 'rb') as f:
+                self.embeddings = pickle.load(f)
 
         # Build a single lookup index over chunks, reused by rerank/summarize
         # instead of scanning the full chunk list on every query.
-        self.chunk_index = ChunkIndex(self.chunks)
+        self.chunk_index = (
+            self.store.chunk_index() if self.store
+            else ChunkIndex(self.chunks, version=self._corpus_cache_key(chunks_path))
+        )
 
         # Initialize components
-        print("Initializing retrievers...")
-        self.bm25 = BM25Retriever()
-        self.dense = DenseRetriever(self.api_key)
-        self.reranker = CrossEncoderReranker(RERANKER_MODEL)
-        self.summarizer = ResumeSummarizer(self.api_key, model=LLM_MODEL)
-
-        # Fit retrievers. BM25 fitting is cached to disk keyed on the chunks
-        # file's stat, so it is only recomputed when the chunks actually change.
-        print("Fitting BM25 retriever...")
-        self.bm25.fit(
-            self.chunks,
-            cache_path=str(BM25_CACHE_PATH),
-            cache_key=self._bm25_cache_key(chunks_path),
+        self._progress("Initializing retrievers...")
+        self.bm25 = BM25Retriever(backend=BM25_BACKEND)
+        self.dense = DenseRetriever(
+            self.api_key,
+            base_url=OPENAI_BASE_URL,
+            query_cache=QueryEmbeddingCache(QUERY_CACHE_SIZE, query_cache_path),
         )
+        # The cross-encoder and the LLM client are built on first use (or by
+        # warmup()), so startup and retrieval-only runs don't load them.
+        self.reranker_model = reranker_model or RERANKER_MODEL
+        self._reranker: Optional[CrossEncoderReranker] = None
+        self._summarizer: Optional["ResumeSummarizer"] = None
+        self._components_lock = threading.Lock()
+        self._score_version = self.chunk_index.version
+        self._warm = threading.Event()
+
+        # Fit retrievers. A corpus store already holds the BM25 postings and
+        # normalized embeddings, memory-mapped. Otherwise BM25 fitting is cached
+        # to disk keyed on the chunks file's stat, so it is only recomputed when
+        # the chunks actually change. Sharded, the shard workers hold them.
+        shards_dir = shards_dir or SHARDS_DIR
+        fingerprint = shards_fingerprint(shards_dir) if self.store is not None else None
+        if fingerprint is not None and (fingerprint != self.store.fingerprint or self.store.n_pending):
+            self._progress(f"Shards at {shards_dir} are stale (corpus changed); rebuild them with scripts/shard_corpus.py")
+            fingerprint = None
+        if fingerprint is not None:
+            self._progress("Starting shard workers...")
+            # Queries are embedded here, once, and scored in the workers.
+            self.dense.model_name = self.store.embedding_model or EMBEDDING_MODEL
+            self.shards = ShardedRetriever(
+                shards_dir, self.dense,
+                nprobe=ANN_NPROBE if DENSE_INDEX == "ivf" else None, pq_m=ANN_PQ_M,
+            )
+            self._progress(f"Serving {self.shards.n_shards} shards")
+        elif self.store is not None:
+            self._progress("Fitting retrievers from corpus store...")
+            self.bm25, self.dense = self._fit_retrievers(self.store)
+        else:
+            self._progress("Fitting BM25 retriever...")
+            self.bm25.fit(
+                self.chunks,
+                cache_path=str(BM25_CACHE_PATH),
+                cache_key=self._corpus_cache_key(chunks_path),
+            )
+
+            self._progress("Fitting Dense retriever...")
+            self.dense.fit(self.chunks, self.embeddings, EMBEDDING_MODEL)
+            if DENSE_INDEX == "ivf":
+                key = self._corpus_cache_key(chunks_path)
+                self.dense.use_ann(self._load_or_build_ann(Path(embeddings_path).parent / "ann_ivf", key))
+
+        self._progress(f"✅ Pipeline initialized with {len(self.chunks)} chunks")
+
+    @property
+    def reranker(self) -> CrossEncoderReranker:
+        """The cross-encoder reranker, loaded on first use."""
+        if self._reranker is None:
+            with self._components_lock:
+                if self._reranker is None:
+                    self._progress(f"Loading reranker: {self.reranker_model}")
+                    self._reranker = CrossEncoderReranker(
+                        self.reranker_model,
+                        max_batch_tokens=RERANK_BATCH_TOKENS,
+                        score_cache=ScoreCache(
+                            SCORE_CACHE_SIZE, self.score_cache_path, corpus_version=self._score_version,
+                            max_disk_entries=SCORE_CACHE_DISK_SIZE,
+                        ),
+                        backend=RERANKER_BACKEND,
+                        onnx_dir=ONNX_DIR,
+                        onnx_quantize=RERANKER_ONNX_QUANTIZE,
+                        onnx_threads=RERANKER_THREADS,
+                    )
+        return self._reranker
+
+    @reranker.setter
+    def reranker(self, reranker: CrossEncoderReranker):
+        self._reranker = reranker
+
+    @property
+    def summarizer(self) -> "ResumeSummarizer":
+        """The LLM summarizer, created on first use."""
+        if self._summarizer is None:
+            with self._components_lock:
+                if self._summarizer is None:
+                    from .generation.summarizer import ResumeSummarizer
+
+                    self._summarizer = ResumeSummarizer(
+                        self.api_key,
+                        model=LLM_MODEL,
+                        base_url=OPENAI_BASE_URL,
+                        max_concurrency=SUMMARY_CONCURRENCY,
+                        timeout=LLM_TIMEOUT,
+                        max_retries=LLM_MAX_RETRIES,
+                        retry_backoff=LLM_RETRY_BACKOFF,
+                    )
+        return self._summarizer
+
+    @summarizer.setter
+    def summarizer(self, summarizer: "ResumeSummarizer"):
+        self._summarizer = summarizer
+
+    @property
+    def warm(self) -> bool:
+        """Whether ``warmup`` has completed."""
+        return self._warm.is_set()
 
-        print("Fitting Dense retriever...")
-        self.dense.fit(self.chunks, self.embeddings, EMBEDDING_MODEL)
+    def warmup(self, background: bool = False, predict: bool = True) -> Optional[threading.Thread]:
+        """
+        Load everything deferred to first use, so the first query doesn't pay for it.
+
+        Loads the cross-encoder (scoring one pair with it unless ``predict`` is
+        False) and creates the embedding and LLM clients. With ``background``,
+        runs in a daemon thread, which is returned; queries arriving meanwhile
+        wait only for the component they need.
+        """
+        if background:
+            thread = threading.Thread(target=self.warmup, kwargs={"predict": predict},
+                                      name="pipeline-warmup", daemon=True)
+            thread.start()
+            return thread
+        t0 = time.perf_counter()
+        reranker = self.reranker
+        if predict and self.chunks:
+            reranker._predict([("warmup", self.chunks[0].page_content)])
+        # Each access creates the client (importing openai) if not done yet.
+        self.dense.client, self.dense.aclient, self.summarizer
+        self._warm.set()
+        self._progress(f"Warmed up in {time.perf_counter() - t0:.1f}s")
+        return None
+
+    def _progress(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _trace(self, name: str, **attrs: Any) -> Optional[Trace]:
+        return Trace(name, **attrs) if self.trace_queries else None
+
+    def _finish(self, trace: Optional[Trace], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Emit ``trace`` to the sinks and attach it to each result as ``"trace"``."""
+        if trace is not None:
+            emit(trace, self.sinks)
+            summary = trace.to_dict()
+            for result in results:
+                result["trace"] = summary
+        return results
+
+    def _fit_retrievers(self, store: LiveCorpus):
+        """BM25 and dense retrievers over a corpus snapshot (new objects; the live ones are untouched)."""
+        bm25 = BM25Retriever(backend=self.bm25.backend)
+        bm25_index = store.bm25_index()
+        if bm25_index is not None and bm25.backend == "native":
+            bm25.fit_index(store.chunks(), bm25_index)
+        else:
+            bm25.fit(
+                store.chunks(), cache_path=str(BM25_CACHE_PATH), cache_key=f"store:{store.version}", dead=store.dead
+            )
 
-        print(f"✅ Pipeline initialized with {len(self.chunks)} chunks")
+        # Shallow copy: shares the API clients, query cache and (while the base
+        # store is unchanged) the ANN index built over its rows.
+        dense = copy.copy(self.dense)
+        ann = self.dense.ann if self.store is not None and self.store.base is store.base else None
+        dense.fit(
+            store.chunks(), store.vectors, store.embedding_model or EMBEDDING_MODEL,
+            normalized=True, extra_embeddings=store.extra_embeddings, dead=store.dead,
+            vector_ids=store.vector_ids,
+        )
+        dense.ann = None
+        if DENSE_INDEX == "ivf":
+            # Delta rows are scanned exactly; the IVF index covers the base store.
+            dense.use_ann(ann or self._load_or_build_ann(
+                store.path / "ann_ivf", f"store:{store.fingerprint}", dense.Xn
+            ))
+        return bm25, dense
+
+    def _load_or_build_ann(self, ann_dir: Path, key: Optional[str], X: Optional[np.ndarray] = None) -> IVFIndex:
+        """Open the IVF index persisted next to the embeddings, rebuilding it if stale."""
+        X = self.dense.Xn if X is None else X
+        index = IVFIndex.load(ann_dir, X, key=key)
+        if index is None:
+            self._progress("Building IVF index...")
+            index = IVFIndex(nprobe=ANN_NPROBE, pq_m=ANN_PQ_M).fit(X)
+            index.save(ann_dir, key=key)
+        index.nprobe = ANN_NPROBE
+        return index
 
-    @staticmethod
-    def _bm25_cache_key(chunks_path: str) -> Optional[str]:
-        """Cache key derived from the chunks file identity (path, mtime, size)."""
+    def _corpus_cache_key(self, chunks_path: Optional[str]) -> Optional[str]:
+        """Cache key for the loaded corpus: the store version, or the chunks file identity (path, mtime, size)."""
+        if self.store is not None:
+            return f"store:{self.store.version}"
         try:
             st = os.stat(chunks_path)
         except OSError:
             return None
         return f"{chunks_path}:{st.st_mtime_ns}:{st.st_size}"
-    
+
+    def refresh(self) -> bool:
+        """
+        Reopen the corpus store if it was updated on disk; returns whether it changed.
+
+        New retrievers and indexes are built off to the side and then swapped
+        in, so queries keep running on the previous snapshot meanwhile.
+        """
+        if self.store is None or self.shards is not None:
+            return False
+        with self._refresh_lock:
+            try:
+                if LiveCorpus.current_version(self.store.path) == self.store.version:
+                    return False
+                store = LiveCorpus(self.store.path, previous=self.store)
+            except (OSError, ValueError) as e:
+                # Caught mid-compaction (files swapped between reads); retry next time.
+                self._progress(f"Corpus refresh skipped: {e}")
+                return False
+            bm25, dense = self._fit_retrievers(store)
+            chunk_index = store.chunk_index()
+            # Reranks key cached scores on their snapshot's chunk_index.version, so
+            # ones still running on the previous snapshot can't store under this one.
+            with self._components_lock:
+                self._score_version = chunk_index.version
+                if self._reranker is not None and self._reranker.score_cache is not None:
+                    self._reranker.score_cache.set_corpus_version(self._score_version)
+            with self._swap_lock:
+                self.store, self.chunks, self.embeddings = store, store.chunks(), store.vectors
+                self.bm25, self.dense, self.chunk_index = bm25, dense, chunk_index
+        self._progress(f"Corpus refreshed: generation {store.generation}, {len(self.chunks)} chunks")
+        return True
+
+    def _snapshot(self) -> Tuple[BM25Retriever, DenseRetriever, ChunkIndex]:
+        """BM25, dense and chunk index of one corpus version, so retrieved rows index the same chunks."""
+        with self._swap_lock:
+            return self.bm25, self.dense, self.chunk_index
+
+    def _maybe_refresh(self):
+        """Start a background refresh if CORPUS_REFRESH_SECONDS have passed since the last check."""
+        if self.store is None or self.shards is not None or CORPUS_REFRESH_SECONDS is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < CORPUS_REFRESH_SECONDS:
+            return
+        self._checked_at = now
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = threading.Thread(target=self.refresh, name="corpus-refresh", daemon=True)
+            self._refresher.start()
+
+    def _corpus_writer(self) -> CorpusWriter:
+        if self.store is None:
+            raise ValueError("Incremental updates need a corpus store; build one with scripts/convert_corpus.py")
+        if self.shards is not None:
+            raise ValueError("Sharded pipelines serve a fixed snapshot; update the corpus store, then rebuild the shards")
+        if self._writer is None:
+            self._writer = CorpusWriter(self.store.path, compact_ratio=CORPUS_COMPACT_RATIO)
+        return self._writer
+
+    def add_resumes(self, chunks: List[Document]) -> int:
+        """
+        Index the chunks of new or changed resumes and start serving them.
+
+        Only chunk texts not already in the corpus are embedded; earlier
+        versions of the same resumes are tombstoned. Returns the corpus
+        generation. Compaction, when due, runs in a background thread.
+        """
+        writer = self._corpus_writer()
+        generation = writer.add_resumes(chunks, self.dense.embed_documents)
+        self._after_update(writer)
+        return generation
+
+    def remove_resumes(self, resume_ids: Iterable[Any]) -> int:
+        """Tombstone every chunk of the given resumes; returns the corpus generation."""
+        writer = self._corpus_writer()
+        generation = writer.remove_resumes(resume_ids)
+        self._after_update(writer)
+        return generation
+
+    def close(self):
+        """Stop the shard worker processes, if any."""
+        if self.shards is not None:
+            self.shards.close()
+
+    def _after_update(self, writer: CorpusWriter):
+        self.refresh()
+        if writer.needs_compaction():
+            # Picked up by _maybe_refresh once it finishes.
+            writer.compact_async()
+
     def search(
         self,
         query: str,
@@ -97,37 +446,337 @@ class ResumeRAGPipeline:
         dense_top_k: int = DENSE_TOP_K,
         top_k_rerank: int = RERANK_TOP_K,
         top_k_summarize: int = SUMMARY_TOP_N,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
-        """End-to-end RAG pipeline"""
-        print(f"\nSearching for: {query}")
+        """
+        End-to-end RAG pipeline.
+
+        ``filters`` restrict the search to matching chunks before any scoring,
+        e.g. ``{"section": "experience"}``, ``{"min_degree": "masters"}`` or
+        ``{"skills": ["python"]}``; see ``MetadataIndex``.
+
+        Unless tracing is off, each result carries the query's ``"trace"``:
+        per-stage milliseconds and counters (see ``Trace.to_dict``).
+        """
+        trace = self._trace("search", query=query)
+        with activate(trace):
+            reranked, chunk_index = self._rank(
+                query, bm25_top_k, dense_top_k, top_k_rerank, top_k_summarize, filters
+            )
+
+            # 4. Generate summaries
+            self._progress("Generating summaries...")
+            with stage("summarize"):
+                summaries = self.summarizer.summarize(
+                    query, reranked, chunk_index,
+                    top_n=top_k_summarize,
+                    max_resume_chars=MAX_RESUME_CHARS,
+                    max_context_chars=MAX_CONTEXT_CHARS,
+                )
+
+        self._progress(f"Found {len(summaries)} candidates\n")
+        return self._finish(trace, summaries)
+
+    def _rank(
+        self,
+        query: str,
+        bm25_top_k: int,
+        dense_top_k: int,
+        top_k_rerank: int,
+        top_n: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], ChunkIndex]:
+        """Retrieval, fusion and reranking of one query; also returns the chunk index the results refer to."""
+        self._progress(f"\nSearching for: {query}")
+        self._maybe_refresh()
+
+        bm25, dense, chunk_index = self._snapshot()
 
         # 1. Retrieve with BM25 and Dense
-        print("BM25 retrieval...")
-        bm25_hits = self.bm25.search(query, top_k=bm25_top_k)
+        with stage("retrieve"):
+            if self.shards is not None:
+                self._progress("Sharded BM25 + Dense retrieval...")
+                bm25_hits, dense_hits = self.shards.search_rows(query, bm25_top_k, dense_top_k, filters)
+            else:
+                mask = chunk_index.filter_mask(filters)
+                self._progress("BM25 retrieval...")
+                bm25_hits = bm25.search_rows(query, top_k=bm25_top_k, mask=mask)
 
-        print("Dense retrieval...")
-        dense_hits = self.dense.search(query, top_k=dense_top_k)
+                self._progress("Dense retrieval...")
+                dense_hits = dense.search_rows(query, top_k=dense_top_k, mask=mask)
 
         # 2. Fuse results
-        print("Fusing results...")
-        fused = rrf_fuse(
-            bm25_hits, dense_hits,
-            k=RRF_K, top_k=top_k_rerank,
-            weights=RRF_WEIGHTS
-        )
+        self._progress("Fusing results...")
+        fused = self._fuse(bm25_hits, dense_hits, top_k_rerank, chunk_index)
 
         # 3. Rerank with cross-encoder
-        print("Reranking...")
-        reranked = self.reranker.rerank(query, fused, self.chunk_index, top_k=top_k_rerank)
+        self._progress("Reranking...")
+        return self._rerank(query, fused, chunk_index, top_k_rerank, top_n), chunk_index
 
-        # 4. Generate summaries
-        print("Generating summaries...")
-        summaries = self.summarizer.summarize(
-            query, reranked, self.chunk_index,
+    def _rerank(
+        self, query: str, fused: List[Dict[str, Any]], chunk_index: ChunkIndex, top_k: int, top_n: int
+    ) -> List[Dict[str, Any]]:
+        """Cross-encoder reranking; cascaded (stopping early for the top_n resumes) if RERANK_CASCADE."""
+        with stage("rerank"):
+            if RERANK_CASCADE:
+                return self.reranker.rerank_cascade(
+                    query, fused, chunk_index,
+                    top_n=top_n, round_resumes=CASCADE_ROUND_RESUMES, patience=CASCADE_PATIENCE,
+                    top_k=top_k, aggregation=RESUME_AGGREGATION, top_m=RESUME_TOP_M,
+                )
+            return self.reranker.rerank(query, fused, chunk_index, top_k=top_k)
+
+    def search_stream(
+        self,
+        query: str,
+        bm25_top_k: int = BM25_TOP_K,
+        dense_top_k: int = DENSE_TOP_K,
+        top_k_rerank: int = RERANK_TOP_K,
+        top_k_summarize: int = SUMMARY_TOP_N,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming RAG pipeline.
+
+        Yields a ``"candidates"`` event (resume ids and scores) right after
+        reranking, then ``"token"`` deltas and one ``"summary"`` (or ``"error"``)
+        event per resume as each LLM response completes. See
+        ``ResumeSummarizer.summarize_stream``. Unless tracing is off, a final
+        ``{"type": "trace"}`` event carries the query's trace.
+        """
+        trace = self._trace("search_stream", query=query)
+        with activate(trace):
+            reranked, chunk_index = self._rank(
+                query, bm25_top_k, dense_top_k, top_k_rerank, top_k_summarize, filters
+            )
+        yield from iterate(trace, self.summarizer.summarize_stream(
+            query, reranked, chunk_index,
             top_n=top_k_summarize,
             max_resume_chars=MAX_RESUME_CHARS,
             max_context_chars=MAX_CONTEXT_CHARS,
+        ))
+        if trace is not None:
+            emit(trace, self.sinks)
+            yield {"type": "trace", "trace": trace.to_dict()}
+
+    async def asearch(
+        self,
+        query: str,
+        bm25_top_k: int = BM25_TOP_K,
+        dense_top_k: int = DENSE_TOP_K,
+        top_k_rerank: int = RERANK_TOP_K,
+        top_k_summarize: int = SUMMARY_TOP_N,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async end-to-end RAG pipeline.
+
+        BM25 runs in a worker thread while the query embedding is awaited, the
+        cross-encoder runs off the event loop, and all summaries are requested
+        concurrently. Returns the same results as ``search``.
+        """
+        self._progress(f"\nSearching for: {query}")
+        self._maybe_refresh()
+
+        bm25, dense, chunk_index = self._snapshot()
+
+        trace = self._trace("asearch", query=query)
+        with activate(trace):
+            self._progress("BM25 + Dense retrieval...")
+            bm25_hits, dense_hits = await self._aretrieve(
+                query, bm25, dense, chunk_index, bm25_top_k, dense_top_k, filters
+            )
+
+            self._progress("Fusing results...")
+            fused = self._fuse(bm25_hits, dense_hits, top_k_rerank, chunk_index)
+
+            self._progress("Reranking...")
+            reranked = await asyncio.to_thread(
+                self._rerank, query, fused, chunk_index, top_k_rerank, top_k_summarize
+            )
+
+            self._progress("Generating summaries...")
+            summaries = await self._asummarize(query, reranked, chunk_index, top_k_summarize)
+
+        self._progress(f"Found {len(summaries)} candidates\n")
+        return self._finish(trace, summaries)
+
+    async def _asummarize(
+        self, query: str, reranked: List[Dict[str, Any]], chunk_index: ChunkIndex, top_n: int
+    ) -> List[Dict[str, Any]]:
+        """Concurrent LLM summaries of the top_n reranked resumes."""
+        with stage("summarize"):
+            return await self.summarizer.asummarize(
+                query, reranked, chunk_index,
+                top_n=top_n,
+                max_resume_chars=MAX_RESUME_CHARS,
+                max_context_chars=MAX_CONTEXT_CHARS,
+            )
+
+    def _asummarize_stream(
+        self, query: str, reranked: List[Dict[str, Any]], chunk_index: ChunkIndex, top_n: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """``asearch_stream`` events of the top_n reranked resumes."""
+        return self.summarizer.asummarize_stream(
+            query, reranked, chunk_index,
+            top_n=top_n,
+            max_resume_chars=MAX_RESUME_CHARS,
+            max_context_chars=MAX_CONTEXT_CHARS,
         )
 
-        print(f"Found {len(summaries)} candidates\n")
-        return summaries
\ No newline at end of file
+    async def _aretrieve(
+        self,
+        query: str,
+        bm25: BM25Retriever,
+        dense: DenseRetriever,
+        chunk_index: ChunkIndex,
+        bm25_top_k: int,
+        dense_top_k: int,
+        filters: Optional[Dict[str, Any]],
+    ) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+        """BM25 (in a worker thread) and dense retrieval, concurrently; scattered to the shards when sharded."""
+        with stage("retrieve"):
+            if self.shards is not None:
+                return await self.shards.asearch_rows(query, bm25_top_k, dense_top_k, filters)
+            mask = chunk_index.filter_mask(filters)
+            return await asyncio.gather(
+                asyncio.to_thread(bm25.search_rows, query, bm25_top_k, mask),
+                dense.asearch_rows(query, top_k=dense_top_k, mask=mask),
+            )
+
+    async def asearch_stream(
+        self,
+        query: str,
+        bm25_top_k: int = BM25_TOP_K,
+        dense_top_k: int = DENSE_TOP_K,
+        top_k_rerank: int = RERANK_TOP_K,
+        top_k_summarize: int = SUMMARY_TOP_N,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async-iterator ``search_stream``, yielding the same events."""
+        self._maybe_refresh()
+        bm25, dense, chunk_index = self._snapshot()
+        trace = self._trace("asearch_stream", query=query)
+        with activate(trace):
+            bm25_hits, dense_hits = await self._aretrieve(
+                query, bm25, dense, chunk_index, bm25_top_k, dense_top_k, filters
+            )
+            fused = self._fuse(bm25_hits, dense_hits, top_k_rerank, chunk_index)
+            reranked = await asyncio.to_thread(
+                self._rerank, query, fused, chunk_index, top_k_rerank, top_k_summarize
+            )
+        events = self._asummarize_stream(query, reranked, chunk_index, top_k_summarize)
+        async for event in aiterate(trace, events):
+            yield event
+        if trace is not None:
+            emit(trace, self.sinks)
+            yield {"type": "trace", "trace": trace.to_dict()}
+
+    def search_many(
+        self,
+        queries: List[str],
+        bm25_top_k: int = BM25_TOP_K,
+        dense_top_k: int = DENSE_TOP_K,
+        top_k_rerank: int = RERANK_TOP_K,
+        top_k_summarize: int = SUMMARY_TOP_N,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        End-to-end RAG pipeline for a batch of queries.
+
+        Returns one result list per query, in input order. Query embedding is a
+        single API request, dense scoring is one matrix-matrix product, and all
+        (query, chunk) pairs share cross-encoder batches, so per-query overhead
+        is amortized across the batch. The batch shares one trace, attached to
+        every result.
+        """
+        self._progress(f"\nSearching for {len(queries)} queries")
+        trace = self._trace("search_many", queries=len(queries))
+        with activate(trace):
+            reranked_lists, chunk_index = self._rank_many(
+                queries, bm25_top_k, dense_top_k, top_k_rerank, top_k_summarize, filters
+            )
+
+            self._progress("Generating summaries...")
+            with stage("summarize"):
+                results = [
+                    self.summarizer.summarize(
+                        query, reranked, chunk_index,
+                        top_n=top_k_summarize,
+                        max_resume_chars=MAX_RESUME_CHARS,
+                        max_context_chars=MAX_CONTEXT_CHARS,
+                    )
+                    for query, reranked in zip(queries, reranked_lists)
+                ]
+        self._finish(trace, [result for query_results in results for result in query_results])
+        return results
+
+    def _rank_many(
+        self,
+        queries: List[str],
+        bm25_top_k: int,
+        dense_top_k: int,
+        top_k_rerank: int,
+        top_n: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[List[Dict[str, Any]]], ChunkIndex]:
+        """Batched retrieval, fusion and reranking; also returns the chunk index the results refer to."""
+        self._maybe_refresh()
+
+        bm25, dense, chunk_index = self._snapshot()
+
+        with stage("retrieve"):
+            if self.shards is not None:
+                self._progress("Sharded BM25 + Dense retrieval...")
+                bm25_lists, dense_lists = self.shards.search_many_rows(queries, bm25_top_k, dense_top_k, filters)
+            else:
+                mask = chunk_index.filter_mask(filters)
+                self._progress("BM25 retrieval...")
+                bm25_lists = [bm25.search_rows(q, top_k=bm25_top_k, mask=mask) for q in queries]
+
+                self._progress("Dense retrieval...")
+                dense_lists = dense.search_many_rows(queries, top_k=dense_top_k, mask=mask)
+
+        self._progress("Fusing results...")
+        fused_lists = [
+            self._fuse(bm25_hits, dense_hits, top_k_rerank, chunk_index)
+            for bm25_hits, dense_hits in zip(bm25_lists, dense_lists)
+        ]
+
+        self._progress("Reranking...")
+        if RERANK_CASCADE:
+            reranked_lists = [
+                self._rerank(query, fused, chunk_index, top_k_rerank, top_n)
+                for query, fused in zip(queries, fused_lists)
+            ]
+        else:
+            with stage("rerank"):
+                reranked_lists = self.reranker.rerank_many(
+                    queries, fused_lists, chunk_index, top_k=top_k_rerank
+                )
+        return reranked_lists, chunk_index
+
+    def _fuse(
+        self,
+        bm25_hits: Tuple[np.ndarray, np.ndarray],
+        dense_hits: Tuple[np.ndarray, np.ndarray],
+        top_k: int,
+        chunk_index: ChunkIndex,
+    ) -> List[Dict[str, Any]]:
+        """RRF over the retrievers' (rows, scores); ``Hit`` records are built for the kept rows only."""
+        with stage("fuse"):
+            # Near-duplicate resumes are collapsed before the top_k cut, so they
+            # don't crowd distinct candidates out of the rerank pool.
+            rows, scores, per_source = rrf_fuse_rows(
+                {"bm25": bm25_hits, "dense": dense_hits},
+                k=self.rrf_k, top_k=None if chunk_index.clustered else top_k,
+                weights=self.rrf_weights
+            )
+            hits = rrf_hits(rows, scores, per_source, chunk_index.chunks)
+            fused = collapse_duplicates(hits, chunk_index.cluster_of, top_k)
+            # Only chunks of the most promising resumes reach the cross-encoder.
+            fused = prune_resumes(fused, RERANK_TOP_RESUMES, RESUME_AGGREGATION, RESUME_TOP_M)
+            for i, rec in enumerate(fused, 1):
+                rec["rank"] = i
+            count("fused_candidates", len(fused))
+            return fused
\ No newline at end of file
@@ -2,16 +2,56 @@
 Retrieval components for resume search
 """
 
-from .bm25_retriever import BM25Retriever
-from .chunk_index import ChunkIndex
-from .dense_retriever import DenseRetriever
-from .fusion import rrf_fuse
-from .reranker import CrossEncoderReranker
+from .._lazy import lazy_exports
 
 __all__ = [
+    "IVFIndex",
+    "recall_at_k",
+    "BM25Index",
     "BM25Retriever",
     "ChunkIndex",
+    "QueryEmbeddingCache",
+    "ScoreCache",
+    "CorpusStore",
+    "convert_pickles",
     "DenseRetriever",
+    "Hit",
     "rrf_fuse",
-    "CrossEncoderReranker"
-]
\ No newline at end of file
+    "rrf_fuse_rows",
+    "rrf_hits",
+    "collapse_duplicates",
+    "prune_resumes",
+    "CorpusWriter",
+    "LiveCorpus",
+    "MetadataIndex",
+    "OnnxCrossEncoder",
+    "CrossEncoderReranker",
+    "ShardedRetriever",
+    "write_shards"
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "IVFIndex": (".ann_index", "IVFIndex"),
+    "recall_at_k": (".ann_index", "recall_at_k"),
+    "BM25Index": (".bm25_index", "BM25Index"),
+    "BM25Retriever": (".bm25_retriever", "BM25Retriever"),
+    "QueryEmbeddingCache": (".cache", "QueryEmbeddingCache"),
+    "ScoreCache": (".cache", "ScoreCache"),
+    "ChunkIndex": (".chunk_index", "ChunkIndex"),
+    "CorpusStore": (".corpus_store", "CorpusStore"),
+    "convert_pickles": (".corpus_store", "convert_pickles"),
+    "DenseRetriever": (".dense_retriever", "DenseRetriever"),
+    "Hit": (".hits", "Hit"),
+    "collapse_duplicates": (".fusion", "collapse_duplicates"),
+    "prune_resumes": (".fusion", "prune_resumes"),
+    "rrf_fuse": (".fusion", "rrf_fuse"),
+    "rrf_fuse_rows": (".fusion", "rrf_fuse_rows"),
+    "rrf_hits": (".fusion", "rrf_hits"),
+    "CorpusWriter": (".live_corpus", "CorpusWriter"),
+    "LiveCorpus": (".live_corpus", "LiveCorpus"),
+    "MetadataIndex": (".metadata_index", "MetadataIndex"),
+    "OnnxCrossEncoder": (".onnx_reranker", "OnnxCrossEncoder"),
+    "CrossEncoderReranker": (".reranker", "CrossEncoderReranker"),
+    "ShardedRetriever": (".sharding", "ShardedRetriever"),
+    "write_shards": (".sharding", "write_shards"),
+})
@@ -0,0 +1,263 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathLike = Union[str, Path]
+
+# 256 centroids per PQ subspace converge well on ~64 points each; training on
+# more only slows the offline build.
+PQ_TRAIN_SIZE = 256 * 64
+
+
+def _kmeans(
+    X: np.ndarray,
+    k: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    spherical: bool = False,
+    batch: int = 65536,
+) -> np.ndarray:
+    """
+    Lloyd's k-means in NumPy.
+
+    ``spherical=True`` clusters by inner product on unit vectors (centroids are
+    renormalized each step); otherwise by squared Euclidean distance. Empty
+    clusters are reseeded from random points.
+    """
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    k = min(k, n)
+    C = X[rng.choice(n, size=k, replace=False)].astype(np.float32)
+    for _ in range(n_iter):
+        assign = _assign(X, C, spherical, batch)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        empty = counts == 0
+        C = np.zeros_like(C)
+        C[~empty] = np.add.reduceat(X[order], starts[~empty], axis=0) / counts[~empty, None]
+        if empty.any():
+            C[empty] = X[rng.choice(n, size=int(empty.sum()), replace=False)]
+        if spherical:
+            C /= np.linalg.norm(C, axis=1, keepdims=True) + 1e-12
+    return C.astype(np.float32)
+
+
+def _assign(X: np.ndarray, C: np.ndarray, spherical: bool, batch: int = 65536) -> np.ndarray:
+    """Nearest centroid per row, computed in batches to bound memory."""
+    out = np.empty(X.shape[0], dtype=np.int64)
+    c_sq = None if spherical else (C * C).sum(axis=1)
+    for lo in range(0, X.shape[0], batch):
+        sims = np.asarray(X[lo:lo + batch], dtype=np.float32) @ C.T
+        if not spherical:
+            sims = 2 * sims - c_sq  # argmax of -||x - c||^2 up to a per-row constant
+        out[lo:lo + batch] = sims.argmax(axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over L2-normalized vectors, with optional PQ.
+
+    Brute-force dense search is a full ``Xn @ q`` plus a sort over every chunk.
+    IVF clusters the vectors around ``nlist`` k-means centroids and only scans
+    the ``nprobe`` lists whose centroids are closest to the query, so cost scales
+    with ``nprobe / nlist`` of the corpus.
+
+    With ``pq_m > 0`` the residuals (vector - centroid) are product-quantized
+    into ``pq_m`` one-byte codes, candidates are scored from per-query lookup
+    tables, and the best ``k * refine`` of them are rescored exactly against the
+    full vectors.
+
+    Recall/latency knobs: ``nprobe`` (lists scanned) and, with PQ, ``refine``.
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 16,
+        pq_m: int = 0,
+        refine: int = 4,
+        n_iter: int = 20,
+        train_size: int = 100_000,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.refine = refine
+        self.n_iter = n_iter
+        self.train_size = train_size
+        self.seed = seed
+        self.Xn: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (pq_m, 256, dsub)
+        self.codes: Optional[np.ndarray] = None  # (n, pq_m) uint8, in list_ids order
+
+    def _train_sample(self, X: np.ndarray) -> np.ndarray:
+        if X.shape[0] <= self.train_size:
+            return np.asarray(X, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        rows = np.sort(rng.choice(X.shape[0], size=self.train_size, replace=False))
+        return np.asarray(X[rows], dtype=np.float32)
+
+    def fit(self, Xn: np.ndarray) -> "IVFIndex":
+        """Train centroids (and PQ codebooks) and build the inverted lists."""
+        n, dim = Xn.shape
+        self.Xn = Xn
+        if self.nlist is None:
+            self.nlist = max(1, int(4 * np.sqrt(n)))
+        if self.pq_m and dim % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} must divide the embedding dim {dim}")
+
+        sample = self._train_sample(Xn)
+        self.centroids = _kmeans(sample, self.nlist, self.n_iter, self.seed, spherical=True)
+        self.nlist = self.centroids.shape[0]
+
+        assign = _assign(Xn, self.centroids, spherical=True)
+        order = np.argsort(assign, kind="stable")
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=self.nlist), out=self.list_offsets[1:])
+
+        if self.pq_m:
+            self._fit_pq(sample, assign, order)
+        return self
+
+    def _fit_pq(self, sample: np.ndarray, assign: np.ndarray, order: np.ndarray):
+        dsub = sample.shape[1] // self.pq_m
+        if sample.shape[0] > PQ_TRAIN_SIZE:
+            rng = np.random.default_rng(self.seed)
+            sample = sample[rng.choice(sample.shape[0], size=PQ_TRAIN_SIZE, replace=False)]
+        sample_res = sample - self.centroids[_assign(sample, self.centroids, spherical=True)]
+        self.codebooks = np.stack([
+            _kmeans(sample_res[:, m * dsub:(m + 1) * dsub], 256, self.n_iter, self.seed + m)
+            for m in range(self.pq_m)
+        ])
+        self.codes = np.empty((len(order), self.pq_m), dtype=np.uint8)
+        for lo in range(0, len(order), 65536):
+            rows = order[lo:lo + 65536]
+            res = np.asarray(self.Xn[rows], dtype=np.float32) - self.centroids[assign[rows]]
+            for m in range(self.pq_m):
+                self.codes[lo:lo + len(rows), m] = _assign(
+                    res[:, m * dsub:(m + 1) * dsub], self.codebooks[m], spherical=False
+                )
+
+    def search(
+        self, q: np.ndarray, k: int, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k (ids, inner-product scores) for a unit query vector."""
+        if self.centroids is None:
+            raise RuntimeError("Call fit() or load() before search()")
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        c_sims = self.centroids @ q
+        probe = np.argpartition(-c_sims, nprobe - 1)[:nprobe]
+
+        spans = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe]
+        pos = np.concatenate([np.arange(lo, hi) for lo, hi in spans]) if spans else np.zeros(0, np.int64)
+        if not len(pos):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = self.list_ids[pos]
+
+        if self.codes is not None:
+            # Asymmetric distance: q.x = q.c + sum_m q_m . codebook_m[code_m]
+            dsub = q.shape[0] // self.pq_m
+            tables = np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.pq_m, dsub))
+            base = np.repeat(c_sims[probe], [hi - lo for lo, hi in spans])
+            approx = base + tables[np.arange(self.pq_m), self.codes[pos]].sum(axis=1)
+            n_refine = min(len(ids), k * self.refine)
+            keep = np.argpartition(-approx, n_refine - 1)[:n_refine]
+            ids = ids[keep]
+
+        sims = np.asarray(self.Xn[ids], dtype=np.float32) @ q
+        k = min(k, len(ids))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return ids[top], sims[top]
+
+    def save(self, path: PathLike, key: Optional[str] = None):
+        """Persist the trained index (vectors themselves stay with the corpus)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "centroids.npy", self.centroids)
+        np.save(path / "list_offsets.npy", self.list_offsets)
+        np.save(path / "list_ids.npy", self.list_ids)
+        if self.codes is not None:
+            np.save(path / "codebooks.npy", self.codebooks)
+            np.save(path / "codes.npy", self.codes)
+        meta = {
+            "key": key,
+            "n": int(self.Xn.shape[0]),
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "pq_m": self.pq_m,
+            "refine": self.refine,
+        }
+        with open(path / "ivf.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(
+        cls, path: PathLike, Xn: np.ndarray, key: Optional[str] = None
+    ) -> Optional["IVFIndex"]:
+        """Open a saved index over ``Xn``; None if missing or built for another corpus."""
+        path = Path(path)
+        try:
+            with open(path / "ivf.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("key") != key or meta.get("n") != Xn.shape[0]:
+            return None
+
+        index = cls(nlist=meta["nlist"], nprobe=meta["nprobe"], pq_m=meta["pq_m"], refine=meta["refine"])
+        index.Xn = Xn
+        index.centroids = np.load(path / "centroids.npy")
+        index.list_offsets = np.load(path / "list_offsets.npy")
+        index.list_ids = np.load(path / "list_ids.npy", mmap_mode="r")
+        if index.pq_m:
+            index.codebooks = np.load(path / "codebooks.npy")
+            index.codes = np.load(path / "codes.npy", mmap_mode="r")
+        return index
+
+
+def recall_at_k(
+    index: IVFIndex,
+    Xn: np.ndarray,
+    queries: np.ndarray,
+    k: int = 200,
+    nprobe_values: Sequence[int] = (1, 4, 8, 16, 32, 64),
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k of the ANN index against exact search, with mean latency per query.
+
+    Returns one row per ``nprobe`` plus an ``"exact"`` baseline row, so settings
+    can be picked from measured recall/latency rather than guessed.
+    """
+    exact, t0 = [], time.perf_counter()
+    for q in queries:
+        sims = Xn @ q
+        exact.append(set(np.argsort(sims)[::-1][:k].tolist()))
+    rows = [{
+        "nprobe": "exact",
+        "recall": 1.0,
+        "latency_ms": (time.perf_counter() - t0) * 1000 / len(queries),
+    }]
+
+    for nprobe in nprobe_values:
+        hits, t0 = 0, time.perf_counter()
+        found = [index.search(q, k, nprobe=nprobe)[0] for q in queries]
+        latency = (time.perf_counter() - t0) * 1000 / len(queries)
+        for ids, truth in zip(found, exact):
+            hits += len(truth.intersection(ids.tolist()))
+        rows.append({
+            "nprobe": nprobe,
+            "recall": hits / sum(len(t) for t in exact),
+            "latency_ms": latency,
+        })
+    return rows
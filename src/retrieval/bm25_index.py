@@ -0,0 +1,370 @@
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..instrumentation import count
+
+class BM25Index:
+    """
+    Inverted-index BM25 (Okapi) engine.
+
+    ``rank_bm25.BM25Okapi.get_scores`` walks every document for every query
+    token in pure Python. This index stores postings as flat CSR arrays
+    (``term_offsets`` into ``post_docs``/``post_tfs``) with IDF and per-document
+    length norms precomputed at fit time, so a query only touches the postings
+    of its own terms and scoring is vectorized NumPy.
+
+    Scores are bit-for-bit identical to ``BM25Okapi`` (same IDF floor, same
+    floating point evaluation order), and ``top_k`` returns the same ordering as
+    a stable descending sort over the full score vector.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab: Dict[str, int] = {}
+        self.idf: np.ndarray = np.zeros(0, dtype=np.float64)
+        self.term_offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.post_docs: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.post_tfs: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.doc_len: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.doc_norm: np.ndarray = np.zeros(0, dtype=np.float64)
+        self.avgdl: float = 0.0
+        self.average_idf: float = 0.0
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vocab: Dict[str, int],
+        term_offsets: np.ndarray,
+        post_docs: np.ndarray,
+        post_tfs: np.ndarray,
+        doc_len: np.ndarray,
+        idf: np.ndarray,
+        avgdl: float,
+        average_idf: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        """Rebuild a fitted index from its flat arrays (e.g. memory-mapped from disk)."""
+        index = cls(k1=k1, b=b, epsilon=epsilon)
+        index.vocab = vocab
+        index.term_offsets = term_offsets
+        index.post_docs = post_docs
+        index.post_tfs = post_tfs
+        index.doc_len = doc_len
+        index.idf = idf
+        index.avgdl = avgdl
+        index.average_idf = average_idf
+        index._calc_norms()
+        return index
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    def fit(self, corpus: List[List[str]]) -> "BM25Index":
+        """Build postings, IDF and length norms from tokenized documents."""
+        vocab: Dict[str, int] = {}
+        df: List[int] = []
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_len = np.zeros(len(corpus), dtype=np.int32)
+        num_tokens = 0
+
+        for d, doc in enumerate(corpus):
+            doc_len[d] = len(doc)
+            num_tokens += len(doc)
+            # Term ids are assigned in first-appearance order, matching the
+            # iteration order BM25Okapi uses when summing IDFs.
+            for tok, tf in Counter(doc).items():
+                tid = vocab.get(tok)
+                if tid is None:
+                    tid = vocab[tok] = len(df)
+                    df.append(0)
+                df[tid] += 1
+                term_ids.append(tid)
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        term_arr = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_arr, kind="stable")
+        counts = np.bincount(term_arr, minlength=len(df))
+
+        self.vocab = vocab
+        self.term_offsets = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.term_offsets[1:])
+        self.post_docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.post_tfs = np.asarray(tfs, dtype=np.int32)[order]
+        self.doc_len = doc_len
+        self.avgdl = num_tokens / len(corpus) if len(corpus) else 0.0
+        self.idf = self._calc_idf(df, len(corpus))
+        self._calc_norms()
+        return self
+
+    def subset(self, docs: np.ndarray) -> "BM25Index":
+        """
+        Index over the given (sorted) doc ids only, renumbered 0..len(docs)-1.
+
+        IDF, average length and norms stay those of this whole index, so a
+        partition of the corpus into subsets (e.g. shards) scores every
+        document exactly as this index does.
+        """
+        docs = np.asarray(docs, dtype=np.int64)
+        local = np.full(self.n_docs, -1, dtype=np.int64)
+        local[docs] = np.arange(len(docs))
+        df = np.diff(np.asarray(self.term_offsets))
+        new_docs = local[np.asarray(self.post_docs)]
+        keep = new_docs >= 0
+        counts = np.bincount(np.repeat(np.arange(len(df)), df)[keep], minlength=len(df))
+        present = counts > 0
+        new_ids = np.cumsum(present) - 1
+
+        index = BM25Index(self.k1, self.b, self.epsilon)
+        index.vocab = {term: int(new_ids[tid]) for term, tid in self.vocab.items() if present[tid]}
+        index.term_offsets = np.zeros(int(present.sum()) + 1, dtype=np.int64)
+        np.cumsum(counts[present], out=index.term_offsets[1:])
+        index.post_docs = new_docs[keep].astype(np.int32)
+        index.post_tfs = np.asarray(self.post_tfs)[keep]
+        index.doc_len = np.asarray(self.doc_len)[docs]
+        index.idf = np.asarray(self.idf)[present]
+        index.avgdl = self.avgdl
+        index.average_idf = self.average_idf
+        index._calc_norms()
+        return index
+
+    def _calc_idf(self, df: List[int], n_docs: int) -> np.ndarray:
+        """IDF with BM25Okapi's floor: negative values become eps * mean IDF."""
+        idf = np.empty(len(df), dtype=np.float64)
+        idf_sum = 0.0
+        for tid, freq in enumerate(df):
+            val = math.log(n_docs - freq + 0.5) - math.log(freq + 0.5)
+            idf[tid] = val
+            idf_sum += val
+        self.average_idf = idf_sum / len(df) if len(df) else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        return idf
+
+    def _calc_norms(self):
+        if self.avgdl:
+            self.doc_norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+        else:
+            self.doc_norm = np.zeros(len(self.doc_len), dtype=np.float64)
+
+    def _postings(
+        self, query_tokens: List[str], mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated (doc id, contribution) pairs for every known query token (docs in ``mask`` only)."""
+        docs, contribs = [], []
+        for tok in query_tokens:
+            tid = self.vocab.get(tok)
+            if tid is None:
+                continue
+            lo, hi = self.term_offsets[tid], self.term_offsets[tid + 1]
+            d = self.post_docs[lo:hi]
+            tf = self.post_tfs[lo:hi]
+            if mask is not None:
+                keep = mask[d]
+                d, tf = d[keep], tf[keep]
+            tf = tf.astype(np.float64)
+            docs.append(d)
+            contribs.append(self.idf[tid] * (tf * (self.k1 + 1) / (tf + self.doc_norm[d])))
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        return np.concatenate(docs), np.concatenate(contribs)
+
+    def score_candidates(
+        self, query_tokens: List[str], mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score only documents that contain at least one query token.
+
+        Returns sorted unique doc ids and their scores. Contributions are summed
+        per document in query-token order, as ``BM25Okapi`` does. With a boolean
+        ``mask`` (a metadata filter), postings of other documents are dropped
+        before any scoring work.
+        """
+        docs, contribs = self._postings(query_tokens, mask)
+        if not len(docs):
+            return docs.astype(np.int64), contribs
+        cand, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=contribs, minlength=len(cand))
+        return cand.astype(np.int64), scores
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """Dense score vector over all documents (``BM25Okapi.get_scores`` equivalent)."""
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        cand, cand_scores = self.score_candidates(query_tokens)
+        scores[cand] = cand_scores
+        return scores
+
+    def top_k(
+        self, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k doc ids and scores, ordered by score desc then doc id asc.
+
+        Matches ``sorted(range(n), key=scores.__getitem__, reverse=True)[:k]``,
+        including zero-score documents when fewer than k documents match.
+        Only documents flagged in ``mask`` are returned, if given.
+        """
+        cand, scores = self.score_candidates(query_tokens, mask)
+        return rank_candidates(cand, scores, k, self.n_docs, None if mask is None else ~mask)
+
+
+def rank_candidates(
+    cand: np.ndarray,
+    scores: np.ndarray,
+    k: int,
+    n_docs: int,
+    dead: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k of sorted candidate ids/scores over ``n_docs`` documents, as ``BM25Index.top_k``.
+
+    Documents outside ``cand`` score zero and pad the result in doc id order;
+    documents flagged in the boolean ``dead`` mask are never returned.
+    """
+    count("bm25_candidates", len(cand))
+    n_dead = int(dead.sum()) if dead is not None else 0
+    k = min(k, n_docs - n_dead)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    pos = scores > 0
+    p_docs, p_scores = cand[pos], scores[pos]
+    if len(p_docs) > k:
+        # Keep everything tied with the k-th score so ties resolve by doc id.
+        kth = np.partition(p_scores, len(p_scores) - k)[len(p_scores) - k]
+        keep = p_scores >= kth
+        p_docs, p_scores = p_docs[keep], p_scores[keep]
+    order = np.lexsort((p_docs, -p_scores))[:k]
+    out_docs, out_scores = [p_docs[order]], [p_scores[order]]
+
+    need = k - len(order)
+    if need > 0:
+        # Zero-scored documents follow in doc id order; the first `need` of
+        # them lie below need + (number of non-zero candidates and dead docs).
+        nonzero = cand[scores != 0]
+        span = np.arange(min(n_docs, need + len(nonzero) + n_dead), dtype=np.int64)
+        skip = np.isin(span, nonzero, assume_unique=True)
+        if dead is not None:
+            skip |= dead[span]
+        zeros = span[~skip][:need]
+        out_docs.append(zeros)
+        out_scores.append(np.zeros(len(zeros), dtype=np.float64))
+        need -= len(zeros)
+    if need > 0:
+        neg = scores < 0
+        n_docs_neg, n_scores = cand[neg], scores[neg]
+        order = np.lexsort((n_docs_neg, -n_scores))[:need]
+        out_docs.append(n_docs_neg[order])
+        out_scores.append(n_scores[order])
+
+    return np.concatenate(out_docs), np.concatenate(out_scores)
+
+
+class SegmentedBM25:
+    """
+    BM25 over several ``BM25Index`` segments with tombstoned documents.
+
+    Incremental corpus updates append small delta segments instead of refitting
+    the base index, and deletions only flag rows in ``dead``. Scores use
+    statistics of the live documents across all segments (document count,
+    average length, per-term document frequency), so results match a single
+    index fitted on the live documents, up to floating point summation order.
+    Doc ids are global: segment rows are numbered consecutively.
+    """
+
+    def __init__(self, segments: Sequence[BM25Index], dead: Optional[np.ndarray] = None):
+        if not segments:
+            raise ValueError("SegmentedBM25 needs at least one segment")
+        base = segments[0]
+        self.k1, self.b, self.epsilon = base.k1, base.b, base.epsilon
+        self.offsets = np.cumsum([0] + [seg.n_docs for seg in segments])
+        self.dead = dead if dead is not None and dead.any() else None
+        if self.dead is not None and len(self.dead) != self.offsets[-1]:
+            raise ValueError("Tombstone mask is not aligned with the segments")
+
+        vocab: Dict[str, int] = {}
+        local_to_global = []
+        for seg in segments:
+            ids = np.empty(len(seg.vocab), dtype=np.int64)
+            for term, tid in seg.vocab.items():
+                ids[tid] = vocab.setdefault(term, len(vocab))
+            local_to_global.append(ids)
+
+        df = np.zeros(len(vocab), dtype=np.int64)
+        n_live, n_tokens = 0, 0
+        for seg, ids, lo in zip(segments, local_to_global, self.offsets):
+            seg_df = np.diff(np.asarray(seg.term_offsets))
+            doc_len = np.asarray(seg.doc_len)
+            if self.dead is not None:
+                seg_dead = self.dead[lo:lo + seg.n_docs]
+                if seg_dead.any():
+                    term_of_posting = np.repeat(np.arange(len(seg_df)), seg_df)
+                    seg_df = seg_df - np.bincount(
+                        term_of_posting[seg_dead[np.asarray(seg.post_docs)]], minlength=len(seg_df)
+                    )
+                    doc_len = doc_len[~seg_dead]
+            df += np.bincount(ids, weights=seg_df, minlength=len(vocab)).astype(np.int64)
+            n_live += len(doc_len)
+            n_tokens += int(doc_len.sum())
+
+        # Terms that only occur in dead documents don't exist for the live
+        # corpus; they are left out of the IDF average, as a refit would.
+        present = df > 0
+        stats = BM25Index(self.k1, self.b, self.epsilon)
+        idf = np.zeros(len(vocab), dtype=np.float64)
+        idf[present] = stats._calc_idf(df[present].tolist(), n_live)
+        self.avgdl = n_tokens / n_live if n_live else 0.0
+        self.average_idf = stats.average_idf
+
+        self.segments = [
+            BM25Index.from_arrays(
+                vocab=seg.vocab,
+                term_offsets=seg.term_offsets,
+                post_docs=seg.post_docs,
+                post_tfs=seg.post_tfs,
+                doc_len=seg.doc_len,
+                idf=idf[ids],
+                avgdl=self.avgdl,
+                average_idf=self.average_idf,
+                k1=self.k1, b=self.b, epsilon=self.epsilon,
+            )
+            for seg, ids in zip(segments, local_to_global)
+        ]
+
+    @property
+    def n_docs(self) -> int:
+        return int(self.offsets[-1])
+
+    def score_candidates(
+        self, query_tokens: List[str], mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted live doc ids containing a query token (and flagged in ``mask``), and their scores."""
+        cands, scores = [], []
+        for seg, lo in zip(self.segments, self.offsets):
+            c, s = seg.score_candidates(query_tokens, None if mask is None else mask[lo:lo + seg.n_docs])
+            cands.append(c + lo)
+            scores.append(s)
+        cand, score = np.concatenate(cands), np.concatenate(scores)
+        if self.dead is not None:
+            live = ~self.dead[cand]
+            cand, score = cand[live], score[live]
+        return cand, score
+
+    def top_k(
+        self, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """``BM25Index.top_k`` over the live documents of every segment."""
+        cand, scores = self.score_candidates(query_tokens, mask)
+        excluded = self.dead
+        if mask is not None:
+            excluded = ~mask if excluded is None else excluded | ~mask
+        return rank_candidates(cand, scores, k, self.n_docs, excluded)
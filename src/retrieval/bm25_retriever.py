@@ -1,15 +1,34 @@
 import os
 import pickle
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Optional, Tuple
+
+import numpy as np
 from rank_bm25 import BM25Okapi
 from langchain_core.documents import Document
 
+from ..instrumentation import count, stage
+from .bm25_index import BM25Index
+from .hits import Hit, source_hits
+
+BM25_BACKENDS = ("native", "rank_bm25")
+
 class BM25Retriever:
-    def __init__(self):
+    def __init__(self, backend: str = "native"):
+        """
+        Args:
+            backend: "native" for the inverted-index ``BM25Index`` engine, or
+                "rank_bm25" for the reference ``BM25Okapi`` full-corpus scorer.
+                Both produce identical scores.
+        """
+        if backend not in BM25_BACKENDS:
+            raise ValueError(f"Unknown BM25 backend {backend!r}; expected one of {BM25_BACKENDS}")
+        self.backend = backend
         self.bm25 = None
         self.docs: List[Document] = []
         self.doc_tokens: List[List[str]] = []
+        # Row in ``docs`` of each indexed document; None when every row is indexed.
+        self.rows: Optional[np.ndarray] = None
 
     @staticmethod
     def clean_and_tokenize(text: str) -> List[str]:
@@ -24,29 +43,54 @@ class BM25Retriever:
         chunks: List[Document],
         cache_path: Optional[str] = None,
         cache_key: Optional[str] = None,
+        dead: Optional[np.ndarray] = None,
     ):
         """
         Index document chunks.
 
+        Rows flagged in ``dead`` are left out of the index, so IDF and
+        document lengths are those of the live rows (as with a fresh rebuild);
+        results are still rows of ``chunks``.
+
         Fitting BM25 means tokenizing every chunk and building the BM25Okapi
         index, which is wasted work on every cold process start. When a
         ``cache_path`` is given, the fitted index is persisted and reused across
         process starts as long as ``cache_key`` (typically derived from the
         chunks file's stat) still matches.
         """
+        if dead is not None and len(dead) != len(chunks):
+            raise ValueError("Dead-row mask is not aligned with chunks")
         self.docs = chunks
+        self.rows = np.flatnonzero(~dead) if dead is not None and dead.any() else None
+        live = chunks if self.rows is None else [chunks[int(row)] for row in self.rows]
 
-        if cache_path and self._load_cache(cache_path, cache_key, len(chunks)):
+        if cache_path and self._load_cache(cache_path, cache_key, len(live)):
             return
 
         self.doc_tokens = [
-            self.clean_and_tokenize(d.page_content) for d in chunks
+            self.clean_and_tokenize(d.page_content) for d in live
         ]
-        self.bm25 = BM25Okapi(self.doc_tokens)
+        if self.backend == "native":
+            self.bm25 = BM25Index().fit(self.doc_tokens)
+            # Postings hold everything search needs; don't keep the token lists.
+            self.doc_tokens = []
+        else:
+            self.bm25 = BM25Okapi(self.doc_tokens)
 
         if cache_path:
             self._save_cache(cache_path, cache_key)
 
+    def fit_index(self, chunks: List[Document], index: BM25Index):
+        """Adopt a prebuilt native index (e.g. memory-mapped from a ``CorpusStore``)."""
+        if self.backend != "native":
+            raise ValueError("Prebuilt indexes are only supported by the native backend")
+        if index.n_docs != len(chunks):
+            raise ValueError("BM25 index is not aligned with chunks")
+        self.docs = chunks
+        self.doc_tokens = []
+        self.rows = None  # the index skips its own tombstones
+        self.bm25 = index
+
     def _load_cache(
         self, cache_path: str, cache_key: Optional[str], n_docs: int
     ) -> bool:
@@ -61,7 +105,7 @@ class BM25Retriever:
 
         if cached.get("cache_key") != cache_key:
             return False
-        if len(cached.get("doc_tokens", [])) != n_docs:
+        if cached.get("backend") != self.backend or cached.get("n_docs") != n_docs:
             return False
 
         self.doc_tokens = cached["doc_tokens"]
@@ -78,6 +122,8 @@ class BM25Retriever:
             pickle.dump(
                 {
                     "cache_key": cache_key,
+                    "backend": self.backend,
+                    "n_docs": len(self.docs) if self.rows is None else len(self.rows),
                     "doc_tokens": self.doc_tokens,
                     "bm25": self.bm25,
                 },
@@ -85,19 +131,28 @@ class BM25Retriever:
             )
         os.replace(tmp_path, cache_path)
     
-    def search(self, query: str, top_k: int = 200) -> List[Dict[str, Any]]:
-        """Retrieve top-k chunks by BM25 score"""
+    def search_rows(
+        self, query: str, top_k: int = 200, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and BM25 scores of the top-k chunks (among rows flagged in ``mask``), best first"""
         if not self.bm25:
             raise RuntimeError("Call fit() before search()")
         
-        q_tokens = self.clean_and_tokenize(query)
-        scores = self.bm25.get_scores(q_tokens)
-        top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
-        
-        return [{
-            "rank": rank,
-            "bm25_score": float(scores[i]),
-            "resume_id": self.docs[i].metadata.get("resume_id"),
-            "chunk_id": self.docs[i].metadata.get("chunk_id"),
-            "preview": self.docs[i].page_content[:400]
-        } for rank, i in enumerate(top_idx, 1)]
\ No newline at end of file
+        if self.rows is not None and mask is not None:
+            mask = mask[self.rows]
+        with stage("bm25"):
+            q_tokens = self.clean_and_tokenize(query)
+            if self.backend == "native":
+                ids, scores = self.bm25.top_k(q_tokens, top_k, mask=mask)
+            else:
+                all_scores = self.bm25.get_scores(q_tokens)
+                candidates = range(len(all_scores)) if mask is None else np.flatnonzero(mask).tolist()
+                count("bm25_candidates", len(candidates))
+                top_idx = sorted(candidates, key=lambda i: all_scores[i], reverse=True)[:top_k]
+                ids = np.asarray(top_idx, dtype=np.int64)
+                scores = np.asarray([all_scores[i] for i in top_idx], dtype=np.float64)
+        return (ids, scores) if self.rows is None else (self.rows[ids], scores)
+
+    def search(self, query: str, top_k: int = 200, mask: Optional[np.ndarray] = None) -> List[Hit]:
+        """Retrieve top-k chunks by BM25 score"""
+        return source_hits("bm25", *self.search_rows(query, top_k, mask=mask), self.docs)
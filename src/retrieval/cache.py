@@ -0,0 +1,283 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathLike = Union[str, Path]
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used in cache keys."""
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    """Thread-safe bounded mapping with least-recently-used eviction and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteStore:
+    """
+    Key -> blob table in a SQLite file.
+
+    WAL mode lets many worker processes read while one writes, so every process
+    on a host shares entries and they survive restarts. The connection is
+    opened on first use in each process: one inherited across ``fork`` (e.g.
+    by pre-forked service workers) must not be used by the child.
+    """
+
+    def __init__(self, path: PathLike, table: str):
+        self.path = Path(path)
+        self.table = table
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection; call with ``_lock`` held."""
+        if self._pid != os.getpid():
+            # The parent's connection (if any) is left unclosed: closing it
+            # here would touch the parent's locks and WAL state.
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _locked(self) -> threading.Lock:
+        if self._pid is not None and self._pid != os.getpid():
+            # A lock held by another thread at fork time stays held in the child.
+            self._lock = threading.Lock()
+            self._pid = None
+        return self._lock
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._locked():
+            row = self._connection().execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        with self._locked():
+            conn = self._connection()
+            # Stay well under SQLite's bound-parameter limit.
+            for lo in range(0, len(keys), 500):
+                batch = list(keys[lo:lo + 500])
+                marks = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", batch
+                ).fetchall())
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        with self._locked():
+            conn = self._connection()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)", items
+            )
+            conn.commit()
+
+    def put(self, key: str, value: bytes):
+        self.put_many([(key, value)])
+
+    def clear(self):
+        with self._locked():
+            conn = self._connection()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+
+    def prune(self, max_entries: int):
+        """Delete all but the ``max_entries`` most recently written entries."""
+        with self._locked():
+            conn = self._connection()
+            # INSERT OR REPLACE gives a rewritten key a new rowid, so rowid order is write order.
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE rowid <= "
+                f"(SELECT rowid FROM {self.table} ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (max_entries,),
+            )
+            conn.commit()
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of normalized query embeddings.
+
+    Recruiters repeat the same queries all day, and each miss is an embeddings
+    API round-trip. Entries are keyed on (model name, normalized query text):
+    an in-process LRU answers hot queries, and an optional SQLite file shared
+    by all worker processes on the host backs it across restarts.
+    """
+
+    def __init__(self, maxsize: int = 10_000, path: Optional[PathLike] = None):
+        self.memory = LRUCache(maxsize)
+        self.disk = SqliteStore(path, "query_embeddings") if path else None
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(model_name: str, query: str) -> str:
+        return hashlib.sha1(f"{model_name}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        key = self.key(model_name, query)
+        vec = self.memory.get(key)
+        if vec is None and self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                vec = np.frombuffer(blob, dtype=np.float32)
+                self.memory.put(key, vec)
+                self.disk_hits += 1
+        return vec
+
+    def put(self, model_name: str, query: str, vec: np.ndarray):
+        key = self.key(model_name, query)
+        vec = np.asarray(vec, dtype=np.float32)
+        self.memory.put(key, vec)
+        if self.disk is not None:
+            self.disk.put(key, vec.tobytes())
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters: memory and disk hits, and misses that went to the API."""
+        return {
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.memory.misses - self.disk_hits,
+            "size": len(self.memory),
+        }
+
+
+class ScoreCache:
+    """
+    Bounded cache of cross-encoder scores.
+
+    Repeated and paginated queries rerank the same (query, chunk) pairs, and
+    the cross-encoder is the most expensive CPU stage. Scores are keyed on a
+    hash of (corpus version, model name, normalized query, resume_id,
+    chunk_id), held in an in-process LRU and optionally persisted to SQLite.
+
+    Keys include the corpus version, since a chunk id may refer to different
+    text in another version. The disk tier is shared by processes that may be
+    on different versions (workers mid-refresh, a CLI next to the service), so
+    a version change never clears it; it is pruned to the ``max_disk_entries``
+    most recently written scores instead.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        path: Optional[PathLike] = None,
+        corpus_version: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.memory = LRUCache(maxsize)
+        self.disk = SqliteStore(path, "ce_scores") if path else None
+        self.max_disk_entries = max_disk_entries
+        self.disk_hits = 0
+        self.corpus_version: Optional[str] = None
+        self.set_corpus_version(corpus_version)
+
+    def set_corpus_version(self, corpus_version: Optional[str]):
+        """Make ``corpus_version`` the default version of keys; scores of other versions age out."""
+        version = corpus_version or ""
+        if self.corpus_version is not None and version == self.corpus_version:
+            return
+        self.memory.clear()
+        if self.disk is not None and self.max_disk_entries is not None:
+            self.disk.prune(self.max_disk_entries)
+        self.corpus_version = version
+
+    def key(
+        self, model_name: str, query: str, resume_id: Any, chunk_id: Any, corpus_version: Optional[str] = None
+    ) -> str:
+        """Entry key; ``corpus_version`` (default: the cache's current one) is the version the chunk ids refer to."""
+        version = self.corpus_version if corpus_version is None else corpus_version
+        raw = f"{version}\0{model_name}\0{normalize_query(query)}\0{resume_id}\0{chunk_id}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get_many(
+        self,
+        model_name: str,
+        query: str,
+        chunk_keys: Sequence[Tuple[Any, Any]],
+        corpus_version: Optional[str] = None,
+    ) -> List[Optional[float]]:
+        """Cached score per (resume_id, chunk_id), None for misses."""
+        keys = [self.key(model_name, query, rid, cid, corpus_version) for rid, cid in chunk_keys]
+        scores = [self.memory.get(k) for k in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing and self.disk is not None:
+            found = self.disk.get_many([keys[i] for i in missing])
+            for i in missing:
+                blob = found.get(keys[i])
+                if blob is not None:
+                    scores[i] = float(np.frombuffer(blob, dtype=np.float64)[0])
+                    self.memory.put(keys[i], scores[i])
+                    self.disk_hits += 1
+        return scores
+
+    def put_many(
+        self,
+        model_name: str,
+        query: str,
+        items: Sequence[Tuple[Tuple[Any, Any], float]],
+        corpus_version: Optional[str] = None,
+    ):
+        entries = [
+            (self.key(model_name, query, rid, cid, corpus_version), float(score)) for (rid, cid), score in items
+        ]
+        for key, score in entries:
+            self.memory.put(key, score)
+        if self.disk is not None and entries:
+            self.disk.put_many((key, np.float64(score).tobytes()) for key, score in entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters: memory and disk hits, and misses sent to the model."""
+        return {
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.memory.misses - self.disk_hits,
+            "size": len(self.memory),
+        }
@@ -1,6 +1,25 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 from langchain_core.documents import Document
 
+if TYPE_CHECKING:
+    from .metadata_index import MetadataIndex
+
+
+def chunk_keys(chunks: Sequence[Document]) -> Iterable[Tuple[Any, Any]]:
+    """(resume_id, chunk_id) per chunk, read from columns when the sequence has them."""
+    if hasattr(chunks, "keys"):
+        return chunks.keys()
+    return ((c.metadata.get("resume_id"), c.metadata.get("chunk_id")) for c in chunks)
+
+
+def chunk_column(chunks: Sequence[Document], key: str) -> Iterable[Any]:
+    """One metadata value per chunk (None where missing), read from columns when the sequence has them."""
+    if hasattr(chunks, "column"):
+        return chunks.column(key)
+    return (c.metadata.get(key) for c in chunks)
+
 
 class ChunkIndex:
     """
@@ -9,26 +28,82 @@ class ChunkIndex:
     Built once from the full chunk list and reused across every query, replacing
     the per-query linear scans (`next(c for c in all_chunks if ...)`) that made
     reranking and summarization O(candidates x chunks).
+
+    The index maps keys to row numbers rather than holding Documents, so it can
+    sit over a lazily materialized sequence (e.g. ``CorpusStore.chunks()``)
+    without loading every chunk's text.
+
+    Rows flagged in the boolean ``dead`` mask (tombstoned by an incremental
+    corpus update) are left out. ``version`` names the corpus version the rows
+    belong to; cross-encoder scores computed over them are cached under it.
+
+    The ``cluster_id`` metadata written by ``data/chunker.py`` groups
+    near-duplicate resumes; ``cluster_of`` exposes it so duplicates can be
+    collapsed before reranking and summarization.
     """
 
-    def __init__(self, chunks: List[Document]):
+    def __init__(
+        self, chunks: Sequence[Document], dead: Optional[np.ndarray] = None, version: Optional[str] = None
+    ):
         self.chunks = chunks
-        self._by_key: Dict[Tuple[Any, Any], Document] = {}
-        self._by_resume: Dict[Any, List[Document]] = {}
+        self.dead = dead
+        self.version = version
+        self._metadata = None
+        self._by_key: Dict[Tuple[Any, Any], int] = {}
+        self._by_resume: Dict[Any, List[int]] = {}
+        # Only resumes clustered under another resume's id are stored.
+        self._cluster: Dict[Any, Any] = {}
 
-        for c in chunks:
-            rid = c.metadata.get("resume_id")
-            cid = c.metadata.get("chunk_id")
-            self._by_key[(rid, cid)] = c
-            self._by_resume.setdefault(rid, []).append(c)
+        for row, ((rid, cid), cluster) in enumerate(zip(chunk_keys(chunks), chunk_column(chunks, "cluster_id"))):
+            if dead is not None and dead[row]:
+                continue
+            self._by_key[(rid, cid)] = row
+            self._by_resume.setdefault(rid, []).append(row)
+            if cluster is not None and cluster != rid:
+                self._cluster[rid] = cluster
+
+    def row(self, resume_id: Any, chunk_id: Any) -> Optional[int]:
+        """Return the row of a (resume_id, chunk_id) pair in the chunk list, or None."""
+        return self._by_key.get((resume_id, chunk_id))
 
     def get(self, resume_id: Any, chunk_id: Any) -> Optional[Document]:
         """Return the chunk for a (resume_id, chunk_id) pair, or None."""
-        return self._by_key.get((resume_id, chunk_id))
+        row = self._by_key.get((resume_id, chunk_id))
+        return self.chunks[row] if row is not None else None
+
+    def resume_ids(self) -> List[Any]:
+        """Every resume id in the index."""
+        return list(self._by_resume)
+
+    @property
+    def metadata(self) -> "MetadataIndex":
+        """Bitmap indexes over the chunk metadata (see ``MetadataIndex``), built on first use."""
+        if self._metadata is None:
+            from .metadata_index import MetadataIndex
+
+            self._metadata = MetadataIndex(self.chunks, self.dead)
+        return self._metadata
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows matching the search ``filters`` (None without filters)."""
+        return self.metadata.mask(filters) if filters else None
+
+    @property
+    def clustered(self) -> bool:
+        """Whether any resume is a near-duplicate of another."""
+        return bool(self._cluster)
+
+    def cluster_of(self, resume_id: Any) -> Any:
+        """Near-duplicate cluster id of a resume (the resume id itself if it has no duplicates)."""
+        return self._cluster.get(resume_id, resume_id)
+
+    def resume_rows(self, resume_id: Any) -> List[int]:
+        """Rows of a resume's chunks (in original order)."""
+        return list(self._by_resume.get(resume_id, []))
 
     def resume_chunks(self, resume_id: Any) -> List[Document]:
         """Return all chunks belonging to a resume (in original order)."""
-        return self._by_resume.get(resume_id, [])
+        return [self.chunks[row] for row in self._by_resume.get(resume_id, [])]
 
     def resume_text(self, resume_id: Any) -> str:
         """Return the full resume text, joined from its chunks."""
@@ -0,0 +1,366 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .bm25_index import BM25Index
+
+FORMAT_VERSION = 2
+# Version 1 stores have one embedding row per chunk and no vector_ids.npy.
+READABLE_VERSIONS = (1, 2)
+MANIFEST_NAME = "manifest.json"
+
+PathLike = Union[str, Path]
+
+
+class StoredChunks(Sequence):
+    """
+    Read-only chunk sequence backed by a ``CorpusStore``.
+
+    Text lives in a memory-mapped arena and metadata in columnar arrays, so
+    nothing is deserialized up front; a ``Document`` is built only when a row is
+    accessed.
+    """
+
+    def __init__(self, store: "CorpusStore"):
+        self._store = store
+
+    def __len__(self) -> int:
+        return self._store.n_chunks
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return Document(page_content=self._store.text(i), metadata=self._store.metadata(i))
+
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def keys(self) -> Iterator[Tuple[Any, Any]]:
+        """(resume_id, chunk_id) per row, read from the metadata columns only."""
+        return zip(self._store.column("resume_id"), self._store.column("chunk_id"))
+
+    def column(self, key: str) -> List[Any]:
+        """One metadata value per row (None where missing)."""
+        return self._store.column(key)
+
+
+class CorpusStore:
+    """
+    Versioned, pickle-free on-disk corpus.
+
+    Loading the pickled chunk list and embedding matrix costs every process a
+    full deserialization and a private copy of the same read-only data. A store
+    directory instead holds flat arrays that are opened with ``np.load(...,
+    mmap_mode="r")``, so opening is near-instant and the pages are shared
+    through the OS page cache by every process serving the same corpus:
+
+    - ``embeddings.npy``: L2-normalized float32 matrix of distinct vectors
+      (n_vectors x dim)
+    - ``vector_ids.npy``: row of ``embeddings.npy`` for every chunk; only
+      present when chunks share vectors (duplicate text)
+    - ``text.bin`` + ``text_offsets.npy``: UTF-8 string arena of chunk texts
+    - ``meta_<key>.npy`` (int columns) or ``meta_<key>.codes.npy`` +
+      ``meta_<key>.values.json`` (dictionary-encoded columns, -1 = missing)
+    - ``bm25_*.npy`` + ``bm25_vocab.json``: the ``BM25Index`` CSR postings
+    - ``manifest.json``: format version, shapes, column kinds, BM25 parameters
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+
+        version = self.manifest.get("format_version")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(
+                f"Unsupported corpus store version {version!r} at {self.path} "
+                f"(expected {FORMAT_VERSION}); rebuild it with scripts/convert_corpus.py"
+            )
+
+        self.n_chunks: int = self.manifest["n_chunks"]
+        self.embedding_model: Optional[str] = self.manifest.get("embedding_model")
+        self.fingerprint: str = self.manifest["fingerprint"]
+        self.vectors: np.ndarray = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.vector_ids: Optional[np.ndarray] = None
+        if (self.path / "vector_ids.npy").exists():
+            self.vector_ids = np.load(self.path / "vector_ids.npy", mmap_mode="r")
+        self._offsets: np.ndarray = np.load(self.path / "text_offsets.npy", mmap_mode="r")
+        self._text = self._open_arena(self.path / "text.bin")
+        self._columns: Dict[str, List[Any]] = {}
+        # Every file is opened (memory-mapped) up front, so an open store stays
+        # a consistent snapshot even if compaction replaces the directory.
+        self._raw_columns: Dict[str, Tuple[np.ndarray, Optional[List[Any]]]] = {}
+        for key, spec in self.manifest["columns"].items():
+            if spec["kind"] == "int":
+                self._raw_columns[key] = (np.load(self.path / f"meta_{key}.npy", mmap_mode="r"), None)
+            else:
+                with open(self.path / f"meta_{key}.values.json", "r", encoding="utf-8") as f:
+                    lookup = json.load(f) + [None]  # code -1 -> None
+                self._raw_columns[key] = (np.load(self.path / f"meta_{key}.codes.npy", mmap_mode="r"), lookup)
+        self._bm25_files: Optional[Dict[str, Any]] = None
+        if self.manifest.get("bm25") is not None:
+            with open(self.path / "bm25_vocab.json", "r", encoding="utf-8") as f:
+                self._bm25_files = {"vocab": json.load(f)}
+            for name in ("term_offsets", "post_docs", "post_tfs", "doc_len", "idf"):
+                self._bm25_files[name] = np.load(self.path / f"bm25_{name}.npy", mmap_mode="r")
+
+    @staticmethod
+    def exists(path: PathLike) -> bool:
+        return (Path(path) / MANIFEST_NAME).is_file()
+
+    @staticmethod
+    def _open_arena(path: Path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def n_vectors(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def duplication_rate(self) -> float:
+        """Fraction of chunks whose vector is shared with an earlier chunk."""
+        return 1.0 - self.n_vectors / self.n_chunks if self.n_chunks else 0.0
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """
+        Chunk-aligned embedding matrix (n_chunks x dim).
+
+        Memory-mapped when every chunk has its own vector; otherwise this
+        materializes a copy, so retrieval uses ``vectors`` + ``vector_ids``.
+        """
+        if self.vector_ids is None:
+            return self.vectors
+        return np.asarray(self.vectors[self.vector_ids])
+
+    def embedding_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """Embeddings of the given chunk rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.vector_ids is not None:
+            rows = self.vector_ids[rows]
+        return np.asarray(self.vectors[rows])
+
+    def text(self, row: int) -> str:
+        lo, hi = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._text[lo:hi].decode("utf-8")
+
+    def column(self, key: str) -> List[Any]:
+        """Decoded values of a metadata column (None where missing), cached after first use."""
+        if key not in self._columns:
+            if key not in self._raw_columns:
+                values: List[Any] = [None] * self.n_chunks
+            else:
+                data, lookup = self._raw_columns[key]
+                values = data.tolist() if lookup is None else [lookup[c] for c in data.tolist()]
+            self._columns[key] = values
+        return self._columns[key]
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        meta = {}
+        for key in self.manifest["columns"]:
+            val = self.column(key)[row]
+            if val is not None:
+                meta[key] = val
+        return meta
+
+    def chunks(self) -> StoredChunks:
+        return StoredChunks(self)
+
+    def bm25_index(self) -> Optional[BM25Index]:
+        """Memory-mapped ``BM25Index``, or None if the store was written without one."""
+        params = self.manifest.get("bm25")
+        if params is None:
+            return None
+        files = self._bm25_files
+        terms = files["vocab"]
+        return BM25Index.from_arrays(
+            vocab=dict(zip(terms, range(len(terms)))),
+            term_offsets=files["term_offsets"],
+            post_docs=files["post_docs"],
+            post_tfs=files["post_tfs"],
+            doc_len=files["doc_len"],
+            idf=files["idf"],
+            avgdl=params["avgdl"],
+            average_idf=params["average_idf"],
+            k1=params["k1"],
+            b=params["b"],
+            epsilon=params["epsilon"],
+        )
+
+    @classmethod
+    def write(
+        cls,
+        path: PathLike,
+        chunks: Sequence[Document],
+        embeddings: np.ndarray,
+        embedding_model: Optional[str] = None,
+        bm25_index: Optional[BM25Index] = None,
+        vector_ids: Optional[np.ndarray] = None,
+    ) -> "CorpusStore":
+        """
+        Write a store directory and return it opened.
+
+        ``embeddings`` is either chunk-aligned, in which case chunks with the
+        same text or an identical vector are stored once, or (with
+        ``vector_ids``, e.g. from ``EmbeddingGenerator.generate_unique``) the
+        distinct vectors plus each chunk's row among them.
+
+        The store is assembled in a sibling ``.tmp`` directory and moved into
+        place at the end, so readers never observe a half-written store.
+        """
+        path = Path(path)
+        n_rows = len(chunks) if vector_ids is None else len(vector_ids)
+        if embeddings.ndim != 2 or len(chunks) != n_rows or (vector_ids is None and n_rows != embeddings.shape[0]):
+            raise ValueError("Embeddings must be 2D and aligned with chunks")
+
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        digest = hashlib.sha1()
+
+        X = np.ascontiguousarray(embeddings.astype(np.float32))
+        Xn = X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
+        if vector_ids is None:
+            Xn, vector_ids = _dedup_vectors(chunks, Xn)
+        vector_ids = np.asarray(vector_ids, dtype=np.int64)
+        np.save(tmp / "embeddings.npy", Xn)
+        digest.update(f"{embedding_model}:{Xn.shape}".encode())
+        # Re-embedding the same text changes only the vectors; hashed in place, without a copy.
+        digest.update(memoryview(np.ascontiguousarray(Xn)).cast("B"))
+        if len(Xn) < len(chunks):
+            np.save(tmp / "vector_ids.npy", vector_ids)
+            digest.update(vector_ids.tobytes())
+
+        encoded = [c.page_content.encode("utf-8") for c in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        arena = b"".join(encoded)
+        (tmp / "text.bin").write_bytes(arena)
+        np.save(tmp / "text_offsets.npy", offsets)
+        digest.update(arena)
+
+        columns: Dict[str, Dict[str, str]] = {}
+        for key in _metadata_keys(chunks):
+            values = [c.metadata.get(key) for c in chunks]
+            if all(type(v) is int for v in values):
+                np.save(tmp / f"meta_{key}.npy", np.asarray(values, dtype=np.int64))
+                columns[key] = {"kind": "int"}
+            else:
+                lookup: Dict[Any, int] = {}
+                codes = np.asarray(
+                    [-1 if v is None else lookup.setdefault(v, len(lookup)) for v in values],
+                    dtype=np.int32,
+                )
+                np.save(tmp / f"meta_{key}.codes.npy", codes)
+                with open(tmp / f"meta_{key}.values.json", "w", encoding="utf-8") as f:
+                    json.dump(list(lookup), f)
+                columns[key] = {"kind": "dict"}
+            digest.update(json.dumps(values, default=str).encode())
+
+        manifest: Dict[str, Any] = {
+            "format_version": FORMAT_VERSION,
+            "n_chunks": len(chunks),
+            "n_vectors": int(Xn.shape[0]),
+            "dim": int(Xn.shape[1]),
+            "embedding_model": embedding_model,
+            "normalized": True,
+            "columns": columns,
+            "bm25": None,
+        }
+
+        if bm25_index is not None:
+            if bm25_index.n_docs != len(chunks):
+                raise ValueError("BM25 index is not aligned with chunks")
+            terms = [None] * len(bm25_index.vocab)
+            for term, tid in bm25_index.vocab.items():
+                terms[tid] = term
+            with open(tmp / "bm25_vocab.json", "w", encoding="utf-8") as f:
+                json.dump(terms, f)
+            for name in ("term_offsets", "post_docs", "post_tfs", "doc_len", "idf"):
+                np.save(tmp / f"bm25_{name}.npy", np.asarray(getattr(bm25_index, name)))
+            manifest["bm25"] = {
+                "k1": bm25_index.k1,
+                "b": bm25_index.b,
+                "epsilon": bm25_index.epsilon,
+                "avgdl": bm25_index.avgdl,
+                "average_idf": bm25_index.average_idf,
+            }
+
+        manifest["fingerprint"] = digest.hexdigest()
+        with open(tmp / MANIFEST_NAME, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+        return cls(path)
+
+
+def _dedup_vectors(chunks: Sequence[Document], Xn: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct rows of a chunk-aligned matrix and each chunk's row among them."""
+    # Same text means same vector even when two embedding requests returned
+    # slightly different floats for it; identical vectors are merged too.
+    by_text: Dict[str, int] = {}
+    by_vector: Dict[bytes, int] = {}
+    first: List[int] = []
+    vector_ids = np.empty(len(chunks), dtype=np.int64)
+    for i, c in enumerate(chunks):
+        row = by_text.get(c.page_content)
+        if row is None:
+            row = by_vector.setdefault(Xn[i].tobytes(), len(first))
+            if row == len(first):
+                first.append(i)
+            by_text[c.page_content] = row
+        vector_ids[i] = row
+    if len(first) == len(chunks):
+        return Xn, vector_ids
+    return Xn[first], vector_ids
+
+
+def _metadata_keys(chunks: Sequence[Document]) -> List[str]:
+    keys: Dict[str, None] = {}
+    for c in chunks:
+        for key in c.metadata:
+            keys.setdefault(key, None)
+    return list(keys)
+
+
+def convert_pickles(
+    chunks_path: PathLike,
+    embeddings_path: PathLike,
+    out_dir: PathLike,
+    embedding_model: Optional[str] = None,
+) -> CorpusStore:
+    """Convert the legacy chunk/embedding pickles into a ``CorpusStore``, fitting BM25 on the way."""
+    from .bm25_retriever import BM25Retriever
+
+    with open(chunks_path, "rb") as f:
+        chunks = pickle.load(f)
+    with open(embeddings_path, "rb") as f:
+        embeddings = pickle.load(f)
+
+    tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+    return CorpusStore.write(
+        out_dir, chunks, embeddings,
+        embedding_model=embedding_model,
+        bm25_index=BM25Index().fit(tokens),
+    )
@@ -1,47 +1,381 @@
+import asyncio
 import numpy as np
-from typing import List, Dict, Any
-from openai import OpenAI
+from typing import Any, List, Optional, Tuple
 from langchain_core.documents import Document
 
+from ..instrumentation import count, count_usage, stage
+from .ann_index import IVFIndex
+from .cache import QueryEmbeddingCache
+from .hits import Hit, source_hits
+
+# Upper bound on similarity-matrix elements materialized at once by search_many
+# (queries x chunks float32), so large batches over large corpora stay bounded.
+MAX_SIM_ELEMENTS = 1 << 24
+# A filter mask keeping at most this fraction of rows gathers just those rows
+# and scores them; broader filters scan every row and drop the rest.
+MASK_GATHER_FRACTION = 0.5
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, via argpartition (no full sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
 class DenseRetriever:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ):
+        # OpenAI clients are created on first use, so processes that never embed
+        # a query (shard workers, BM25-only runs) don't import openai.
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client: Any = None
+        self._aclient: Any = None
+        self.query_cache = query_cache
         self.docs: List[Document] = []
         self.Xn: np.ndarray = None
+        self.vector_ids: Optional[np.ndarray] = None  # chunk row -> Xn row (shared vectors)
+        self._vector_rows: Optional[Tuple[np.ndarray, np.ndarray]] = None  # Xn row -> chunk rows (CSR)
+        self.Xe: Optional[np.ndarray] = None  # rows appended after Xn (corpus deltas)
+        self.dead: Optional[np.ndarray] = None  # tombstoned rows, never returned
         self.dim: int = None
         self.model_name: str = None
+        self.ann: Optional[IVFIndex] = None
     
-    def fit(self, chunks: List[Document], embeddings: np.ndarray, model_name: str):
-        """Index L2-normalized embeddings"""
-        if embeddings.ndim != 2 or len(chunks) != embeddings.shape[0]:
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    @client.setter
+    def client(self, client: Any):
+        self._client = client
+
+    @property
+    def aclient(self) -> Any:
+        if self._aclient is None:
+            from openai import AsyncOpenAI
+
+            self._aclient = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._aclient
+
+    @aclient.setter
+    def aclient(self, aclient: Any):
+        self._aclient = aclient
+
+    def fit(
+        self,
+        chunks: List[Document],
+        embeddings: np.ndarray,
+        model_name: str,
+        normalized: bool = False,
+        extra_embeddings: Optional[np.ndarray] = None,
+        dead: Optional[np.ndarray] = None,
+        vector_ids: Optional[np.ndarray] = None,
+    ):
+        """
+        Index L2-normalized embeddings.
+
+        Pass ``normalized=True`` for float32 rows that are already unit length
+        (e.g. a memory-mapped ``CorpusStore`` matrix); they are used in place
+        instead of being copied into a private normalized array.
+
+        For a corpus with incremental updates, ``extra_embeddings`` holds the
+        rows added after ``embeddings`` (scored separately, so the base matrix
+        is never copied to append them) and rows flagged in the boolean
+        ``dead`` mask are never returned.
+
+        With ``vector_ids``, ``embeddings`` holds distinct vectors and chunk
+        ``i`` uses row ``vector_ids[i]``: each shared vector is scored once
+        per query, and its score is gathered for every chunk using it.
+        """
+        n_extra = 0 if extra_embeddings is None else extra_embeddings.shape[0]
+        n_base = embeddings.shape[0] if vector_ids is None else len(vector_ids)
+        if embeddings.ndim != 2 or len(chunks) != n_base + n_extra:
             raise ValueError("Embeddings must be 2D and aligned with chunks")
-        
-        X = np.ascontiguousarray(embeddings.astype(np.float32))
-        norms = np.linalg.norm(X, axis=1, keepdims=True) + 1e-12
-        self.Xn = X / norms
+        if dead is not None and len(dead) != len(chunks):
+            raise ValueError("Tombstone mask is not aligned with chunks")
+
+        self.Xn = self._normalized(embeddings, normalized)
+        self.vector_ids = self._vector_rows = None
+        if vector_ids is not None:
+            self.vector_ids = np.asarray(vector_ids, dtype=np.int64)
+            order = np.argsort(self.vector_ids, kind="stable")
+            offsets = np.zeros(len(self.Xn) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.vector_ids, minlength=len(self.Xn)), out=offsets[1:])
+            self._vector_rows = (offsets, order)
+        self.Xe = self._normalized(extra_embeddings, normalized) if n_extra else None
+        self.dead = dead if dead is not None and dead.any() else None
         self.dim = self.Xn.shape[1]
         self.docs = chunks
         self.model_name = model_name
+
+    @staticmethod
+    def _normalized(embeddings: np.ndarray, normalized: bool) -> np.ndarray:
+        if normalized and embeddings.dtype == np.float32:
+            return embeddings
+        X = np.ascontiguousarray(embeddings.astype(np.float32))
+        norms = np.linalg.norm(X, axis=1, keepdims=True) + 1e-12
+        return X / norms
+
+    @property
+    def n_live(self) -> int:
+        n = len(self.docs)
+        return n - int(self.dead.sum()) if self.dead is not None else n
+
+    def embed_documents(self, texts: List[str], batch_size: int = 100) -> np.ndarray:
+        """Embed document texts with the corpus embedding model, ``batch_size`` per request."""
+        vectors: List[np.ndarray] = []
+        for lo in range(0, len(texts), batch_size):
+            resp = self.client.embeddings.create(model=self.model_name, input=texts[lo:lo + batch_size])
+            vectors.extend(np.array(it.embedding, dtype=np.float32) for it in resp.data)
+        return np.vstack(vectors) if vectors else np.zeros((0, self.dim or 0), dtype=np.float32)
     
+    def _cached(self, query: str) -> Optional[np.ndarray]:
+        if self.query_cache is None:
+            return None
+        q = self.query_cache.get(self.model_name, query)
+        count("query_cache_hits" if q is not None else "query_cache_misses")
+        return q
+
+    def _remember(self, query: str, q: np.ndarray):
+        if self.query_cache is not None:
+            self.query_cache.put(self.model_name, query, q)
+
     def _embed_query(self, query: str) -> np.ndarray:
-        """Embed and normalize query"""
-        resp = self.client.embeddings.create(model=self.model_name, input=[query])
+        """Embed and normalize query (served from the query cache when possible)"""
+        q = self._cached(query)
+        if q is not None:
+            return q
+        with stage("embed"):
+            resp = self.client.embeddings.create(model=self.model_name, input=[query])
+        count_usage("embedding", getattr(resp, "usage", None))
         q = np.array(resp.data[0].embedding, dtype=np.float32)
-        return q / (np.linalg.norm(q) + 1e-12)
+        q = q / (np.linalg.norm(q) + 1e-12)
+        self._remember(query, q)
+        return q
+
+    async def _aembed_query(self, query: str) -> np.ndarray:
+        """Async ``_embed_query``"""
+        q = self._cached(query)
+        if q is not None:
+            return q
+        with stage("embed"):
+            resp = await self.aclient.embeddings.create(model=self.model_name, input=[query])
+        count_usage("embedding", getattr(resp, "usage", None))
+        q = np.array(resp.data[0].embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-12)
+        self._remember(query, q)
+        return q
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed and normalize a batch of queries; cache misses share a single API request"""
+        vectors = [self._cached(q) for q in queries]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            with stage("embed", queries=len(missing)):
+                resp = self.client.embeddings.create(
+                    model=self.model_name, input=[queries[i] for i in missing]
+                )
+            count_usage("embedding", getattr(resp, "usage", None))
+            for i, it in zip(missing, resp.data):
+                q = np.array(it.embedding, dtype=np.float32)
+                vectors[i] = q / (np.linalg.norm(q) + 1e-12)
+                self._remember(queries[i], vectors[i])
+        return np.vstack(vectors)
     
-    def search(self, query: str, top_k: int = 200) -> List[Dict[str, Any]]:
-        """Retrieve top-k chunks by cosine similarity"""
+    def use_ann(self, index: Optional[IVFIndex]):
+        """Serve searches from an ANN index over ``self.Xn`` (None restores exact search)."""
+        if index is not None and index.Xn is not self.Xn:
+            raise ValueError("ANN index must be built over this retriever's vectors")
+        self.ann = index
+
+    def _exact_sims(self, q: np.ndarray) -> np.ndarray:
+        """Similarity of every row (-inf for dead rows)."""
+        sims = self.Xn @ q
+        if self.vector_ids is not None:
+            sims = sims[self.vector_ids]
+        if self.Xe is not None:
+            sims = np.concatenate([sims, self.Xe @ q])
+        if self.dead is not None:
+            sims[self.dead] = -np.inf
+        count("dense_rows_scored", len(sims))
+        return sims
+
+    def _top_k(
+        self, q: np.ndarray, top_k: int, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k row ids and similarities for a normalized query vector (among rows in ``mask``)."""
+        if mask is not None:
+            return self._masked_top_k(q, top_k, mask)
+        top_k = min(top_k, self.n_live)
+        if self.ann is not None and not exact:
+            return self._ann_top_k(q, top_k)
+        sims = self._exact_sims(q)
+        top_idx = top_k_indices(sims, top_k)
+        return top_idx, sims[top_idx]
+
+    def _live_rows(self, mask: np.ndarray) -> np.ndarray:
+        if self.dead is not None:
+            mask = mask & ~self.dead
+        return np.flatnonzero(mask)
+
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors of the given chunk rows, gathered from the base and delta matrices."""
+        n_base = self.Xn.shape[0] if self.vector_ids is None else len(self.vector_ids)
+        base, delta = rows[rows < n_base], rows[rows >= n_base]
+        X = self.Xn[base if self.vector_ids is None else self.vector_ids[base]]
+        if len(delta):
+            X = np.vstack([X, self.Xe[delta - n_base]])
+        return X
+
+    def _masked_top_k(self, q: np.ndarray, top_k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k over the rows flagged in ``mask`` (a metadata filter).
+
+        The ANN index is bypassed: it would return neighbours the filter then
+        drops, while a selective filter leaves few enough rows to score them all.
+        """
+        rows = self._live_rows(mask)
+        top_k = min(top_k, len(rows))
+        if len(rows) > MASK_GATHER_FRACTION * len(mask):
+            sims = self._exact_sims(q)
+            sims[~mask] = -np.inf
+            top_idx = top_k_indices(sims, top_k)
+            return top_idx, sims[top_idx]
+        sims = self._row_vectors(rows) @ q
+        count("dense_rows_scored", len(rows))
+        top = top_k_indices(sims, top_k)
+        return rows[top], sims[top]
+
+    def _ann_top_k(self, q: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ANN search over the base rows, merged with an exact scan of the (small) delta rows."""
+        n_base = self.Xn.shape[0] if self.vector_ids is None else len(self.vector_ids)
+        n_dead = int(self.dead[:n_base].sum()) if self.dead is not None else 0
+        ids, sims = self.ann.search(q, top_k + n_dead)
+        if self._vector_rows is not None:
+            # The index holds distinct vectors; expand each to its chunks.
+            offsets, order = self._vector_rows
+            counts = offsets[ids + 1] - offsets[ids]
+            ids = np.concatenate([order[offsets[v]:offsets[v + 1]] for v in ids.tolist()] or [ids])
+            sims = np.repeat(sims, counts)
+        if self.Xe is not None:
+            ids = np.concatenate([ids, n_base + np.arange(self.Xe.shape[0])])
+            sims = np.concatenate([sims, self.Xe @ q])
+        if self.dead is not None:
+            live = ~self.dead[ids]
+            ids, sims = ids[live], sims[live]
+        count("dense_rows_scored", len(ids))
+        top = top_k_indices(sims, top_k)
+        return ids[top], sims[top]
+
+    def _hits(self, top_idx: np.ndarray, top_sims: np.ndarray) -> List[Hit]:
+        return source_hits("dense", top_idx, top_sims, self.docs)
+
+    def search_rows(
+        self, query: str, top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine similarities of the top-k chunks (among rows flagged in ``mask``), best first"""
         if self.Xn is None:
             raise RuntimeError("Call fit() first")
         
         q = self._embed_query(query)
-        sims = self.Xn @ q
-        top_idx = np.argsort(sims)[::-1][:min(top_k, len(sims))]
-        
-        return [{
-            "rank": rank,
-            "dense_score": float(sims[i]),
-            "resume_id": self.docs[i].metadata.get("resume_id"),
-            "chunk_id": self.docs[i].metadata.get("chunk_id"),
-            "preview": self.docs[i].page_content[:400]
-        } for rank, i in enumerate(top_idx, 1)]
\ No newline at end of file
+        with stage("dense_scan"):
+            return self._top_k(q, top_k, exact=exact, mask=mask)
+
+    def search(
+        self, query: str, top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> List[Hit]:
+        """Retrieve top-k chunks by cosine similarity (approximate if an ANN index is set)"""
+        return self._hits(*self.search_rows(query, top_k, exact=exact, mask=mask))
+
+    async def asearch_rows(
+        self, query: str, top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Async ``search_rows``: the embedding call is awaited, scoring runs in a worker thread"""
+        if self.Xn is None:
+            raise RuntimeError("Call fit() first")
+
+        q = await self._aembed_query(query)
+        with stage("dense_scan"):
+            return await asyncio.to_thread(self._top_k, q, top_k, exact, mask)
+
+    async def asearch(
+        self, query: str, top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> List[Hit]:
+        """Async ``search``"""
+        return self._hits(*await self.asearch_rows(query, top_k, exact=exact, mask=mask))
+
+    def search_many(
+        self, queries: List[str], top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> List[List[Hit]]:
+        """Retrieve top-k chunks for several queries at once (see ``search_many_rows``)."""
+        return [self._hits(*rows) for rows in self.search_many_rows(queries, top_k, exact=exact, mask=mask)]
+
+    def search_many_rows(
+        self, queries: List[str], top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Rows and similarities of the top-k chunks for several queries at once.
+
+        All queries are embedded in one API request and, on the exact path,
+        scored with one matrix-matrix product per block of queries instead of a
+        matrix-vector product per query. With a filter ``mask``, only the
+        flagged rows are scored (exactly).
+        """
+        if self.Xn is None:
+            raise RuntimeError("Call fit() first")
+        if not queries:
+            return []
+        return self.search_vectors(self._embed_queries(queries), top_k, exact=exact, mask=mask)
+
+    def search_vectors(
+        self, Q: np.ndarray, top_k: int = 200, exact: bool = False, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """``search_many_rows`` for already embedded, normalized queries (one per row of ``Q``)."""
+        with stage("dense_scan", queries=len(Q)):
+            return self._search_vectors(Q, top_k, exact, mask)
+
+    def _search_vectors(
+        self, Q: np.ndarray, top_k: int, exact: bool, mask: Optional[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if mask is not None:
+            # Filtered: gather the candidate rows once and score them for every query.
+            rows = self._live_rows(mask)
+            X = self._row_vectors(rows)
+            results = []
+            block = max(1, MAX_SIM_ELEMENTS // max(1, len(rows)))
+            for lo in range(0, len(Q), block):
+                count("dense_rows_scored", len(rows) * len(Q[lo:lo + block]))
+                for sims in Q[lo:lo + block] @ X.T:
+                    top = top_k_indices(sims, min(top_k, len(rows)))
+                    results.append((rows[top], sims[top]))
+            return results
+        if self.ann is not None and not exact:
+            return [self._ann_top_k(q, min(top_k, self.n_live)) for q in Q]
+
+        results = []
+        top_k = min(top_k, self.n_live)
+        block = max(1, MAX_SIM_ELEMENTS // max(1, len(self.docs)))
+        for lo in range(0, len(Q), block):
+            S = Q[lo:lo + block] @ self.Xn.T
+            if self.vector_ids is not None:
+                S = S[:, self.vector_ids]
+            if self.Xe is not None:
+                S = np.hstack([S, Q[lo:lo + block] @ self.Xe.T])
+            if self.dead is not None:
+                S[:, self.dead] = -np.inf
+            count("dense_rows_scored", S.size)
+            for sims in S:
+                top_idx = top_k_indices(sims, top_k)
+                results.append((top_idx, sims[top_idx]))
+        return results
@@ -1,11 +1,16 @@
 import hashlib
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .hits import Hit
 
 def rrf_fuse(
     bm25_hits: Optional[List[Dict[str, Any]]],
     dense_hits: Optional[List[Dict[str, Any]]],
     k: int = 60,
-    top_k: int = 180,
+    top_k: Optional[int] = 180,
     weights: Dict[str, float] = None
 ) -> List[Dict[str, Any]]:
     """Reciprocal Rank Fusion (RRF): score = Σ w_s / (k + rank_s)"""
@@ -52,4 +57,130 @@ def rrf_fuse(
     fused = sorted(pool.values(), key=lambda x: x["rrf_score"], reverse=True)[:top_k]
     for i, rec in enumerate(fused, 1):
         rec["rank"] = i
-    return fused
\ No newline at end of file
+    return fused
+
+
+def rrf_fuse_rows(
+    sources: Mapping[str, Tuple[np.ndarray, np.ndarray]],
+    k: int = 60,
+    top_k: Optional[int] = 180,
+    weights: Dict[str, float] = None
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    ``rrf_fuse`` over integer chunk rows, for any number of sources.
+
+    Each source maps a label to (rows, scores) in rank order, as returned by
+    the retrievers' ``search_rows``. Weighted reciprocal ranks are
+    scatter-added into one score per distinct row and the top-k is picked with
+    ``argpartition``; ties keep first-seen order, exactly as in ``rrf_fuse``.
+
+    Returns the fused rows, their RRF scores and, per label, the (rank, score)
+    each row had in that source (rank 0 and NaN where it was not retrieved).
+    """
+    weights = weights or {"bm25": 1.0, "dense": 1.0}
+    parts = [np.asarray(rows, dtype=np.int64) for rows, _ in sources.values()]
+    all_rows = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    pool, first, inverse = np.unique(all_rows, return_index=True, return_inverse=True)
+
+    rrf = np.zeros(len(pool))
+    per_source = {}
+    offset = 0
+    for (label, (_, scores)), rows in zip(sources.items(), parts):
+        idx = inverse[offset:offset + len(rows)]
+        offset += len(rows)
+        ranks = np.arange(1, len(rows) + 1)
+        np.add.at(rrf, idx, weights.get(label, 1.0) * (1.0 / (k + ranks)))
+        # Like rrf_fuse, a row retrieved twice by one source keeps its first rank.
+        seen, pos = np.unique(idx, return_index=True)
+        src_rank = np.zeros(len(pool), dtype=np.int64)
+        src_score = np.full(len(pool), np.nan)
+        src_rank[seen] = pos + 1
+        src_score[seen] = np.asarray(scores, dtype=np.float64)[pos]
+        per_source[label] = (src_rank, src_score)
+
+    # Position of each row in first-seen order breaks ties in the score sort.
+    order = np.empty(len(pool), dtype=np.int64)
+    order[np.argsort(first, kind="stable")] = np.arange(len(pool))
+    cand = np.arange(len(pool))
+    if top_k is not None and 0 < top_k < len(pool):
+        kth = np.partition(-rrf, top_k - 1)[top_k - 1]
+        cand = np.flatnonzero(-rrf <= kth)
+    top = cand[np.lexsort((order[cand], -rrf[cand]))][:top_k]
+    return pool[top], rrf[top], {label: (r[top], s[top]) for label, (r, s) in per_source.items()}
+
+
+def rrf_hits(
+    rows: np.ndarray,
+    rrf_scores: np.ndarray,
+    per_source: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    chunks: Sequence[Document],
+) -> Iterator[Hit]:
+    """Yield a ``Hit`` per row of ``rrf_fuse_rows`` output, in fused order, built only as consumed."""
+    sources = tuple(per_source)
+    ranks = list(zip(*(r.tolist() for r, _ in per_source.values()))) or [()] * len(rows)
+    scores = list(zip(*(s.tolist() for _, s in per_source.values()))) or [()] * len(rows)
+    for i, (row, score) in enumerate(zip(rows.tolist(), rrf_scores.tolist())):
+        yield Hit(
+            row, chunks, i + 1, sources,
+            tuple(r or None for r in ranks[i]),
+            tuple(s if r else None for r, s in zip(ranks[i], scores[i])),
+            rrf_score=score,
+        )
+
+
+def collapse_duplicates(
+    hits: Iterable[Dict[str, Any]],
+    cluster_of: Callable[[Any], Any],
+    top_k: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Keep only the hits of the best-ranked resume in each near-duplicate cluster.
+
+    ``cluster_of`` maps a resume id to its cluster id (``ChunkIndex.cluster_of``).
+    Order is preserved; at most ``top_k`` hits are returned.
+    """
+    owner: Dict[Any, Any] = {}
+    kept = []
+    for h in hits:
+        rid = h.get("resume_id")
+        if owner.setdefault(cluster_of(rid), rid) != rid:
+            continue
+        kept.append(h)
+        if top_k is not None and len(kept) >= top_k:
+            break
+    return kept
+
+
+RESUME_AGGREGATIONS = ("max", "sum")
+
+
+def aggregate_resumes(
+    hits: Iterable[Dict[str, Any]], method: str = "max", top_m: int = 3
+) -> List[Tuple[Any, float]]:
+    """
+    (resume_id, score) per resume, best first, from its chunks' fused scores.
+
+    ``"max"`` takes the best chunk's ``rrf_score``; ``"sum"`` adds up the
+    ``top_m`` best, favouring resumes that match in several sections. Ties keep
+    first-seen order.
+    """
+    if method not in RESUME_AGGREGATIONS:
+        raise ValueError(f"Unknown resume aggregation {method!r}; expected one of {RESUME_AGGREGATIONS}")
+    per_resume: Dict[Any, List[float]] = {}
+    for h in hits:
+        per_resume.setdefault(h.get("resume_id"), []).append(h.get("rrf_score") or 0.0)
+    if method == "max":
+        scores = {rid: max(s) for rid, s in per_resume.items()}
+    else:
+        scores = {rid: sum(sorted(s, reverse=True)[:top_m]) for rid, s in per_resume.items()}
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def prune_resumes(
+    hits: List[Dict[str, Any]], top_resumes: Optional[int], method: str = "max", top_m: int = 3
+) -> List[Dict[str, Any]]:
+    """Hits of the ``top_resumes`` best resumes by ``aggregate_resumes``, in their original order (None keeps all)."""
+    if top_resumes is None:
+        return hits
+    keep = {rid for rid, _ in aggregate_resumes(hits, method, top_m)[:top_resumes]}
+    return [h for h in hits if h.get("resume_id") in keep]
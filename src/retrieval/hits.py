@@ -0,0 +1,124 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+PREVIEW_CHARS = 400
+
+# Fields left out of the mapping view while unset, as they were absent from the old hit dicts.
+_OPTIONAL = ("rrf_score", "ce_score", "rerank_position")
+_SETTABLE = ("rank",) + _OPTIONAL
+
+
+class Hit:
+    """
+    One retrieved chunk: its row, ids and per-source ranks and scores.
+
+    Replaces the per-hit dicts the retrievers, fusion and reranker used to
+    build. A ``__slots__`` record is a fraction of a dict's size, and the
+    ``preview`` (first 400 characters of the chunk) is read from the chunk
+    sequence only when accessed, instead of being copied for every candidate.
+
+    Hits still read like the old dicts (``hit["ce_score"]``, ``hit.get(...)``,
+    ``"<source>_rank"``/``"<source>_score"`` keys), so existing consumers keep
+    working; ``to_dict`` gives the plain dict.
+    """
+
+    __slots__ = (
+        "row", "resume_id", "chunk_id", "rank", "sources", "source_ranks", "source_scores",
+        "rrf_score", "ce_score", "rerank_position", "_chunks",
+    )
+
+    def __init__(
+        self,
+        row: int,
+        chunks: Sequence[Document],
+        rank: int,
+        sources: Tuple[str, ...],
+        source_ranks: Tuple[Optional[int], ...],
+        source_scores: Tuple[Optional[float], ...],
+        rrf_score: Optional[float] = None,
+        resume_id: Any = None,
+        chunk_id: Any = None,
+    ):
+        self.row = row
+        self._chunks = chunks
+        if resume_id is None:
+            meta = chunks[row].metadata
+            resume_id, chunk_id = meta.get("resume_id"), meta.get("chunk_id")
+        self.resume_id = resume_id
+        self.chunk_id = chunk_id
+        self.rank = rank
+        self.sources = sources
+        self.source_ranks = source_ranks
+        self.source_scores = source_scores
+        self.rrf_score = rrf_score
+        self.ce_score = None
+        self.rerank_position = None
+
+    @property
+    def preview(self) -> str:
+        return self._chunks[self.row].page_content[:PREVIEW_CHARS]
+
+    def keys(self) -> List[str]:
+        keys = ["resume_id", "chunk_id", "preview"]
+        for label in self.sources:
+            keys += [f"{label}_rank", f"{label}_score"]
+        keys += [k for k in ("rrf_score", "rank", "ce_score", "rerank_position")
+                 if k == "rank" or getattr(self, k) is not None]
+        return keys
+
+    def __getitem__(self, key: str) -> Any:
+        if key in ("resume_id", "chunk_id", "preview", "rank"):
+            return getattr(self, key)
+        if key in _OPTIONAL:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        label, _, field = key.rpartition("_")
+        if field in ("rank", "score") and label in self.sources:
+            i = self.sources.index(label)
+            return self.source_ranks[i] if field == "rank" else self.source_scores[i]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in _SETTABLE:
+            raise KeyError(f"Hit field {key!r} is read-only")
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Hit, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, Hit) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Hit({self.resume_id!r}, {self.chunk_id!r}, row={self.row}, rank={self.rank})"
+
+
+def source_hits(
+    label: str, rows: np.ndarray, scores: np.ndarray, chunks: Sequence[Document]
+) -> List[Hit]:
+    """Hits of one retriever's (rows, scores), ranked 1..n."""
+    sources = (label,)
+    return [
+        Hit(row, chunks, rank, sources, (rank,), (score,))
+        for rank, (row, score) in enumerate(zip(rows.tolist(), np.asarray(scores, dtype=np.float64).tolist()), 1)
+    ]
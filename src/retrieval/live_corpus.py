@@ -0,0 +1,310 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .bm25_index import BM25Index, SegmentedBM25
+from .bm25_retriever import BM25Retriever
+from .chunk_index import ChunkIndex, chunk_column
+from .corpus_store import MANIFEST_NAME, CorpusStore
+
+UPDATES_NAME = "updates.json"
+
+PathLike = Union[str, Path]
+
+
+def _read_updates(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path / UPDATES_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"generation": 0, "segments": [], "dead_rows": []}
+
+
+def _write_updates(path: Path, updates: Dict[str, Any]):
+    tmp = path / f"{UPDATES_NAME}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(updates, f)
+    os.replace(tmp, path / UPDATES_NAME)
+
+
+class SegmentedChunks(Sequence):
+    """Read-only concatenation of chunk sequences, numbered consecutively."""
+
+    def __init__(self, parts: Sequence[Sequence[Document]]):
+        self._parts = list(parts)
+        self._offsets = np.cumsum([0] + [len(p) for p in self._parts])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        part = int(np.searchsorted(self._offsets, i, side="right")) - 1
+        return self._parts[part][i - int(self._offsets[part])]
+
+    def __iter__(self) -> Iterator[Document]:
+        for part in self._parts:
+            yield from part
+
+    def keys(self) -> Iterator[Tuple[Any, Any]]:
+        for part in self._parts:
+            if hasattr(part, "keys"):
+                yield from part.keys()
+            else:
+                for c in part:
+                    yield c.metadata.get("resume_id"), c.metadata.get("chunk_id")
+
+    def column(self, key: str) -> Iterator[Any]:
+        for part in self._parts:
+            yield from chunk_column(part, key)
+
+
+class LiveCorpus:
+    """
+    A ``CorpusStore`` plus the incremental updates applied to it, as one snapshot.
+
+    Adding resumes to a large corpus should not mean re-embedding and refitting
+    everything. ``CorpusWriter`` appends each batch of new chunks as a small
+    delta store (``delta-<generation>/``, same format, with its own BM25
+    postings) and records deletions as tombstoned rows in ``updates.json``.
+    Rows are numbered base first, then deltas in order. Compaction later folds
+    everything back into a single base store.
+
+    ``version`` (base fingerprint + update generation) identifies a snapshot;
+    ``current_version`` reads it cheaply so a running process can poll for
+    updates and reopen.
+    """
+
+    def __init__(self, path: PathLike, previous: Optional["LiveCorpus"] = None):
+        self.path = Path(path)
+        updates = _read_updates(self.path)
+        reuse = previous is not None and previous.path == self.path
+        base = previous.base if reuse else None
+        self.base = base if base is not None and base.fingerprint == self._fingerprint(self.path) else CorpusStore(self.path)
+
+        known = dict(zip(previous.segment_names, previous.deltas)) if reuse and previous.base is self.base else {}
+        self.segment_names: List[str] = list(updates["segments"])
+        self.deltas = [known.get(name) or CorpusStore(self.path / name) for name in self.segment_names]
+        self.generation: int = updates["generation"]
+        self.version = f"{self.base.fingerprint}:{self.generation}"
+
+        self.n_chunks = self.base.n_chunks + sum(d.n_chunks for d in self.deltas)
+        self.dead: Optional[np.ndarray] = None
+        if updates["dead_rows"]:
+            self.dead = np.zeros(self.n_chunks, dtype=bool)
+            self.dead[np.asarray(updates["dead_rows"], dtype=np.int64)] = True
+
+    @staticmethod
+    def _fingerprint(path: Path) -> str:
+        with open(path / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)["fingerprint"]
+
+    @classmethod
+    def current_version(cls, path: PathLike) -> str:
+        """Version of the snapshot on disk now (two small file reads)."""
+        path = Path(path)
+        return f"{cls._fingerprint(path)}:{_read_updates(path)['generation']}"
+
+    @property
+    def fingerprint(self) -> str:
+        """Fingerprint of the base store (changes only on compaction)."""
+        return self.base.fingerprint
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.base.embedding_model
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Distinct base-store vectors (memory-mapped, normalized); see ``vector_ids``."""
+        return self.base.vectors
+
+    @property
+    def vector_ids(self) -> Optional[np.ndarray]:
+        """Row of ``vectors`` for each base-store chunk, or None if every chunk has its own."""
+        return self.base.vector_ids
+
+    def embedding_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """Embeddings of the given (global) chunk rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        stores = [self.base] + self.deltas
+        offsets = np.cumsum([0] + [s.n_chunks for s in stores])
+        segment = np.searchsorted(offsets, rows, side="right") - 1
+        out = np.empty((len(rows), self.base.vectors.shape[1]), dtype=np.float32)
+        for i, store in enumerate(stores):
+            mask = segment == i
+            if mask.any():
+                out[mask] = store.embedding_rows(rows[mask] - offsets[i])
+        return out
+
+    @property
+    def extra_embeddings(self) -> Optional[np.ndarray]:
+        """Normalized embeddings of all delta rows, or None without deltas."""
+        if not self.deltas:
+            return None
+        return np.vstack([d.embeddings for d in self.deltas])
+
+    def chunks(self) -> Sequence[Document]:
+        if not self.deltas:
+            return self.base.chunks()
+        return SegmentedChunks([self.base.chunks()] + [d.chunks() for d in self.deltas])
+
+    def bm25_index(self) -> Optional[Union[BM25Index, SegmentedBM25]]:
+        """BM25 over the live rows; None if the base store has no postings."""
+        base = self.base.bm25_index()
+        if base is None:
+            return None
+        if not self.deltas and self.dead is None:
+            return base
+        return SegmentedBM25([base] + [d.bm25_index() for d in self.deltas], self.dead)
+
+    def chunk_index(self) -> ChunkIndex:
+        return ChunkIndex(self.chunks(), dead=self.dead, version=f"store:{self.version}")
+
+    @property
+    def n_pending(self) -> int:
+        """Delta and tombstoned rows not yet folded into the base store."""
+        n_dead = int(self.dead.sum()) if self.dead is not None else 0
+        return self.n_chunks - self.base.n_chunks + n_dead
+
+
+class CorpusWriter:
+    """
+    Applies incremental updates to a corpus store directory.
+
+    Updates are serialized across processes by a lock file next to the store.
+    Each update writes its delta and then atomically replaces
+    ``updates.json``, so readers see either the previous or the next
+    generation. ``compact`` rewrites base + deltas - tombstones as a new base
+    store; it holds the lock while it runs, so it is meant for a background
+    thread (``compact_async``).
+    """
+
+    def __init__(self, path: PathLike, compact_ratio: float = 0.1):
+        """
+        Args:
+            path: Corpus store directory
+            compact_ratio: ``needs_compaction`` once pending delta + tombstoned
+                rows exceed this fraction of the base store
+        """
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.lock_path = self.path.with_name(f".{self.path.name}.lock")
+        self._compaction: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def add_resumes(
+        self,
+        chunks: Sequence[Document],
+        embed: Callable[[List[str]], np.ndarray],
+    ) -> int:
+        """
+        Add (or replace) the resumes in ``chunks``; returns the new generation.
+
+        Live chunks of resumes that already exist are tombstoned. Only chunks
+        whose text is not already embedded for that resume are sent to
+        ``embed``; unchanged sections reuse their stored vectors.
+        """
+        resume_ids = {c.metadata.get("resume_id") for c in chunks}
+        with self._locked():
+            live = LiveCorpus(self.path)
+            index = live.chunk_index()
+            replaced = [row for rid in resume_ids for row in index.resume_rows(rid)]
+
+            known: Dict[str, np.ndarray] = dict(zip(
+                (index.chunks[row].page_content for row in replaced), live.embedding_rows(replaced)
+            ))
+
+            texts = [c.page_content for c in chunks]
+            embeddings = np.zeros((len(chunks), live.vectors.shape[1]), dtype=np.float32)
+            missing = [i for i, t in enumerate(texts) if t not in known]
+            if missing:
+                embeddings[missing] = embed([texts[i] for i in missing])
+            for i, t in enumerate(texts):
+                if t in known:
+                    embeddings[i] = known[t]
+            return self._commit(live, chunks, embeddings, replaced)
+
+    def remove_resumes(self, resume_ids: Iterable[Any]) -> int:
+        """Tombstone every live chunk of the given resumes; returns the new generation."""
+        with self._locked():
+            live = LiveCorpus(self.path)
+            index = live.chunk_index()
+            rows = [row for rid in set(resume_ids) for row in index.resume_rows(rid)]
+            return self._commit(live, [], None, rows)
+
+    def _commit(
+        self,
+        live: LiveCorpus,
+        chunks: Sequence[Document],
+        embeddings: Optional[np.ndarray],
+        dead_rows: List[int],
+    ) -> int:
+        updates = _read_updates(self.path)
+        generation = updates["generation"] + 1
+        if chunks:
+            name = f"delta-{generation:06d}"
+            tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+            CorpusStore.write(
+                self.path / name, chunks, embeddings,
+                embedding_model=live.embedding_model,
+                bm25_index=BM25Index().fit(tokens),
+            )
+            updates["segments"].append(name)
+        updates["dead_rows"] = sorted(set(updates["dead_rows"]) | set(dead_rows))
+        updates["generation"] = generation
+        _write_updates(self.path, updates)
+        return generation
+
+    def needs_compaction(self) -> bool:
+        live = LiveCorpus(self.path)
+        return live.n_pending > self.compact_ratio * max(live.base.n_chunks, 1)
+
+    def compact(self) -> int:
+        """Fold deltas and tombstones into a new base store; returns the new generation."""
+        with self._locked():
+            live = LiveCorpus(self.path)
+            if not live.n_pending:
+                return live.generation
+            keep = np.flatnonzero(~live.dead) if live.dead is not None else np.arange(live.n_chunks)
+            all_chunks = live.chunks()
+            chunks = [all_chunks[int(row)] for row in keep]
+            tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+
+            # Replaces the whole directory (deltas included) atomically; open
+            # readers keep their memory-mapped snapshot of the old files.
+            CorpusStore.write(
+                self.path, chunks, live.embedding_rows(keep),
+                embedding_model=live.embedding_model,
+                bm25_index=BM25Index().fit(tokens),
+            )
+            generation = live.generation + 1
+            _write_updates(self.path, {"generation": generation, "segments": [], "dead_rows": []})
+            return generation
+
+    def compact_async(self) -> threading.Thread:
+        """Run ``compact`` in a background thread (one at a time)."""
+        if self._compaction is None or not self._compaction.is_alive():
+            self._compaction = threading.Thread(target=self.compact, name="corpus-compaction", daemon=True)
+            self._compaction.start()
+        return self._compaction
@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .bm25_retriever import BM25Retriever
+from .chunk_index import chunk_column
+
+# Degrees detected by data/chunker.py, lowest first ("min_degree" filters).
+DEGREES = ("associate", "bachelors", "masters", "phd")
+
+
+class MetadataIndex:
+    """
+    Bitmap indexes over chunk metadata, turning search filters into row masks.
+
+    Each metadata column is dictionary-encoded once (codes per row), and the
+    boolean row bitmap of every filtered value is cached, so a filter costs a
+    few vectorized ANDs per query. The resulting mask is pushed down into the
+    retrievers, which then score only the matching rows.
+
+    Filters (all must hold):
+
+    - ``{"<column>": value}`` or ``{"<column>": [values]}``: chunk metadata
+      equals the value (any of the values), e.g. ``{"section": "experience"}``
+    - ``{"min_degree": "masters"}``: resumes whose highest detected degree is
+      at least this one (see ``DEGREES``)
+    - ``{"skills": ["python", "docker"]}``: resumes whose skills section
+      mentions every one of these terms
+    """
+
+    def __init__(
+        self,
+        chunks: Sequence[Document],
+        dead: Optional[np.ndarray] = None,
+        columns: Optional[Sequence[str]] = None,
+    ):
+        """
+        Args:
+            columns: metadata keys of the wider corpus these chunks belong to
+                (e.g. a shard's source store). Filtering on one of them that
+                no chunk here has matches nothing instead of raising.
+        """
+        self.chunks = chunks
+        self.n_rows = len(chunks)
+        self.dead = dead
+        self.columns = set(columns or ())
+        self._codes: Dict[str, Tuple[np.ndarray, Dict[Any, int]]] = {}
+        self._bitmaps: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._skill_resumes: Optional[Dict[str, Set[int]]] = None
+
+    def _column(self, key: str) -> Tuple[np.ndarray, Dict[Any, int]]:
+        """Per-row codes of a metadata column (-1 where missing) and the value -> code lookup."""
+        if key not in self._codes:
+            lookup: Dict[Any, int] = {}
+            codes = np.fromiter(
+                (-1 if v is None else lookup.setdefault(v, len(lookup)) for v in chunk_column(self.chunks, key)),
+                dtype=np.int32, count=self.n_rows,
+            )
+            self._codes[key] = (codes, lookup)
+        return self._codes[key]
+
+    def bitmap(self, key: str, value: Any) -> np.ndarray:
+        """Rows whose ``key`` metadata equals ``value``."""
+        if (key, value) not in self._bitmaps:
+            codes, lookup = self._column(key)
+            if not lookup and key not in self.columns:
+                raise ValueError(f"No chunk has {key!r} metadata; re-chunk the corpus to filter on it")
+            code = lookup.get(value)
+            self._bitmaps[(key, value)] = codes == code if code is not None else np.zeros(self.n_rows, dtype=bool)
+        return self._bitmaps[(key, value)]
+
+    def _any_of(self, key: str, values: List[Any]) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for value in values:
+            mask |= self.bitmap(key, value)
+        return mask
+
+    def _skill_bitmap(self, skill: str) -> np.ndarray:
+        """Rows of resumes whose skills section contains ``skill``."""
+        key = ("skills", skill)
+        if key not in self._bitmaps:
+            resumes, _ = self._column("resume_id")
+            if self._skill_resumes is None:
+                # One pass over the skills sections: term -> resume codes.
+                self._skill_resumes = {}
+                for row in np.flatnonzero(self.bitmap("section", "skills")).tolist():
+                    for term in BM25Retriever.clean_and_tokenize(self.chunks[row].page_content):
+                        self._skill_resumes.setdefault(term, set()).add(int(resumes[row]))
+            matching = self._skill_resumes.get(skill, set())
+            self._bitmaps[key] = np.isin(resumes, np.fromiter(matching, dtype=np.int32, count=len(matching)))
+        return self._bitmaps[key]
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean mask of the rows matching every filter; None without filters."""
+        if not filters:
+            return None
+        mask = np.ones(self.n_rows, dtype=bool)
+        for key, value in filters.items():
+            if key == "min_degree":
+                if value not in DEGREES:
+                    raise ValueError(f"Unknown degree {value!r}; expected one of {DEGREES}")
+                mask &= self._any_of("degree", list(DEGREES[DEGREES.index(value):]))
+            elif key == "skills":
+                skills = [value] if isinstance(value, str) else value
+                for skill in skills:
+                    for term in BM25Retriever.clean_and_tokenize(skill):
+                        mask &= self._skill_bitmap(term)
+            else:
+                mask &= self._any_of(key, value if isinstance(value, (list, tuple, set)) else [value])
+        if self.dead is not None:
+            mask &= ~self.dead
+        return mask
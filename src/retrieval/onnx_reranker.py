@@ -0,0 +1,175 @@
+import json
+import re
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathLike = Union[str, Path]
+
+META_NAME = "onnx_meta.json"
+FP32_NAME = "model.onnx"
+INT8_NAME = "model.int8.onnx"
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The ONNX reranker backend needs onnxruntime and onnx: "
+            "pip install onnxruntime onnx (or set RERANKER_BACKEND = \"torch\")"
+        ) from e
+    return onnxruntime
+
+
+def model_dir(root: PathLike, model_name: str) -> Path:
+    """Per-model export directory under ``root`` (model names contain slashes)."""
+    return Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+
+
+def export_onnx(model_name: str, out_dir: PathLike, quantize: bool = True) -> Path:
+    """
+    Export a sentence-transformers cross-encoder to ONNX (and INT8) in ``out_dir``.
+
+    The tokenizer, max sequence length and output activation are saved next to
+    the graph, so serving from an existing export needs neither torch nor the
+    original checkpoint. Returns the path of the graph to serve.
+    """
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ce = CrossEncoder(model_name, device="cpu")
+    model = ce.model.eval()
+
+    activation = getattr(ce, "activation_fn", None) or getattr(ce, "default_activation_function", None)
+    activation_name = type(activation).__name__.lower() if activation is not None else "identity"
+    if activation_name not in ("identity", "sigmoid"):
+        raise ValueError(f"Unsupported cross-encoder activation for ONNX export: {activation_name}")
+    max_length = getattr(ce, "max_seq_length", None) or ce.tokenizer.model_max_length
+
+    # Trace with a padded batch of two so masking is exported for batch > 1.
+    sample = ce.tokenizer(
+        ["query", "a longer query"], ["short passage", "a somewhat longer passage text"],
+        padding=True, return_tensors="pt",
+    )
+    input_names = list(sample.keys())
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *tensors):
+            return self.inner(**dict(zip(input_names, tensors))).logits
+
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    fp32_path = out_dir / FP32_NAME
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model), tuple(sample[name] for name in input_names), str(fp32_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+
+    if quantize:
+        quantize_onnx(out_dir)
+
+    ce.tokenizer.save_pretrained(str(out_dir))
+    with open(out_dir / META_NAME, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "activation": activation_name,
+            "max_length": int(max_length),
+            "num_labels": int(model.config.num_labels),
+            "input_names": input_names,
+        }, f, indent=2)
+    return out_dir / (INT8_NAME if quantize else FP32_NAME)
+
+
+def quantize_onnx(export_dir: PathLike) -> Path:
+    """Dynamic INT8 quantization of an exported graph's weights (activations stay FP32)."""
+    _require_onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    export_dir = Path(export_dir)
+    quantize_dynamic(str(export_dir / FP32_NAME), str(export_dir / INT8_NAME), weight_type=QuantType.QInt8)
+    return export_dir / INT8_NAME
+
+
+class OnnxCrossEncoder:
+    """
+    Cross-encoder scorer on onnxruntime with the ``CrossEncoder.predict`` interface.
+
+    Serving nodes are CPU-only, where torch inference of the reranker is the
+    slowest retrieval stage. The model is exported to ONNX once (cached under
+    ``cache_dir``) and by default dynamically quantized to INT8 weights, which
+    onnxruntime executes with integer GEMM kernels.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: PathLike,
+        quantize: bool = True,
+        intra_op_threads: int = 0,
+    ):
+        """
+        Args:
+            model_name: sentence-transformers cross-encoder name or path
+            cache_dir: Root directory for exported graphs (one subdirectory per model)
+            quantize: Serve the dynamically quantized INT8 graph instead of FP32
+            intra_op_threads: onnxruntime intra-op threads (0 = one per physical core)
+        """
+        ort = _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        export_dir = model_dir(cache_dir, model_name)
+        if not (export_dir / FP32_NAME).is_file() or not (export_dir / META_NAME).is_file():
+            print(f"Exporting {model_name} to ONNX in {export_dir}...")
+            export_onnx(model_name, export_dir, quantize=False)
+        graph = export_dir / (INT8_NAME if quantize else FP32_NAME)
+        if quantize and not graph.is_file():
+            quantize_onnx(export_dir)
+
+        with open(export_dir / META_NAME, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        self.max_length = self.meta["max_length"]
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(graph), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict(
+        self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs
+    ) -> np.ndarray:
+        """Scores for (query, passage) pairs, matching ``CrossEncoder.predict`` for single-label models."""
+        scores: List[np.ndarray] = []
+        for lo in range(0, len(pairs), batch_size):
+            batch = pairs[lo:lo + batch_size]
+            encoded = self.tokenizer(
+                [p[0] for p in batch], [p[1] for p in batch],
+                padding=True, truncation="longest_first",
+                max_length=self.max_length, return_tensors="np",
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            logits = self.session.run(None, feed)[0]
+            scores.append(logits[:, 0] if self.meta["num_labels"] == 1 else logits)
+
+        if not scores:
+            return np.zeros(0, dtype=np.float32)
+        out = np.concatenate(scores).astype(np.float32)
+        if self.meta["activation"] == "sigmoid":
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out
@@ -1,40 +1,345 @@
-import torch
-from typing import List, Dict, Any
-from sentence_transformers import CrossEncoder
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
+from ..instrumentation import count, stage
+from .cache import ScoreCache
 from .chunk_index import ChunkIndex
+from .fusion import aggregate_resumes, collapse_duplicates
 
-class CrossEncoderReranker:
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = CrossEncoder(model_name, device=device)
+RERANKER_BACKENDS = ("torch", "onnx")
 
-    def rerank(
+
+def token_budget_batches(lengths: Sequence[int], max_tokens: int) -> List[List[int]]:
+    """
+    Indices grouped into batches of similar length.
+
+    Indices are sorted by length, and each batch grows until its padded size
+    (pairs x longest pair) would exceed ``max_tokens``. Short pairs therefore
+    share large batches and long ones small batches, instead of every batch
+    being padded to whichever long chunk happened to land in it.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        # Sorted ascending, so lengths[i] is the batch's padded width.
+        if current and (len(current) + 1) * lengths[i] > max_tokens:
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def truncate_text(text: str, end: int) -> str:
+    """``text[:end]``, backed off to the last whitespace so no word is split."""
+    if end >= len(text) or text[end].isspace():
+        return text[:end]
+    cut = max(text.rfind(c, 0, end) for c in " \n\t")
+    # One long run without whitespace (URLs, tables): cut at the token boundary.
+    return text[:cut] if cut > 0 else text[:end]
+
+
+class CrossEncoderReranker:
+    def __init__(
         self,
-        query: str,
-        fused_results: List[Dict[str, Any]],
-        chunk_index: ChunkIndex,
-        top_k: int = 180
-    ) -> List[Dict[str, Any]]:
-        """Rerank fused results using cross-encoder"""
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 32,
+        score_cache: Optional[ScoreCache] = None,
+        max_batch_tokens: Optional[int] = 4096,
+        backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+        onnx_quantize: bool = True,
+        onnx_threads: int = 0,
+    ):
+        """
+        Args:
+            model_name: sentence-transformers cross-encoder name or path
+            batch_size: Pairs per model call (when max_batch_tokens is None)
+            score_cache: Optional cache of (query, chunk) scores
+            max_batch_tokens: Padded-token budget per model call for
+                length-bucketed batching; None keeps fixed ``batch_size`` batches
+            backend: "torch" (sentence-transformers) or "onnx" (onnxruntime on CPU,
+                see onnx_reranker.py)
+            onnx_dir: Where ONNX exports are cached (required for "onnx")
+            onnx_quantize: Serve the dynamically quantized INT8 graph
+            onnx_threads: onnxruntime intra-op threads (0 = runtime default)
+        """
+        if backend not in RERANKER_BACKENDS:
+            raise ValueError(f"Unknown reranker backend {backend!r}; expected one of {RERANKER_BACKENDS}")
+        if backend == "onnx":
+            if onnx_dir is None:
+                raise ValueError("onnx_dir is required for the onnx reranker backend")
+            from .onnx_reranker import OnnxCrossEncoder
+
+            self.model = OnnxCrossEncoder(
+                model_name, onnx_dir, quantize=onnx_quantize, intra_op_threads=onnx_threads
+            )
+        else:
+            # Imported here: torch and sentence-transformers take seconds to import.
+            import torch
+            from sentence_transformers import CrossEncoder
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.model = CrossEncoder(model_name, device=device)
+        self.model_name = model_name
+        self.backend = backend
+        # Quantized scores differ slightly from torch ones, so they are cached
+        # under their own name.
+        self.cache_name = f"{model_name}@onnx-int8" if backend == "onnx" and onnx_quantize else model_name
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.score_cache = score_cache
+        # Fast tokenizers reset their truncation/padding state on every call,
+        # so concurrent calls (asearch threads) would corrupt each other.
+        self._model_lock = threading.Lock()
+
+    @staticmethod
+    def _pairs(
+        query: str, fused_results: List[Dict[str, Any]], chunk_index: ChunkIndex
+    ) -> Tuple[List[Tuple[str, str]], List[Dict[str, Any]]]:
+        """
+        (query, chunk text) pairs for every fused hit whose chunk exists.
+
+        Hits from near-duplicates of a better-ranked resume are dropped first,
+        so the cross-encoder never scores the same resume twice.
+        """
         pairs = []
         valid_results = []
 
-        for r in fused_results:
+        for r in collapse_duplicates(fused_results, chunk_index.cluster_of):
             chunk = chunk_index.get(r.get("resume_id"), r.get("chunk_id"))
 
             if chunk:
                 pairs.append((query, chunk.page_content))
                 valid_results.append(r)
-        
-        ce_scores = self.model.predict(pairs).tolist()
-        
+        return pairs, valid_results
+
+    @staticmethod
+    def _apply_scores(
+        valid_results: List[Dict[str, Any]], ce_scores: List[float], top_k: int
+    ) -> List[Dict[str, Any]]:
         for result, score in zip(valid_results, ce_scores):
             result["ce_score"] = float(score)
-        
+
         reranked = sorted(valid_results, key=lambda x: x["ce_score"], reverse=True)[:top_k]
-        
+
         for i, r in enumerate(reranked, 1):
             r["rerank_position"] = i
-        
-        return reranked
\ No newline at end of file
+
+        return reranked
+
+    def _max_length(self) -> Optional[int]:
+        max_length = getattr(self.model, "max_seq_length", None) or getattr(self.model, "max_length", None)
+        if max_length is None:
+            max_length = getattr(self.model.tokenizer, "model_max_length", None)
+        # Tokenizers without a limit report a huge sentinel value.
+        return max_length if max_length and max_length < 100_000 else None
+
+    def _fit_pairs(
+        self, pairs: List[Tuple[str, str]]
+    ) -> Tuple[List[Tuple[str, str]], List[int]]:
+        """
+        Token length of every pair, with chunks cut to fit the model's max length.
+
+        Chunks longer than the room left after the query are cut at a word
+        boundary before that limit, rather than left to the tokenizer to chop
+        mid-word; pairs that already fit are passed through untouched.
+        """
+        tokenizer = self.model.tokenizer
+        max_length = self._max_length()
+        special = tokenizer.num_special_tokens_to_add(pair=True)
+
+        queries = list(dict.fromkeys(q for q, _ in pairs))
+        query_lens = dict(zip(
+            queries, (len(ids) for ids in tokenizer(queries, add_special_tokens=False)["input_ids"])
+        ))
+        # Truncated at max_length: anything longer gets cut anyway.
+        encoded = tokenizer(
+            [text for _, text in pairs],
+            add_special_tokens=False,
+            truncation=max_length is not None,
+            max_length=max_length,
+            return_offsets_mapping=max_length is not None,
+        )
+
+        fitted, lengths = [], []
+        for j, (query, text) in enumerate(pairs):
+            n_text = len(encoded["input_ids"][j])
+            if max_length is not None:
+                room = max_length - special - query_lens[query]
+                if 0 < room < n_text:
+                    text = truncate_text(text, encoded["offset_mapping"][j][room - 1][1])
+                    n_text = room
+            fitted.append((query, text))
+            lengths.append(special + query_lens[query] + n_text)
+        return fitted, lengths
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Cross-encoder scores in the order of ``pairs``.
+
+        Pairs are pre-tokenized, sorted by length and batched under
+        ``max_batch_tokens`` padded tokens, so little compute goes to padding
+        when short and long chunks are mixed. Scores are scattered back to the
+        input order.
+        """
+        if not pairs:
+            return []
+        count("cross_encoder_pairs", len(pairs))
+        with stage("cross_encoder", pairs=len(pairs)), self._model_lock:
+            if self.max_batch_tokens is None or getattr(self.model, "tokenizer", None) is None:
+                return self.model.predict(pairs, batch_size=self.batch_size).tolist()
+
+            fitted, lengths = self._fit_pairs(pairs)
+            scores: List[float] = [0.0] * len(pairs)
+            for batch in token_budget_batches(lengths, self.max_batch_tokens):
+                count("cross_encoder_batches")
+                predicted = self.model.predict([fitted[i] for i in batch], batch_size=len(batch))
+                for i, score in zip(batch, predicted.tolist()):
+                    scores[i] = score
+            return scores
+
+    def _cached_scores(
+        self, query: str, valid_results: List[Dict[str, Any]], corpus_version: Optional[str] = None
+    ) -> List[Optional[float]]:
+        """Scores already in the score cache (None for misses, or everything without a cache)."""
+        count("rerank_pairs", len(valid_results))
+        if self.score_cache is None:
+            return [None] * len(valid_results)
+        keys = [(r.get("resume_id"), r.get("chunk_id")) for r in valid_results]
+        scores = self.score_cache.get_many(self.cache_name, query, keys, corpus_version)
+        count("score_cache_hits", sum(score is not None for score in scores))
+        return scores
+
+    def _store_scores(
+        self,
+        query: str,
+        valid_results: List[Dict[str, Any]],
+        scores: List[float],
+        rows: List[int],
+        corpus_version: Optional[str] = None,
+    ):
+        if self.score_cache is not None and rows:
+            self.score_cache.put_many(self.cache_name, query, [
+                ((valid_results[i].get("resume_id"), valid_results[i].get("chunk_id")), scores[i])
+                for i in rows
+            ], corpus_version)
+
+    def _scores(
+        self,
+        query: str,
+        pairs: List[Tuple[str, str]],
+        valid_results: List[Dict[str, Any]],
+        corpus_version: Optional[str] = None,
+    ) -> List[float]:
+        """Cross-encoder scores for the pairs; only score-cache misses hit the model."""
+        ce_scores = self._cached_scores(query, valid_results, corpus_version)
+        missing = [i for i, score in enumerate(ce_scores) if score is None]
+        if missing:
+            predicted = self._predict([pairs[i] for i in missing])
+            for i, score in zip(missing, predicted):
+                ce_scores[i] = score
+            self._store_scores(query, valid_results, ce_scores, missing, corpus_version)
+        return ce_scores
+
+    def rerank(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_k: int = 180
+    ) -> List[Dict[str, Any]]:
+        """Rerank fused results using cross-encoder (only score-cache misses hit the model)"""
+        pairs, valid_results = self._pairs(query, fused_results, chunk_index)
+        scores = self._scores(query, pairs, valid_results, chunk_index.version)
+        return self._apply_scores(valid_results, scores, top_k)
+
+    def rerank_cascade(
+        self,
+        query: str,
+        fused_results: List[Dict[str, Any]],
+        chunk_index: ChunkIndex,
+        top_n: int = 5,
+        round_resumes: int = 5,
+        patience: int = 1,
+        top_k: int = 180,
+        aggregation: str = "max",
+        top_m: int = 3,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank resume by resume, stopping once the top-N resumes stop changing.
+
+        Resumes are visited in order of their aggregated fused score (see
+        ``aggregate_resumes``; ``"sum"`` adds their ``top_m`` best chunks),
+        ``round_resumes`` per round. After each round a resume's score is its
+        best chunk's cross-encoder score; once at least ``top_n`` resumes are
+        scored and the top-N set has survived ``patience`` rounds unchanged,
+        the remaining candidates are never scored. Returns only the scored
+        hits, like ``rerank``.
+        """
+        pairs, valid_results = self._pairs(query, fused_results, chunk_index)
+        groups: Dict[Any, List[int]] = {}
+        for i, r in enumerate(valid_results):
+            groups.setdefault(r.get("resume_id"), []).append(i)
+        order = [rid for rid, _ in aggregate_resumes(valid_results, aggregation, top_m)]
+
+        scored: List[int] = []
+        ce_scores: List[float] = []
+        best: Dict[Any, float] = {}
+        previous, stable = None, 0
+        for lo in range(0, len(order), round_resumes):
+            batch = [i for rid in order[lo:lo + round_resumes] for i in groups[rid]]
+            scores = self._scores(
+                query, [pairs[i] for i in batch], [valid_results[i] for i in batch], chunk_index.version
+            )
+            for i, score in zip(batch, scores):
+                rid = valid_results[i].get("resume_id")
+                best[rid] = max(best.get(rid, score), score)
+            scored += batch
+            ce_scores += scores
+
+            if len(best) < top_n:
+                continue
+            top = set(sorted(best, key=best.get, reverse=True)[:top_n])
+            stable = stable + 1 if top == previous else 0
+            previous = top
+            if stable >= patience:
+                break
+        return self._apply_scores([valid_results[i] for i in scored], ce_scores, top_k)
+
+    def rerank_many(
+        self,
+        queries: List[str],
+        fused_lists: List[List[Dict[str, Any]]],
+        chunk_index: ChunkIndex,
+        top_k: int = 180
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Rerank the fused results of several queries with shared model batches.
+
+        Every query's uncached (query, chunk) pairs are pooled before the
+        length-bucketed ``_predict``, so small per-query candidate lists still
+        fill whole batches. Scores are scattered back to their own query
+        afterwards.
+        """
+        per_query = []
+        flat, owners = [], []
+        for q, fused in zip(queries, fused_lists):
+            pairs, valid_results = self._pairs(q, fused, chunk_index)
+            ce_scores = self._cached_scores(q, valid_results, chunk_index.version)
+            missing = [i for i, score in enumerate(ce_scores) if score is None]
+            for i in missing:
+                flat.append(pairs[i])
+                owners.append((len(per_query), i))
+            per_query.append((q, valid_results, ce_scores, missing))
+
+        for (qi, i), score in zip(owners, self._predict(flat)):
+            per_query[qi][2][i] = score
+
+        reranked = []
+        for q, valid_results, ce_scores, missing in per_query:
+            self._store_scores(q, valid_results, ce_scores, missing, chunk_index.version)
+            reranked.append(self._apply_scores(valid_results, ce_scores, top_k))
+        return reranked
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..instrumentation import stage
+from .ann_index import IVFIndex
+from .bm25_index import BM25Index
+from .bm25_retriever import BM25Retriever
+from .chunk_index import chunk_column
+from .corpus_store import CorpusStore
+from .dense_retriever import DenseRetriever
+from .metadata_index import MetadataIndex
+
+SHARDS_MANIFEST = "shards.json"
+
+PathLike = Union[str, Path]
+Rows = Tuple[np.ndarray, np.ndarray]
+
+
+def shard_of(resume_id: Any, n_shards: int) -> int:
+    """Shard of a resume: a stable hash of its id, so every chunk of a resume lands together."""
+    return zlib.crc32(str(resume_id).encode("utf-8")) % n_shards
+
+
+def write_shards(store: CorpusStore, out_dir: PathLike, n_shards: int) -> Dict[str, Any]:
+    """
+    Partition a corpus store into ``n_shards`` shard stores by resume id hash.
+
+    Each shard is a ``CorpusStore`` of its chunks (same format, memory-mapped
+    when opened) plus ``rows.npy``, the global row of each shard row. Its BM25
+    postings are sliced from the global index (``BM25Index.subset``), so IDF
+    and length norms are those of the whole corpus and shard scores match the
+    unsharded ones exactly. Returns the ``shards.json`` manifest.
+    """
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1")
+    out_dir = Path(out_dir)
+    chunks = store.chunks()
+    bm25 = store.bm25_index()
+    if bm25 is None:
+        bm25 = BM25Index().fit([BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks])
+
+    shard_ids: Dict[Any, int] = {}
+    for rid in chunk_column(chunks, "resume_id"):
+        if rid not in shard_ids:
+            shard_ids[rid] = shard_of(rid, n_shards)
+    assignment = np.fromiter(
+        (shard_ids[rid] for rid in chunk_column(chunks, "resume_id")), dtype=np.int64, count=len(chunks)
+    )
+
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    shards = []
+    for s in range(n_shards):
+        rows = np.flatnonzero(assignment == s)
+        name = f"shard-{s:03d}"
+        shard = CorpusStore.write(
+            tmp / name, [chunks[int(r)] for r in rows], store.embedding_rows(rows),
+            embedding_model=store.embedding_model, bm25_index=bm25.subset(rows),
+        )
+        np.save(tmp / name / "rows.npy", rows)
+        shards.append({"name": name, "n_chunks": shard.n_chunks, "n_vectors": shard.n_vectors})
+
+    manifest = {
+        "n_shards": n_shards,
+        "n_chunks": store.n_chunks,
+        "source_fingerprint": store.fingerprint,
+        "embedding_model": store.embedding_model,
+        "columns": list(store.manifest["columns"]),
+        "shards": shards,
+    }
+    with open(tmp / SHARDS_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    old = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def shards_fingerprint(path: PathLike) -> Optional[str]:
+    """Fingerprint of the corpus store the shards at ``path`` were built from; None without shards."""
+    try:
+        with open(Path(path) / SHARDS_MANIFEST, "r", encoding="utf-8") as f:
+            return json.load(f)["source_fingerprint"]
+    except FileNotFoundError:
+        return None
+
+
+def merge_top_k(parts: Sequence[Rows], k: int) -> Rows:
+    """Global top-k of per-shard (rows, scores), ordered by score desc then row asc."""
+    rows = np.concatenate([p[0] for p in parts])
+    scores = np.concatenate([p[1] for p in parts])
+    order = np.lexsort((rows, -scores))[:k]
+    return rows[order], scores[order]
+
+
+class Shard:
+    """
+    The BM25 and dense indexes of one shard, answering in global rows.
+
+    Opened inside a shard worker process (see ``ShardedRetriever``); queries
+    arrive already embedded, so the dense retriever's API clients are unused.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        columns: Sequence[str] = (),
+        nprobe: Optional[int] = None,
+        pq_m: int = 0,
+    ):
+        self.path = Path(path)
+        self.store = CorpusStore(self.path)
+        self.rows = np.load(self.path / "rows.npy", mmap_mode="r")
+        chunks = self.store.chunks()
+
+        self.bm25 = BM25Retriever()
+        self.bm25.fit_index(chunks, self.store.bm25_index())
+        self.dense = DenseRetriever(api_key="unused")
+        self.dense.fit(
+            chunks, self.store.vectors, self.store.embedding_model,
+            normalized=True, vector_ids=self.store.vector_ids,
+        )
+        if nprobe is not None and self.store.n_chunks:
+            key = f"store:{self.store.fingerprint}"
+            index = IVFIndex.load(self.path / "ann_ivf", self.dense.Xn, key=key)
+            if index is None:
+                index = IVFIndex(nprobe=nprobe, pq_m=pq_m).fit(self.dense.Xn)
+                index.save(self.path / "ann_ivf", key=key)
+            index.nprobe = nprobe
+            self.dense.use_ann(index)
+        self.metadata = MetadataIndex(chunks, columns=columns)
+
+    def _global(self, hits: Rows) -> Rows:
+        rows, scores = hits
+        return self.rows[rows].astype(np.int64), scores
+
+    def search(
+        self,
+        queries: List[str],
+        Q: np.ndarray,
+        bm25_top_k: int,
+        dense_top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        exact: bool = False,
+    ) -> Tuple[List[Rows], List[Rows]]:
+        """Per-query BM25 and dense top-k of this shard, as (global rows, scores)."""
+        mask = self.metadata.mask(filters)
+        bm25 = [self._global(self.bm25.search_rows(q, bm25_top_k, mask=mask)) for q in queries]
+        dense = [self._global(hits) for hits in self.dense.search_vectors(Q, dense_top_k, exact=exact, mask=mask)]
+        return bm25, dense
+
+
+def _serve_shard(conn, path: str, columns: List[str], nprobe: Optional[int], pq_m: int):
+    """Shard worker loop: open the shard, then answer search requests until told to stop."""
+    try:
+        shard = Shard(path, columns, nprobe, pq_m)
+    except Exception as e:
+        conn.send(("error", e))
+        return
+    conn.send(("ok", shard.store.n_chunks))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            reply = ("ok", shard.search(*request))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable exception: send its description instead.
+            conn.send(("error", RuntimeError(repr(e))))
+
+
+class ShardedRetriever:
+    """
+    Scatter/gather BM25 + dense retrieval over a sharded corpus.
+
+    One ``ResumeRAGPipeline`` process holding the whole embedding matrix and
+    BM25 index caps corpus size at one process's memory and query latency at
+    one core. ``write_shards`` partitions the corpus by resume id; here every
+    shard is served by its own worker process, which memory-maps its shard
+    store. A query is embedded once, sent to every shard, and the per-shard
+    top-k lists are merged by (score, global row), so results equal the
+    unsharded search (BM25 exactly, thanks to the global statistics).
+
+    Rows returned are rows of the source corpus store, so the coordinator
+    reranks and summarizes from that store as before. With ``processes=False``
+    the shards are searched in-process, one after another (debugging, tests).
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        embedder: DenseRetriever,
+        processes: bool = True,
+        nprobe: Optional[int] = None,
+        pq_m: int = 0,
+        start_method: str = "spawn",
+    ):
+        """
+        Args:
+            path: Directory written by ``write_shards``
+            embedder: Dense retriever used (only) to embed queries, with its
+                query cache
+            nprobe, pq_m: Serve dense search from a per-shard IVF index
+                (built on first start); None for exact search
+            start_method: multiprocessing start method of the shard workers
+        """
+        self.path = Path(path)
+        with open(self.path / SHARDS_MANIFEST, "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.embedder = embedder
+        self.source_fingerprint: str = self.manifest["source_fingerprint"]
+        self._lock = threading.Lock()
+        self._local: List[Shard] = []
+        self._workers: List[Tuple[Any, Any]] = []
+
+        shard_args = [
+            (str(self.path / s["name"]), self.manifest["columns"], nprobe, pq_m)
+            for s in self.manifest["shards"]
+        ]
+        if not processes:
+            self._local = [Shard(*args) for args in shard_args]
+            return
+        ctx = multiprocessing.get_context(start_method)
+        for args in shard_args:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_serve_shard, args=(child,) + args, name=f"shard-{len(self._workers)}", daemon=True)
+            proc.start()
+            child.close()
+            self._workers.append((proc, parent))
+        try:
+            # Workers open their shards in parallel; wait for all of them.
+            self._replies()
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def exists(path: PathLike) -> bool:
+        return (Path(path) / SHARDS_MANIFEST).is_file()
+
+    @property
+    def n_shards(self) -> int:
+        return self.manifest["n_shards"]
+
+    def _replies(self) -> List[Any]:
+        """
+        Every worker's reply to the last request, raising the first error.
+
+        All replies are read before raising: one left in a pipe would be taken
+        as the answer to the next request.
+        """
+        replies = []
+        for proc, conn in self._workers:
+            try:
+                replies.append(conn.recv())
+            except EOFError:
+                replies.append(("error", RuntimeError(f"Shard worker {proc.name} exited (code {proc.exitcode})")))
+        for status, payload in replies:
+            if status == "error":
+                raise payload
+        return [payload for _, payload in replies]
+
+    def _scatter(
+        self,
+        queries: List[str],
+        Q: np.ndarray,
+        bm25_top_k: int,
+        dense_top_k: int,
+        filters: Optional[Dict[str, Any]],
+        exact: bool,
+    ) -> Tuple[List[Rows], List[Rows]]:
+        """Search every shard and merge their per-query top-k lists."""
+        request = (queries, Q, bm25_top_k, dense_top_k, filters, exact)
+        with stage("shard_search", shards=self.n_shards, queries=len(queries)):
+            if self._local:
+                replies = [shard.search(*request) for shard in self._local]
+            else:
+                # One request in flight per worker pipe: concurrent callers take turns,
+                # while the shards of each request are searched in parallel.
+                with self._lock:
+                    for _, conn in self._workers:
+                        conn.send(request)
+                    replies = self._replies()
+        with stage("shard_merge"):
+            bm25 = [merge_top_k([r[0][i] for r in replies], bm25_top_k) for i in range(len(queries))]
+            dense = [merge_top_k([r[1][i] for r in replies], dense_top_k) for i in range(len(queries))]
+        return bm25, dense
+
+    def search_rows(
+        self,
+        query: str,
+        bm25_top_k: int = 200,
+        dense_top_k: int = 200,
+        filters: Optional[Dict[str, Any]] = None,
+        exact: bool = False,
+    ) -> Tuple[Rows, Rows]:
+        """BM25 and dense (rows, scores) of one query, as ``BM25Retriever``/``DenseRetriever.search_rows``."""
+        bm25, dense = self.search_many_rows([query], bm25_top_k, dense_top_k, filters, exact)
+        return bm25[0], dense[0]
+
+    def search_many_rows(
+        self,
+        queries: List[str],
+        bm25_top_k: int = 200,
+        dense_top_k: int = 200,
+        filters: Optional[Dict[str, Any]] = None,
+        exact: bool = False,
+    ) -> Tuple[List[Rows], List[Rows]]:
+        """Per-query BM25 and dense (rows, scores) for a batch; one round trip to every shard."""
+        if not queries:
+            return [], []
+        Q = self.embedder._embed_queries(queries)
+        return self._scatter(queries, Q, bm25_top_k, dense_top_k, filters, exact)
+
+    async def asearch_rows(
+        self,
+        query: str,
+        bm25_top_k: int = 200,
+        dense_top_k: int = 200,
+        filters: Optional[Dict[str, Any]] = None,
+        exact: bool = False,
+    ) -> Tuple[Rows, Rows]:
+        """Async ``search_rows``: the embedding call is awaited, the scatter/gather runs in a worker thread"""
+        q = await self.embedder._aembed_query(query)
+        bm25, dense = await asyncio.to_thread(
+            self._scatter, [query], q[None, :], bm25_top_k, dense_top_k, filters, exact
+        )
+        return bm25[0], dense[0]
+
+    def close(self):
+        """Stop the shard worker processes."""
+        for proc, conn in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for proc, conn in self._workers:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+            conn.close()
+        self._workers = []
+
+    def __enter__(self) -> "ShardedRetriever":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
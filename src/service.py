@@ -0,0 +1,556 @@
+"""
+Long-running HTTP query service around ``ResumeRAGPipeline``.
+
+The pipeline (corpus, BM25/dense indexes, cross-encoder) is loaded once per
+worker process and serves every request. Endpoints (JSON in, JSON out):
+
+- ``POST /search``        ``{"query": ..., "top_k": 5, "filters": {...}}``
+- ``POST /search/batch``  ``{"queries": [...], ...}``
+- ``POST /search/stream`` same body as ``/search``; newline-delimited JSON
+  events (``candidates``, ``token``, ``summary``, ``error``) as summaries
+  are generated
+- ``GET /health``         worker status and queue depth
+- ``GET /metrics``        stage latency histograms and counters (Prometheus text)
+
+With tracing on, each response carries the request's ``trace`` (per-stage
+milliseconds and counters; streams end with a ``trace`` event).
+
+Optional body fields: ``top_k`` (resumes summarized), ``bm25_top_k``,
+``dense_top_k``, ``rerank_top_k`` and ``filters`` (see ``MetadataIndex``).
+
+Concurrent requests are coalesced by ``MicroBatcher`` into one batched
+retrieval + rerank call (one embedding request, one dense matrix product,
+shared cross-encoder batches); summaries are then generated per request,
+concurrently. ``serve`` runs one process, or pre-forks several that accept
+on a shared socket and share the memory-mapped corpus store via the page
+cache. Only the standard library is used for HTTP.
+"""
+import asyncio
+import http
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    BATCH_WINDOW_MS,
+    BM25_TOP_K,
+    DENSE_TOP_K,
+    MAX_BATCH_SIZE,
+    MAX_PENDING_REQUESTS,
+    RERANK_TOP_K,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_WORKERS,
+    SUMMARY_TOP_N,
+    TRACE_QUERIES,
+)
+from .instrumentation import PrometheusSink, Trace, activate, aiterate, emit, merge, stage, traced_call
+
+if TYPE_CHECKING:
+    from .pipeline import ResumeRAGPipeline
+
+MAX_BODY_BYTES = 1 << 20
+# A pre-forked worker that dies this soon after starting is failing to boot;
+# the service stops instead of restarting it in a loop.
+MIN_WORKER_UPTIME = 5.0
+
+# (bm25_top_k, dense_top_k, rerank_top_k, top_k, filters)
+RankParams = Tuple[int, int, int, int, Optional[Dict[str, Any]]]
+
+
+class Overloaded(RuntimeError):
+    """Raised when a worker already has its maximum number of requests in progress."""
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+def _rank_params(body: Dict[str, Any]) -> RankParams:
+    """Search parameters of a request body, validated."""
+    params = []
+    for name, default in (
+        ("bm25_top_k", BM25_TOP_K), ("dense_top_k", DENSE_TOP_K),
+        ("rerank_top_k", RERANK_TOP_K), ("top_k", SUMMARY_TOP_N),
+    ):
+        value = body.get(name, default)
+        if type(value) is not int or value < 1:
+            raise HTTPError(400, f"{name} must be a positive integer")
+        params.append(value)
+    filters = body.get("filters")
+    if filters is not None and not isinstance(filters, dict):
+        raise HTTPError(400, "filters must be an object")
+    return tuple(params) + (filters or None,)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent ranking requests into batched pipeline calls.
+
+    A request waits at most ``window`` seconds for others to join its batch
+    (none when ``max_batch`` are already waiting). Only requests with the same
+    parameters and filters share a batch. Batches run one at a time on a
+    dedicated thread, so requests arriving meanwhile form the next batch: the
+    busier the service, the larger the batches.
+    """
+
+    def __init__(
+        self,
+        rank_many: Callable[..., Tuple[List[List[Dict[str, Any]]], Any]],
+        window: float = BATCH_WINDOW_MS / 1000,
+        max_batch: int = MAX_BATCH_SIZE,
+        trace: bool = TRACE_QUERIES,
+    ):
+        self.rank_many = rank_many
+        self.window = window
+        self.max_batch = max_batch
+        self.trace = trace
+        self._waiting: List[Tuple[Hashable, str, RankParams, asyncio.Future]] = []
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.n_batches = 0
+        self.n_queries = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def start(self):
+        self._ready = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rank-batch")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._executor.shutdown(wait=False)
+
+    async def rank(self, query: str, params: RankParams) -> Tuple[List[Dict[str, Any]], Any]:
+        """Reranked hits of one query and the chunk index they refer to; the batch's trace is merged into the active one."""
+        future = asyncio.get_running_loop().create_future()
+        key = params[:4] + (json.dumps(params[4], sort_keys=True),)
+        self._waiting.append((key, query, params, future))
+        self._ready.set()
+        reranked, chunk_index, trace = await future
+        merge(trace)
+        return reranked, chunk_index
+
+    def _take(self) -> List[Tuple[Hashable, str, RankParams, asyncio.Future]]:
+        """Up to max_batch waiting requests sharing the oldest request's parameters, in arrival order."""
+        key = self._waiting[0][0]
+        batch, rest = [], []
+        for item in self._waiting:
+            (batch if item[0] == key and len(batch) < self.max_batch else rest).append(item)
+        self._waiting = rest
+        if not rest:
+            self._ready.clear()
+        # Requests whose client went away are dropped.
+        return [item for item in batch if not item[3].done()]
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            if len(self._waiting) < self.max_batch:
+                await asyncio.sleep(self.window)
+            batch = self._take()
+            if not batch:
+                continue
+            self.n_batches += 1
+            self.n_queries += len(batch)
+            trace = Trace("rank_batch", queries=len(batch)) if self.trace else None
+            try:
+                reranked_lists, chunk_index = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, traced_call, trace, self.rank_many, [item[1] for item in batch], *batch[0][2]
+                )
+            except Exception as e:
+                for item in batch:
+                    if not item[3].done():
+                        item[3].set_exception(e)
+            else:
+                if trace is not None:
+                    trace.finish()
+                for item, reranked in zip(batch, reranked_lists):
+                    if not item[3].done():
+                        item[3].set_result((reranked, chunk_index, trace))
+
+
+class SearchService:
+    """HTTP endpoints over one loaded pipeline, with micro-batching and admission control."""
+
+    def __init__(
+        self,
+        pipeline: "ResumeRAGPipeline",
+        batch_window_ms: float = BATCH_WINDOW_MS,
+        max_batch: int = MAX_BATCH_SIZE,
+        max_pending: int = MAX_PENDING_REQUESTS,
+        trace: Optional[bool] = None,
+    ):
+        self.pipeline = pipeline
+        self.trace = getattr(pipeline, "trace_queries", TRACE_QUERIES) if trace is None else trace
+        self.batcher = MicroBatcher(pipeline._rank_many, batch_window_ms / 1000, max_batch, self.trace)
+        self.metrics = PrometheusSink()
+        self.sinks = [self.metrics] + list(getattr(pipeline, "sinks", []))
+        self.max_pending = max_pending
+        self.pending = 0
+        self.started = time.time()
+
+    @contextmanager
+    def _admit(self, n: int = 1) -> Iterator[None]:
+        """Count ``n`` queries as in progress, or raise ``Overloaded`` if that exceeds max_pending."""
+        if self.pending + n > self.max_pending:
+            raise Overloaded(f"{self.pending} requests in progress")
+        self.pending += n
+        try:
+            yield
+        finally:
+            self.pending -= n
+
+    def _trace(self, name: str, **attrs: Any) -> Optional[Trace]:
+        return Trace(name, **attrs) if self.trace else None
+
+    def _finish(self, trace: Optional[Trace]) -> Dict[str, Any]:
+        """Emit ``trace`` to the sinks; the response fields carrying it."""
+        if trace is None:
+            return {}
+        emit(trace, self.sinks)
+        return {"trace": trace.to_dict()}
+
+    async def search(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        query = self._query(body.get("query"))
+        params = _rank_params(body)
+        trace = self._trace("search", query=query)
+        with self._admit(), activate(trace):
+            with stage("rank"):
+                reranked, chunk_index = await self.batcher.rank(query, params)
+            results = await self.pipeline._asummarize(query, reranked, chunk_index, params[3])
+        return {"query": query, "results": results, **self._finish(trace)}
+
+    async def search_batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        queries = body.get("queries")
+        if not isinstance(queries, list) or not queries:
+            raise HTTPError(400, "queries must be a non-empty list of strings")
+        queries = [self._query(q) for q in queries]
+        params = _rank_params(body)
+
+        async def one(query: str) -> List[Dict[str, Any]]:
+            with stage("rank", query=query):
+                reranked, chunk_index = await self.batcher.rank(query, params)
+            return await self.pipeline._asummarize(query, reranked, chunk_index, params[3])
+
+        trace = self._trace("search_batch", queries=len(queries))
+        with self._admit(len(queries)), activate(trace):
+            results = await asyncio.gather(*(one(q) for q in queries))
+        return {"queries": queries, "results": results, **self._finish(trace)}
+
+    async def search_stream(self, body: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        query = self._query(body.get("query"))
+        params = _rank_params(body)
+        trace = self._trace("search_stream", query=query)
+        with self._admit():
+            with activate(trace), stage("rank"):
+                reranked, chunk_index = await self.batcher.rank(query, params)
+            events = self.pipeline._asummarize_stream(query, reranked, chunk_index, params[3])
+            async for event in aiterate(trace, events):
+                yield event
+            if trace is not None:
+                yield {"type": "trace", **self._finish(trace)}
+
+    def health(self) -> Dict[str, Any]:
+        batcher = self.batcher
+        return {
+            "status": "ok",
+            "warm": getattr(self.pipeline, "warm", True),
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "chunks": len(self.pipeline.chunks),
+            "pending": self.pending,
+            "queued": batcher.queued,
+            "max_pending": self.max_pending,
+            "batches": batcher.n_batches,
+            "mean_batch_size": round(batcher.n_queries / batcher.n_batches, 2) if batcher.n_batches else None,
+        }
+
+    def metrics_text(self) -> str:
+        return self.metrics.exposition()
+
+    @staticmethod
+    def _query(query: Any) -> str:
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "query must be a non-empty string")
+        return query.strip()
+
+    # HTTP/1.1 over asyncio streams
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One client connection: requests are served in order while the client keeps it alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                await self._dispatch(method, target.split("?", 1)[0], body, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, raw: bytes, writer: asyncio.StreamWriter, keep_alive: bool):
+        routes = {
+            "/health": ("GET", self.health),
+            "/metrics": ("GET", self.metrics_text),
+            "/search": ("POST", self.search),
+            "/search/batch": ("POST", self.search_batch),
+            "/search/stream": ("POST", self.search_stream),
+        }
+        try:
+            if path not in routes:
+                raise HTTPError(404, f"no route {path}")
+            allowed, endpoint = routes[path]
+            if method != allowed:
+                raise HTTPError(405, f"{path} only accepts {allowed}")
+            if method == "GET":
+                return await self._send(writer, 200, endpoint(), keep_alive)
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                raise HTTPError(400, "body is not valid JSON") from None
+            if not isinstance(body, dict):
+                raise HTTPError(400, "body must be a JSON object")
+            if endpoint == self.search_stream:
+                return await self._stream(writer, endpoint(body), keep_alive)
+            await self._send(writer, 200, await endpoint(body), keep_alive)
+        except HTTPError as e:
+            await self._send(writer, e.status, {"error": str(e)}, keep_alive)
+        except Overloaded as e:
+            await self._send(writer, 503, {"error": f"overloaded: {e}"}, keep_alive, {"Retry-After": "1"})
+        except ValueError as e:
+            # Invalid filters and similar request errors raised by the pipeline.
+            await self._send(writer, 400, {"error": str(e)}, keep_alive)
+        except Exception as e:
+            traceback.print_exc()
+            await self._send(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Any,
+        keep_alive: bool,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = _dumps(payload), "application/json"
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {}),
+        }
+        writer.write(self._head(status, headers) + body)
+        await writer.drain()
+
+    async def _stream(self, writer: asyncio.StreamWriter, events: AsyncIterator[Dict[str, Any]], keep_alive: bool):
+        """NDJSON over chunked transfer encoding; errors before the first event get a normal status."""
+        try:
+            event = await events.__anext__()
+        except StopAsyncIteration:
+            event = None
+        writer.write(self._head(200, {
+            "Content-Type": "application/x-ndjson",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive" if keep_alive else "close",
+        }))
+        try:
+            while event is not None:
+                line = _dumps(event) + b"\n"
+                writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+                await writer.drain()
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            await events.aclose()
+            raise
+        except Exception as e:
+            # Headers are sent: report the failure as a final event.
+            traceback.print_exc()
+            line = _dumps({"type": "error", "error": f"{type(e).__name__}: {e}"}) + b"\n"
+            writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def start(
+        self, sock: Optional[socket.socket] = None, host: str = SERVICE_HOST, port: int = SERVICE_PORT
+    ) -> asyncio.AbstractServer:
+        """
+        Start the batcher and accept connections (on ``sock`` if given).
+
+        The pipeline's deferred components (cross-encoder, API clients) load
+        in the background meanwhile; ``/health`` reports ``warm`` once done.
+        """
+        self.batcher.start()
+        if not getattr(self.pipeline, "warm", True):
+            self.pipeline.warmup(background=True)
+        if sock is not None:
+            return await asyncio.start_server(self.handle, sock=sock)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve(self, sock: Optional[socket.socket] = None, host: str = SERVICE_HOST, port: int = SERVICE_PORT):
+        """Serve until SIGINT/SIGTERM, then stop accepting and shut down."""
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        server = await self.start(sock, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Worker {os.getpid()} serving on http://{address[0]}:{address[1]}")
+        async with server:
+            await stop.wait()
+        await self.batcher.stop()
+
+
+def serve(
+    pipeline_factory: Callable[[], "ResumeRAGPipeline"],
+    host: str = SERVICE_HOST,
+    port: int = SERVICE_PORT,
+    workers: int = SERVICE_WORKERS,
+    preload: bool = False,
+    **service_kwargs: Any,
+):
+    """
+    Run the HTTP service until interrupted.
+
+    With ``workers > 1`` the listening socket is bound once and the process
+    forks that many workers accepting on it (POSIX only); each builds its own
+    pipeline, whose memory-mapped corpus store pages are shared through the OS
+    page cache. ``preload`` builds the pipeline before forking instead, so the
+    workers also share the cross-encoder weights copy-on-write (not supported
+    for sharded pipelines, whose shard workers belong to one process). Dead
+    workers are restarted.
+    """
+    sock = socket.create_server((host, port), backlog=1024)
+    pipeline = pipeline_factory() if preload or workers <= 1 else None
+    if workers <= 1:
+        try:
+            asyncio.run(SearchService(pipeline, **service_kwargs).serve(sock))
+        finally:
+            sock.close()
+        return
+    if pipeline is not None and getattr(pipeline, "shards", None) is not None:
+        raise ValueError("Preloading is not supported for sharded pipelines; run one worker or drop --preload")
+    if pipeline is not None:
+        # Loaded before forking so the workers share the weights. No forward pass:
+        # the model's thread pool must not be started before fork.
+        pipeline.warmup(predict=False)
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                worker_pipeline = pipeline if pipeline is not None else pipeline_factory()
+                asyncio.run(SearchService(worker_pipeline, **service_kwargs).serve(sock))
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{sock.getsockname()[1]} with {workers} workers")
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = children.pop(pid, None)
+            if stopping or started is None:
+                continue
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                print(f"Worker {pid} failed to start (status {status}); shutting down")
+                stop(signal.SIGTERM, None)
+                continue
+            print(f"Worker {pid} exited (status {status}); restarting")
+            spawn()
+    finally:
+        sock.close()
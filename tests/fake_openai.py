@@ -0,0 +1,171 @@
+"""
+Minimal OpenAI-compatible HTTP server for tests.
+
+Serves ``/v1/embeddings`` (deterministic hash-seeded vectors) and
+``/v1/chat/completions`` (plain or ``stream=True`` server-sent events) with
+configurable latency (also between streamed chunks) and injected failures, and
+records request counts, embedding batch sizes and peak concurrency.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Container, List
+
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int = 16) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        dim: int = 16,
+        chat_delay: float = 0.0,
+        fail_first: int = 0,
+        fail_status: int = 500,
+        embed_delay: float = 0.0,
+        embed_fail: Container[int] = (),
+        embed_fail_status: int = 429,
+        stream_delay: float = 0.0,
+    ):
+        self.dim = dim
+        self.chat_delay = chat_delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.embed_delay = embed_delay
+        self.embed_fail = embed_fail  # 1-based embedding request numbers to fail
+        self.embed_fail_status = embed_fail_status
+        self.stream_delay = stream_delay  # seconds before each streamed chunk
+        self.requests = {"embeddings": 0, "chat": 0}
+        self.embed_batches: List[List[str]] = []  # inputs of each successful embedding request
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.embed_in_flight = 0
+        self.max_embed_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, n, model, content):
+                """Server-sent events in the chat.completion.chunk format, one word per chunk."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    time.sleep(server.stream_delay)
+                    chunk = {
+                        "id": f"chatcmpl-{n}",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if i == 0 else " " + word},
+                            "finish_reason": None,
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path.endswith("/embeddings"):
+                    with server._lock:
+                        server.requests["embeddings"] += 1
+                        n = server.requests["embeddings"]
+                        server.embed_in_flight += 1
+                        server.max_embed_in_flight = max(server.max_embed_in_flight, server.embed_in_flight)
+                    try:
+                        time.sleep(server.embed_delay)
+                    finally:
+                        with server._lock:
+                            server.embed_in_flight -= 1
+                    if n in server.embed_fail:
+                        self._send(server.embed_fail_status, {"error": {"message": "injected failure"}})
+                        return
+                    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    with server._lock:
+                        server.embed_batches.append(inputs)
+                    self._send(200, {
+                        "object": "list",
+                        "model": body["model"],
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": fake_embedding(t, server.dim).tolist()}
+                            for i, t in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    })
+                elif self.path.endswith("/chat/completions"):
+                    with server._lock:
+                        server.requests["chat"] += 1
+                        n = server.requests["chat"]
+                        server.in_flight += 1
+                        server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    try:
+                        time.sleep(server.chat_delay)
+                        if n <= server.fail_first:
+                            self._send(server.fail_status, {"error": {"message": "injected failure"}})
+                            return
+                        prompt = body["messages"][-1]["content"]
+                        content = f"summary ({len(prompt)} chars)"
+                        if body.get("stream"):
+                            self._stream(n, body["model"], content)
+                            return
+                        self._send(200, {
+                            "id": f"chatcmpl-{n}",
+                            "object": "chat.completion",
+                            "created": 0,
+                            "model": body["model"],
+                            "choices": [{
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        })
+                    finally:
+                        with server._lock:
+                            server.in_flight -= 1
+                else:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        return Handler
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.ann_index import IVFIndex, recall_at_k
+
+
+def _data(n=3000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    X = centers[rng.integers(0, 20, n)] + 0.5 * rng.normal(size=(n, dim))
+    X = (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+    return X, X[rng.choice(n, 20)]
+
+
+def test_full_probe_is_exact():
+    X, Q = _data()
+    index = IVFIndex(nlist=16).fit(X)
+    rows = recall_at_k(index, X, Q, k=50, nprobe_values=[16])
+    assert rows[-1]["recall"] == 1.0
+
+
+def test_pq_recall_and_persistence(tmp_path):
+    X, Q = _data()
+    index = IVFIndex(nlist=16, pq_m=8).fit(X)
+    assert recall_at_k(index, X, Q, k=50, nprobe_values=[16])[-1]["recall"] > 0.9
+
+    index.save(tmp_path / "ivf", key="corpus-a")
+    assert IVFIndex.load(tmp_path / "ivf", X, key="corpus-b") is None
+    loaded = IVFIndex.load(tmp_path / "ivf", X, key="corpus-a")
+    for q in Q:
+        assert np.array_equal(loaded.search(q, 10)[0], index.search(q, 10)[0])
@@ -0,0 +1,177 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fake_openai import FakeOpenAIServer, fake_embedding
+from tiny_cross_encoder import WORDS, tiny_cross_encoder
+import src.pipeline
+from src.generation.summarizer import ResumeSummarizer
+from src.pipeline import ResumeRAGPipeline
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.chunk_index import ChunkIndex
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.dense_retriever import DenseRetriever
+
+
+def _chunks(n_resumes=4):
+    return [
+        Document(
+            page_content=f"## Experience\nresume {r} section {c} python docker",
+            metadata={"resume_id": f"r{r}", "chunk_id": c},
+        )
+        for r in range(n_resumes) for c in range(2)
+    ]
+
+
+def _hits(chunks):
+    return [{"resume_id": c.metadata["resume_id"], "chunk_id": c.metadata["chunk_id"],
+             "rrf_score": 1.0 / (i + 1), "ce_score": -i} for i, c in enumerate(chunks)]
+
+
+def test_asummarize_concurrent_with_retry():
+    chunks = _chunks()
+    with FakeOpenAIServer(chat_delay=0.3, fail_first=1) as server:
+        summarizer = ResumeSummarizer("test", base_url=server.base_url, max_concurrency=4, retry_backoff=0.01)
+        t0 = time.perf_counter()
+        results = asyncio.run(summarizer.asummarize("python", _hits(chunks), ChunkIndex(chunks), top_n=4))
+        elapsed = time.perf_counter() - t0
+
+    assert [r["resume_id"] for r in results] == ["r0", "r1", "r2", "r3"]
+    assert server.requests["chat"] == 5  # one injected failure, retried
+    assert server.max_in_flight >= 2
+    assert elapsed < 4 * 0.3
+
+
+def test_asummarize_timeout():
+    chunks = _chunks(1)
+    with FakeOpenAIServer(chat_delay=1.0) as server:
+        summarizer = ResumeSummarizer("test", base_url=server.base_url, timeout=0.1, max_retries=1, retry_backoff=0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(summarizer.asummarize("python", _hits(chunks), ChunkIndex(chunks), top_n=1))
+    assert server.requests["chat"] == 2
+
+
+def test_asummarize_stream_timeout_covers_streamed_chunks():
+    chunks = _chunks(1)
+    # The response starts at once, but its three chunks take 0.6s in all.
+    with FakeOpenAIServer(stream_delay=0.2) as server:
+        summarizer = ResumeSummarizer("test", base_url=server.base_url, timeout=0.3)
+
+        async def collect():
+            return [e async for e in summarizer.asummarize_stream("python", _hits(chunks), ChunkIndex(chunks), top_n=1)]
+        events = asyncio.run(collect())
+
+    assert events[-1] == {"type": "error", "resume_id": "r0", "error": "Timed out after 0.3s"}
+    assert not any(e["type"] == "summary" for e in events)
+
+
+def test_summarize_stream_timeout():
+    chunks = _chunks(2)
+    # Chunks trickling in past the deadline, then a server that never answers in time.
+    for options in ({"stream_delay": 0.2}, {"chat_delay": 2.0}):
+        with FakeOpenAIServer(**options) as server:
+            summarizer = ResumeSummarizer("test", base_url=server.base_url, timeout=0.3, max_concurrency=2)
+            t0 = time.perf_counter()
+            events = list(summarizer.summarize_stream("python", _hits(chunks), ChunkIndex(chunks), top_n=2))
+            elapsed = time.perf_counter() - t0
+        errors = {e["resume_id"]: e["error"] for e in events if e["type"] == "error"}
+        assert errors == {"r0": "Timed out after 0.3s", "r1": "Timed out after 0.3s"}
+        assert not any(e["type"] == "summary" for e in events) and elapsed < 1.0
+
+
+def test_dense_asearch_matches_search():
+    chunks = _chunks()
+    emb = np.vstack([fake_embedding(c.page_content) for c in chunks])
+    with FakeOpenAIServer() as server:
+        dense = DenseRetriever("test", base_url=server.base_url)
+        dense.fit(chunks, emb, "fake-embedding")
+        assert asyncio.run(dense.asearch("python docker", top_k=5)) == dense.search("python docker", top_k=5)
+
+
+def test_summarize_stream_events():
+    chunks = _chunks(3)
+    with FakeOpenAIServer(chat_delay=0.1) as server:
+        summarizer = ResumeSummarizer("test", base_url=server.base_url)
+        events = list(summarizer.summarize_stream("python", _hits(chunks), ChunkIndex(chunks), top_n=3))
+
+        async def collect():
+            return [e async for e in summarizer.asummarize_stream("python", _hits(chunks), ChunkIndex(chunks), top_n=3)]
+        async_events = asyncio.run(collect())
+
+    for stream in (events, async_events):
+        assert stream[0]["type"] == "candidates"
+        assert [r["resume_id"] for r in stream[0]["results"]] == ["r0", "r1", "r2"]
+        summaries = {e["resume_id"]: e for e in stream if e["type"] == "summary"}
+        assert set(summaries) == {"r0", "r1", "r2"}
+        for rid, summary in summaries.items():
+            tokens = "".join(e["delta"] for e in stream if e["type"] == "token" and e["resume_id"] == rid)
+            assert tokens == summary["summary"]
+
+
+def _pipeline(tmp_path, server, monkeypatch):
+    """A pipeline over a tiny corpus store, the fake OpenAI server and a tiny cross-encoder."""
+    rng = np.random.default_rng(0)
+    chunks = [
+        Document(page_content=" ".join(rng.choice(WORDS, size=8)), metadata={"resume_id": f"r{r}", "chunk_id": c})
+        for r in range(6) for c in range(3)
+    ]
+    CorpusStore.write(
+        tmp_path / "corpus", chunks, np.vstack([fake_embedding(c.page_content) for c in chunks]), "fake-embedding",
+        bm25_index=BM25Index().fit([BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]),
+    )
+    monkeypatch.setattr(src.pipeline, "OPENAI_BASE_URL", server.base_url)
+    return ResumeRAGPipeline(
+        api_key="test", corpus_dir=str(tmp_path / "corpus"), shards_dir=str(tmp_path / "shards"),
+        reranker_model=tiny_cross_encoder(tmp_path / "ce"), verbose=False,
+        query_cache_path=None, score_cache_path=tmp_path / "scores.sqlite",
+    )
+
+
+def _untraced(results):
+    return [{k: v for k, v in r.items() if k != "trace"} for r in results]
+
+
+def _by_resume(events):
+    """Stream events grouped per resume (streams interleave resumes in completion order)."""
+    grouped = {}
+    for e in events:
+        if e["type"] in ("token", "summary", "error"):
+            grouped.setdefault(e["resume_id"], []).append(e)
+    return grouped
+
+
+def test_pipeline_async_streaming_and_batched_searches_match_search(tmp_path, monkeypatch):
+    queries = ["python developer with docker", "nurse manager with years of experience"]
+    kwargs = dict(bm25_top_k=10, dense_top_k=10, top_k_rerank=12, top_k_summarize=3)
+    with FakeOpenAIServer() as server:
+        pipeline = _pipeline(tmp_path, server, monkeypatch)
+        assert pipeline.dense.query_cache.disk is None
+        expected = [_untraced(pipeline.search(q, **kwargs)) for q in queries]
+        assert all(len(results) == 3 and all("summary" in r for r in results) for results in expected)
+        assert len({r["resume_id"] for r in expected[0]}) == 3
+
+        assert [_untraced(results) for results in pipeline.search_many(queries, **kwargs)] == expected
+        assert pipeline.reranker.score_cache.disk.path == tmp_path / "scores.sqlite"
+
+        async def asearches():
+            # One event loop, as in the service: the async clients belong to it.
+            results = await pipeline.asearch(queries[0], **kwargs)
+            return results, [e async for e in pipeline.asearch_stream(queries[0], **kwargs)]
+
+        async_results, async_events = asyncio.run(asearches())
+        assert _untraced(async_results) == expected[0]
+        for events in (list(pipeline.search_stream(queries[0], **kwargs)), async_events):
+            assert events[0]["type"] == "candidates" and events[-1]["type"] == "trace"
+            assert [r["resume_id"] for r in events[0]["results"]] == [r["resume_id"] for r in expected[0]]
+            grouped = _by_resume(events)
+            for result in expected[0]:
+                summary = grouped[result["resume_id"]][-1]
+                assert summary["type"] == "summary" and summary["summary"] == result["summary"]
+        pipeline.close()
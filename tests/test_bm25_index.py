@@ -0,0 +1,66 @@
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.bm25_index import BM25Index
+
+
+def _corpus(n_docs=300, vocab_size=80, seed=7):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    # A few very common terms push IDF negative and exercise the epsilon floor.
+    return [
+        rng.choices(vocab[:3], k=3) + rng.choices(vocab, k=rng.randint(1, 40))
+        for _ in range(n_docs)
+    ]
+
+
+def test_scores_match_bm25okapi():
+    corpus = _corpus()
+    ref = BM25Okapi(corpus)
+    index = BM25Index().fit(corpus)
+    for query in (["w0"], ["w5", "w17", "w5"], ["w1", "nope", "w79"], [], ["nope"]):
+        assert np.array_equal(index.get_scores(query), ref.get_scores(query))
+
+
+def test_top_k_matches_stable_sort():
+    corpus = _corpus()
+    ref = BM25Okapi(corpus)
+    index = BM25Index().fit(corpus)
+    for query in (["w9", "w42"], ["w70"], ["w0", "w2"], ["nope"]):
+        scores = ref.get_scores(query)
+        for k in (1, 10, 200, 1000):
+            expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+            docs, top_scores = index.top_k(query, k)
+            assert docs.tolist() == expected
+            assert np.array_equal(top_scores, scores[expected])
+
+
+def test_negative_idf_floor_ordering():
+    corpus = [["a", "b"], ["a", "b", "a"], ["c"], ["b", "a"]]
+    ref = BM25Okapi(corpus)
+    index = BM25Index().fit(corpus)
+    scores = ref.get_scores(["a"])
+    assert (scores < 0).any()
+    expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    docs, top_scores = index.top_k(["a"], 10)
+    assert docs.tolist() == expected
+    assert np.array_equal(top_scores, scores[expected])
+
+
+def test_top_k_with_mask_matches_filtered_sort():
+    corpus = _corpus()
+    ref = BM25Okapi(corpus)
+    index = BM25Index().fit(corpus)
+    mask = np.random.default_rng(0).random(len(corpus)) < 0.3
+    for query in (["w9", "w42"], ["w0", "w2"], ["nope"]):
+        scores = ref.get_scores(query)
+        for k in (1, 10, 200):
+            expected = sorted(np.flatnonzero(mask).tolist(), key=lambda i: scores[i], reverse=True)[:k]
+            docs, top_scores = index.top_k(query, k, mask=mask)
+            assert docs.tolist() == expected
+            assert np.array_equal(top_scores, scores[expected])
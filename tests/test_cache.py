@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fake_openai import FakeOpenAIServer, fake_embedding
+from src.retrieval.cache import LRUCache, QueryEmbeddingCache, ScoreCache
+from src.retrieval.dense_retriever import DenseRetriever
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 2)
+
+
+def test_query_cache_persists_across_instances(tmp_path):
+    path = tmp_path / "q.sqlite"
+    vec = np.arange(4, dtype=np.float32)
+    QueryEmbeddingCache(path=path).put("m", "Python  Developer", vec)
+
+    cache = QueryEmbeddingCache(path=path)
+    assert np.array_equal(cache.get("m", "python developer"), vec)
+    assert cache.get("other-model", "python developer") is None
+    assert cache.stats() == {"memory_hits": 0, "disk_hits": 1, "misses": 1, "size": 1}
+
+
+def test_dense_retriever_skips_api_on_repeat(tmp_path):
+    chunks = [Document(page_content=f"chunk {i}", metadata={"resume_id": "r", "chunk_id": i}) for i in range(5)]
+    emb = np.vstack([fake_embedding(c.page_content) for c in chunks])
+    with FakeOpenAIServer() as server:
+        dense = DenseRetriever("test", base_url=server.base_url, query_cache=QueryEmbeddingCache(path=tmp_path / "q.sqlite"))
+        dense.fit(chunks, emb, "fake-embedding")
+        first = dense.search("kubernetes", top_k=3)
+        assert dense.search("Kubernetes ", top_k=3) == first
+        dense.search_many(["kubernetes", "python"], top_k=3)
+    assert server.requests["embeddings"] == 2
+    assert dense.query_cache.stats()["memory_hits"] == 2
+
+
+def test_score_cache_scoped_to_corpus_version(tmp_path):
+    path = tmp_path / "ce.sqlite"
+    cache = ScoreCache(path=path, corpus_version="v1")
+    cache.put_many("ce", "Python dev", [(("r1", 0), 1.5), (("r1", 1), -2.0)])
+    assert cache.get_many("ce", "python  dev", [("r1", 0), ("r1", 1), ("r2", 0)]) == [1.5, -2.0, None]
+
+    assert ScoreCache(path=path, corpus_version="v1").get_many("ce", "python dev", [("r1", 0)]) == [1.5]
+    # Another process on another version misses, but doesn't wipe the shared file.
+    other = ScoreCache(path=path, corpus_version="v2")
+    assert other.get_many("ce", "python dev", [("r1", 0)]) == [None]
+    other.put_many("ce", "python dev", [(("r1", 0), 0.5)])
+    assert ScoreCache(path=path, corpus_version="v1").get_many("ce", "python dev", [("r1", 0)]) == [1.5]
+    assert ScoreCache(path=path, corpus_version="v2").get_many("ce", "python dev", [("r1", 0)]) == [0.5]
+
+
+def test_score_cache_prunes_oldest_disk_entries(tmp_path):
+    cache = ScoreCache(path=tmp_path / "ce.sqlite", corpus_version="v1", max_disk_entries=2)
+    for cid in range(3):
+        cache.put_many("ce", "q", [(("r1", cid), float(cid))])
+    cache.put_many("ce", "q", [(("r1", 0), 0.0)])  # rewritten: now the newest
+    cache.set_corpus_version("v2")
+    assert cache.get_many("ce", "q", [("r1", c) for c in range(3)], corpus_version="v1") == [0.0, None, 2.0]
+
+
+def test_score_cache_keys_on_the_callers_corpus_version():
+    cache = ScoreCache(corpus_version="v1")
+    # A rerank still running on the v1 snapshot after the cache moved on to v2.
+    cache.set_corpus_version("v2")
+    cache.put_many("ce", "python", [(("r1", 0), 1.5)], corpus_version="v1")
+    assert cache.get_many("ce", "python", [("r1", 0)]) == [None]
+    assert cache.get_many("ce", "python", [("r1", 0)], corpus_version="v1") == [1.5]
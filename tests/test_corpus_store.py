@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.chunk_index import ChunkIndex
+from src.retrieval.corpus_store import CorpusStore
+
+
+def _chunks():
+    texts = [
+        "## Experience\nPython developer, built Kubernetes operators",
+        "## Skills\nDocker, Kubernetes, Terraform — café ☕",
+        "## Education\nMSc Computer Science",
+        "## Projects\nRAG search over résumés with BM25 and embeddings",
+    ]
+    return [
+        Document(page_content=t, metadata={"resume_id": f"r{i // 2}", "chunk_id": i % 2})
+        for i, t in enumerate(texts)
+    ]
+
+
+def test_round_trip(tmp_path):
+    chunks = _chunks()
+    emb = np.random.default_rng(0).normal(size=(len(chunks), 8)).astype(np.float32)
+    index = BM25Index().fit([BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks])
+
+    store = CorpusStore.write(tmp_path / "corpus", chunks, emb, "test-model", bm25_index=index)
+    store = CorpusStore(tmp_path / "corpus")
+
+    assert isinstance(store.embeddings, np.memmap)
+    expected = emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12)
+    assert np.array_equal(store.embeddings, expected)
+
+    stored = store.chunks()
+    assert [c.page_content for c in stored] == [c.page_content for c in chunks]
+    assert [c.metadata for c in stored] == [c.metadata for c in chunks]
+    assert ChunkIndex(stored).get("r1", 1).page_content == chunks[3].page_content
+
+    loaded = store.bm25_index()
+    query = BM25Retriever.clean_and_tokenize("kubernetes python")
+    assert np.array_equal(loaded.get_scores(query), index.get_scores(query))
+
+
+def test_rewrite_changes_fingerprint(tmp_path):
+    chunks = _chunks()
+    emb = np.ones((len(chunks), 4), dtype=np.float32)
+    first = CorpusStore.write(tmp_path / "corpus", chunks, emb).fingerprint
+    second = CorpusStore.write(tmp_path / "corpus", chunks[:3], emb[:3]).fingerprint
+    assert first != second
+    assert CorpusStore(tmp_path / "corpus").n_chunks == 3
+    # Re-embedded text (e.g. with another model version) is a different corpus.
+    rng = np.random.default_rng(0)
+    reembedded = [rng.normal(size=(3, 4)).astype(np.float32) for _ in range(2)]
+    third = CorpusStore.write(tmp_path / "corpus", chunks[:3], reembedded[0]).fingerprint
+    assert CorpusStore.write(tmp_path / "corpus", chunks[:3], reembedded[0]).fingerprint == third
+    assert CorpusStore.write(tmp_path / "corpus", chunks[:3], reembedded[1]).fingerprint != third
+
+
+def test_duplicate_chunks_share_vectors(tmp_path):
+    from src.retrieval.ann_index import IVFIndex
+    from src.retrieval.dense_retriever import DenseRetriever
+
+    rng = np.random.default_rng(0)
+    chunks = _chunks() + _chunks()[:3]  # a resume uploaded twice, plus boilerplate
+    emb = rng.normal(size=(len(chunks), 8)).astype(np.float32)
+    emb[4:] += rng.normal(scale=1e-6, size=(3, 8))  # same text, slightly different floats
+
+    store = CorpusStore.write(tmp_path / "corpus", chunks, emb, "test-model")
+    assert store.n_vectors == 4
+    assert np.isclose(store.duplication_rate, 3 / 7)
+    assert np.array_equal(store.embedding_rows([5, 1]), store.embeddings[[1, 1]])
+
+    aligned = DenseRetriever(api_key="test")
+    aligned.fit(chunks, store.embeddings, "test-model")
+    shared = DenseRetriever(api_key="test")
+    shared.fit(store.chunks(), store.vectors, "test-model", normalized=True, vector_ids=store.vector_ids)
+
+    q = rng.normal(size=8).astype(np.float32)
+    q /= np.linalg.norm(q)
+    ids, sims = shared._top_k(q, len(chunks))
+    a_ids, a_sims = aligned._top_k(q, len(chunks))
+    assert sorted(ids.tolist()) == sorted(a_ids.tolist())
+    assert np.allclose(sims, a_sims)
+
+    shared.use_ann(IVFIndex(nlist=2, nprobe=2).fit(shared.Xn))
+    ann_ids, ann_sims = shared._top_k(q, 3)
+    assert np.allclose(ann_sims, a_sims[:3])
+    assert set(ann_ids.tolist()) <= {i for i, s in zip(a_ids.tolist(), a_sims) if s >= a_sims[2] - 1e-6}
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from data.chunker import chunk_markdown_files
+from data.dedup import cluster_resumes
+from src.generation.summarizer import ResumeSummarizer
+from src.retrieval.chunk_index import ChunkIndex
+from src.retrieval.fusion import collapse_duplicates
+
+WORDS = ("python java kubernetes docker sql react nurse sales finance design cloud data "
+         "team lead built shipped managed designed scaled migrated").split()
+
+
+def _resume(seed, n=300):
+    return " ".join(np.random.default_rng(seed).choice(WORDS, size=n))
+
+
+def test_near_duplicates_clustered():
+    base = _resume(0)
+    words = base.split()
+    edited = " ".join(words[:150] + ["rust"] + words[150:])  # one inserted word
+    clusters = cluster_resumes({"a": base, "b": edited, "c": _resume(1), "d": base.upper()})
+    assert clusters == {"a": "a", "b": "a", "c": "c", "d": "a"}
+
+
+def test_chunker_sets_cluster_id(tmp_path):
+    text = "# Experience\n\n" + _resume(2) + "\n\n# Skills\n\n" + _resume(3)
+    (tmp_path / "alice.md").write_text(text)
+    (tmp_path / "alice_copy.md").write_text(text + "\n\nUpdated 2024")
+    (tmp_path / "bob.md").write_text("# Experience\n\n" + _resume(4))
+
+    chunks = chunk_markdown_files(tmp_path)
+    assert {(c.metadata["resume_id"], c.metadata["cluster_id"]) for c in chunks} == {
+        ("alice", "alice"), ("alice_copy", "alice"), ("bob", "bob"),
+    }
+    index = ChunkIndex(chunks)
+    assert index.cluster_of("alice_copy") == "alice" and index.cluster_of("bob") == "bob"
+
+
+def test_duplicates_collapsed_before_rerank_and_summary():
+    from langchain_core.documents import Document
+
+    chunks = [
+        Document(page_content=f"{rid} chunk {i}", metadata={"resume_id": rid, "chunk_id": i, "cluster_id": cl})
+        for rid, cl in [("a", "a"), ("b", "a"), ("c", "c")] for i in range(2)
+    ]
+    index = ChunkIndex(chunks)
+    hits = [{"resume_id": rid, "chunk_id": cid} for rid, cid in [("b", 0), ("a", 0), ("c", 1), ("b", 1), ("a", 1)]]
+
+    kept = collapse_duplicates(hits, index.cluster_of)
+    assert [(h["resume_id"], h["chunk_id"]) for h in kept] == [("b", 0), ("c", 1), ("b", 1)]
+    assert collapse_duplicates(hits, index.cluster_of, top_k=2) == kept[:2]
+
+    top, matched = ResumeSummarizer._select(hits, 2, index)
+    assert top == ["b", "c"] and "a" not in matched
@@ -0,0 +1,84 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import openai
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fake_openai import FakeOpenAIServer, fake_embedding
+from data.embed import EmbeddingGenerator, token_batches, token_counter
+
+
+def _texts(n=40):
+    return [f"resume section {i} " + "python docker " * (i % 7) for i in range(n)]
+
+
+def test_token_batches():
+    assert token_batches([3, 3, 3, 10, 1], max_tokens=6) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+    assert token_batches([1] * 5, max_tokens=100, max_items=2) == [(0, 2), (2, 4), (4, 5)]
+    assert token_batches([], max_tokens=10) == []
+
+
+def test_generate_concurrent_token_batches_with_retry():
+    texts = _texts()
+    count = token_counter("fake-embedding")
+    with FakeOpenAIServer(embed_delay=0.05, embed_fail={2, 3}) as server:
+        gen = EmbeddingGenerator("test", base_url=server.base_url, max_concurrency=4,
+                                 max_batch_tokens=60, retry_backoff=0.01)
+        emb = gen.generate(texts, model="fake-embedding")
+
+    assert np.allclose(emb, np.vstack([fake_embedding(t) for t in texts]))
+    assert server.max_embed_in_flight >= 2
+    assert len(server.embed_batches) > 1
+    assert all(sum(count(t) for t in batch) <= 60 or len(batch) == 1 for batch in server.embed_batches)
+    assert server.requests["embeddings"] == len(server.embed_batches) + 2  # two injected 429s, retried
+
+
+def test_rate_limit():
+    texts = _texts(30)
+    with FakeOpenAIServer() as server:
+        # 1200 requests/min: a one-second burst of 20, then one every 50 ms.
+        gen = EmbeddingGenerator("test", base_url=server.base_url, max_concurrency=8,
+                                 requests_per_minute=1200, max_batch_tokens=1)
+        t0 = time.perf_counter()
+        gen.generate(texts, model="fake-embedding")
+        elapsed = time.perf_counter() - t0
+    assert len(server.embed_batches) == 30
+    assert elapsed >= 0.4
+
+
+def test_checkpoint_resume(tmp_path):
+    texts = _texts()
+    with FakeOpenAIServer(embed_fail={4}, embed_fail_status=400) as server:
+        gen = EmbeddingGenerator("test", base_url=server.base_url, max_concurrency=1, max_batch_tokens=60)
+        with pytest.raises(openai.BadRequestError):
+            gen.generate(texts, model="fake-embedding", checkpoint_dir=tmp_path)
+        assert len(list(tmp_path.glob("*.npy"))) == 3
+
+        server.embed_fail = ()
+        emb = gen.generate(texts, model="fake-embedding", checkpoint_dir=tmp_path)
+
+    # Only the failed batch and the ones after it were sent again.
+    assert server.requests["embeddings"] == len(server.embed_batches) + 1
+    assert not any(batch in server.embed_batches[3:] for batch in server.embed_batches[:3])
+    assert np.allclose(emb, np.vstack([fake_embedding(t) for t in texts]))
+    assert list(tmp_path.glob("*.npy")) == []
+
+
+def test_duplicates_embedded_once_and_store_reused(tmp_path):
+    from data.embed import EmbeddingStore
+
+    texts = ["python  developer", "java developer", "python developer\n", "java developer", "sql"]
+    store = EmbeddingStore(tmp_path / "store.sqlite")
+    with FakeOpenAIServer() as server:
+        gen = EmbeddingGenerator("test", base_url=server.base_url)
+        vectors, vector_ids = gen.generate_unique(texts, model="fake-embedding", store=store)
+        assert server.embed_batches == [["python  developer", "java developer", "sql"]]
+        assert vector_ids.tolist() == [0, 1, 0, 1, 2]
+        assert gen.stats == {"texts": 5, "unique": 3, "stored": 0, "embedded": 3}
+
+        emb = gen.generate(texts + ["go"], model="fake-embedding", store=store)
+        assert server.embed_batches[1:] == [["go"]]
+    assert np.allclose(emb, np.vstack([vectors[vector_ids], fake_embedding("go")]))
@@ -0,0 +1,56 @@
+import json
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.evaluation import (
+    cheapest, load_qrels, ndcg_at_k, parameter_grid, pareto_frontier, ranking_metrics, recall_at_k, reciprocal_rank,
+)
+
+
+def test_ranking_metrics():
+    ranked = ["a", "x", "b", "y", "c"]
+    relevant = {"a": 1.0, "b": 2.0, "c": 1.0, "d": 1.0}
+    assert recall_at_k(ranked, relevant, 3) == 0.5
+    assert reciprocal_rank(["x", "y", "b"], relevant) == pytest.approx(1 / 3)
+    assert reciprocal_rank(["x"], relevant) == 0.0
+
+    dcg = 1 / math.log2(2) + 3 / math.log2(4)
+    idcg = 3 / math.log2(2) + 1 / math.log2(3) + 1 / math.log2(4)
+    assert ndcg_at_k(ranked, relevant, 3) == pytest.approx(dcg / idcg)
+    assert ndcg_at_k(["b", "a", "c", "d"], relevant, 4) == pytest.approx(1.0)
+    assert set(ranking_metrics(ranked, relevant, [1, 5], "resume")) == {
+        "resume.mrr", "resume.recall@1", "resume.ndcg@1", "resume.recall@5", "resume.ndcg@5",
+    }
+
+
+def test_load_qrels_and_grid(tmp_path):
+    path = tmp_path / "qrels.jsonl"
+    path.write_text(
+        json.dumps({"query": "python", "relevant": {"r1": 2, "r2": 0}}) + "\n\n"
+        + json.dumps({"query": "nurse", "relevant": ["r3"], "filters": {"section": "skills"}}) + "\n"
+    )
+    first, second = load_qrels(path)
+    assert first["relevant"] == {"r1": 2.0} and first["relevant_chunks"] is None
+    assert second["relevant"] == {"r3": 1.0} and second["filters"] == {"section": "skills"}
+
+    grid = parameter_grid(bm25_top_k=[50, 100], top_k_rerank=[30, 60, 90])
+    assert len(grid) == 6 and {c["bm25_top_k"] for c in grid} == {50, 100}
+    assert all("rrf_weights" in c for c in grid)
+    with pytest.raises(ValueError):
+        parameter_grid(top_k=[1])
+
+
+def test_pareto_frontier_and_cheapest():
+    def row(name, ndcg, p95):
+        return {"config": {"name": name}, "quality": {"resume.ndcg@10": ndcg}, "latency": {"p95_ms": p95},
+                "counters": {}}
+
+    rows = [row("fast", 0.6, 10), row("dominated", 0.55, 20), row("mid", 0.8, 30), row("slow", 0.82, 90),
+            row("worse_and_slower", 0.7, 95)]
+    assert [r["config"]["name"] for r in pareto_frontier(rows)] == ["fast", "mid", "slow"]
+    assert cheapest(rows, 0.75)["config"]["name"] == "mid"
+    assert cheapest(rows, 0.9) is None
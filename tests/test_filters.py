@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from data.chunker import chunk_markdown_file
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.dense_retriever import DenseRetriever
+from src.retrieval.metadata_index import MetadataIndex
+
+RESUMES = {
+    "ada": "Ada Lovelace\nada@example.com, London, United Kingdom, +44 20 7946 0000\n"
+           "# Experience\nAnalytical engine programmer writing python and math notes for years\n"
+           "# Education\nPh.D. in Mathematics, University of London, 1840, thesis on engines\n"
+           "# Skills\nPython, Docker, mathematics, analytical engines, technical writing\n",
+    "bob": "Bob Builder\nbob@example.com, Leeds, United Kingdom, +44 113 496 0000\n"
+           "# Work Experience\nSite manager coordinating builders, schedules and python scripts\n"
+           "# Education\nBachelor of Engineering (B.Eng.), Leeds University, 2010, civil works\n"
+           "# Skills\nProject management, scheduling, python, excel, safety compliance\n",
+    "cy": "Cy Twombly\ncy@example.com, Rome, Italy, +39 06 0000 0000, available immediately\n"
+          "# Profile\nPainter and designer working across canvas, print and digital media\n"
+          "# Education\nMaster of Fine Arts (MFA), Yale University, 2012, painting major\n"
+          "# Skills\nPhotoshop, illustrator, docker, drawing, printmaking and typography\n",
+}
+
+
+def _store(tmp_path):
+    chunks = []
+    for rid, text in RESUMES.items():
+        (tmp_path / f"{rid}.md").write_text(text)
+        chunks += chunk_markdown_file(tmp_path / f"{rid}.md")
+    vectors = np.random.default_rng(0).normal(size=(len(chunks), 8)).astype(np.float32)
+    return CorpusStore(CorpusStore.write(tmp_path / "corpus", chunks, vectors, "test-model").path)
+
+
+def test_sections_degrees_and_filters(tmp_path):
+    store = _store(tmp_path)
+    chunks = store.chunks()
+    meta = {(c.metadata["resume_id"], c.metadata["section"]): c.metadata.get("degree") for c in chunks}
+    assert meta[("bob", "experience")] == "bachelors" and meta[("ada", "skills")] == "phd"
+    assert meta[("cy", "summary")] == "masters" and ("ada", "header") in meta
+
+    index = MetadataIndex(chunks)
+
+    def matches(filters):
+        return sorted((chunks[r].metadata["resume_id"], chunks[r].metadata["section"])
+                      for r in np.flatnonzero(index.mask(filters)))
+
+    assert matches({"section": "experience"}) == [("ada", "experience"), ("bob", "experience")]
+    assert {rid for rid, _ in matches({"min_degree": "masters"})} == {"ada", "cy"}
+    assert matches({"skills": ["Docker"], "section": ["education", "skills"]}) == [
+        ("ada", "education"), ("ada", "skills"), ("cy", "education"), ("cy", "skills"),
+    ]
+    assert matches({"skills": "python docker", "min_degree": "bachelors"}) == matches({"resume_id": "ada"})
+    assert index.mask(None) is None
+
+
+def test_dense_mask_matches_filtered_exact():
+    rng = np.random.default_rng(1)
+    n = 200
+    chunks = [Document(page_content=f"c{i}", metadata={"resume_id": i, "chunk_id": 0}) for i in range(n)]
+    dense = DenseRetriever(api_key="test")
+    dead = np.zeros(n, dtype=bool)
+    dead[::7] = True
+    dense.fit(chunks, rng.normal(size=(150, 16)).astype(np.float32), "test-model",
+              extra_embeddings=rng.normal(size=(50, 16)).astype(np.float32), dead=dead)
+    q = rng.normal(size=16).astype(np.float32)
+    q /= np.linalg.norm(q)
+    full = dense._exact_sims(q)
+    for p in (0.1, 0.9):  # gathered rows, and a full scan
+        mask = rng.random(n) < p
+        rows, sims = dense._top_k(q, 20, mask=mask)
+        allowed = np.flatnonzero(mask & ~dead)
+        expected = allowed[np.argsort(-full[allowed], kind="stable")][:20]
+        assert rows.tolist() == expected.tolist()
+        assert np.allclose(sims, full[expected], atol=1e-6)
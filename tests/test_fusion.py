@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.fusion import rrf_fuse, rrf_fuse_rows, rrf_hits
+
+
+def _chunks(n):
+    return [
+        Document(page_content=f"chunk {i} " * 50, metadata={"resume_id": f"r{i // 3}", "chunk_id": i % 3})
+        for i in range(n)
+    ]
+
+
+def _hits(chunks, rows, scores, label):
+    return [{
+        "rank": rank,
+        f"{label}_score": float(score),
+        "resume_id": chunks[i].metadata["resume_id"],
+        "chunk_id": chunks[i].metadata["chunk_id"],
+        "preview": chunks[i].page_content[:400],
+    } for rank, (i, score) in enumerate(zip(rows.tolist(), scores.tolist()), 1)]
+
+
+def test_rrf_fuse_rows_matches_rrf_fuse():
+    rng = np.random.default_rng(0)
+    chunks = _chunks(500)
+    for trial in range(20):
+        # Small overlapping pools produce many exact score ties.
+        n_bm25, n_dense = rng.integers(0, 120, size=2)
+        bm25 = (rng.permutation(300)[:n_bm25], np.sort(rng.random(n_bm25))[::-1])
+        dense = (rng.permutation(300)[:n_dense], np.sort(rng.random(n_dense))[::-1].astype(np.float32))
+        weights = {"bm25": 1.0, "dense": 1.0} if trial % 2 else {"bm25": 0.5, "dense": 2.0}
+        for top_k in (1, 10, 50, 1000):
+            expected = rrf_fuse(_hits(chunks, *bm25, "bm25"), _hits(chunks, *dense, "dense"),
+                                k=60, top_k=top_k, weights=weights)
+            fused = rrf_fuse_rows({"bm25": bm25, "dense": dense}, k=60, top_k=top_k, weights=weights)
+            assert list(rrf_hits(*fused, chunks)) == expected
+
+
+def test_rrf_fuse_rows_any_number_of_sources():
+    sources = {
+        "a": (np.array([3, 1, 2]), np.array([0.9, 0.8, 0.7])),
+        "b": (np.array([1, 4]), np.array([0.5, 0.4])),
+        "c": (np.array([4]), np.array([1.0])),
+    }
+    rows, scores, per_source = rrf_fuse_rows(sources, k=0, top_k=3, weights={"a": 1.0, "b": 1.0, "c": 1.0})
+    # 1: 1/2 + 1/1, 4: 1/2 + 1/1 (seen later), 3: 1/1
+    assert rows.tolist() == [1, 4, 3]
+    assert np.allclose(scores, [1.5, 1.5, 1.0])
+    assert per_source["a"][0].tolist() == [2, 0, 1] and np.isnan(per_source["c"][1][0])
+
+
+def test_hit_reads_like_a_dict():
+    from src.retrieval.hits import Hit, source_hits
+
+    chunks = _chunks(10)
+    hit = source_hits("bm25", np.array([4, 7]), np.array([2.5, 1.0], dtype=np.float32), chunks)[1]
+    assert hit == _hits(chunks, np.array([4, 7]), np.array([2.5, 1.0]), "bm25")[1] | {"bm25_rank": 2}
+    assert hit["preview"] == chunks[7].page_content[:400] and "ce_score" not in hit
+
+    hit["ce_score"] = 0.3
+    assert hit.get("ce_score") == 0.3 and hit.to_dict()["ce_score"] == 0.3
+    assert not hasattr(hit, "__dict__") and isinstance(hit, Hit)
@@ -13,4 +13,19 @@ def test_imports():
         from src.generation.summarizer import ResumeSummarizer
 
     except Exception as e:
-        assert False, f"Import failed: {e}"
\ No newline at end of file
+        assert False, f"Import failed: {e}"
+
+def test_package_imports_are_lazy():
+    import subprocess
+
+    code = (
+        "import sys, data, src, src.retrieval, src.generation, src.pipeline\n"
+        "heavy = [m for m in ('torch', 'sentence_transformers', 'openai') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "from src.retrieval import BM25Index, CrossEncoderReranker\n"
+        "assert src.ResumeRAGPipeline is src.pipeline.ResumeRAGPipeline and 'ChunkIndex' in dir(src.retrieval)\n"
+        "assert callable(data.chunk_markdown_files) and 'EmbeddingStore' in dir(data)\n"
+        "import src.retrieval as r\n"
+        "assert all(callable(getattr(r, name)) for name in r.__all__), r.__all__\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent.parent, check=True)
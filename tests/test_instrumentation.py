@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.instrumentation import LoggingSink, PrometheusSink, Trace, activate, count, emit, iterate, stage
+
+
+def test_stages_nest_across_tasks_and_threads():
+    # Outside a trace, recording is a no-op.
+    with stage("ignored"):
+        count("ignored")
+
+    async def query():
+        with stage("retrieve"):
+            await asyncio.gather(asyncio.to_thread(bm25), dense())
+        with stage("rerank"):
+            count("rerank_pairs", 10)
+
+    def bm25():
+        with stage("bm25"):
+            count("bm25_candidates", 7)
+
+    async def dense():
+        with stage("embed"):
+            await asyncio.sleep(0.01)
+        count("bm25_candidates", 1)
+
+    trace = Trace("search", query="python")
+    with activate(trace):
+        asyncio.run(query())
+    trace.finish()
+
+    spans = {span.name: span for span in trace.spans}
+    assert set(spans) == {"retrieve", "bm25", "embed", "rerank"}
+    retrieve = trace.spans.index(spans["retrieve"])
+    assert spans["bm25"].parent == spans["embed"].parent == retrieve and spans["rerank"].parent is None
+    assert trace.counters == {"bm25_candidates": 8, "rerank_pairs": 10}
+    summary = trace.to_dict()
+    assert summary["stages"]["embed"] >= 10 and summary["total_ms"] >= summary["stages"]["retrieve"]
+
+
+def test_iterate_and_sinks(caplog):
+    def events():
+        with stage("llm"):
+            count("llm_calls")
+            yield "first"
+        # The consumer's own work between events is not recorded.
+        yield "second"
+
+    trace = Trace("search_stream")
+    for event in iterate(trace, events()):
+        count("consumer")
+    assert trace.counters == {"llm_calls": 1} and [s.name for s in trace.spans] == ["llm"]
+
+    # Spans and counters of a shared batch are merged once.
+    batch = Trace("rank_batch", queries=2)
+    with activate(batch), stage("rerank"):
+        count("rerank_pairs", 4)
+    batch.finish()
+    trace.merge(batch)
+    trace.merge(batch)
+    assert [s.name for s in trace.spans] == ["llm", "rank_batch", "rerank"] and trace.spans[2].parent == 1
+    assert trace.counters["rerank_pairs"] == 4
+
+    prometheus = PrometheusSink(buckets=(0.1, 1.0))
+    with caplog.at_level(logging.INFO, logger="resume_rag.trace"):
+        emit(trace, [prometheus, LoggingSink()])
+    text = prometheus.exposition()
+    assert 'rag_request_seconds_bucket{name="search_stream",le="+Inf"} 1' in text
+    assert 'rag_stage_seconds_count{stage="rerank"} 1' in text
+    assert "rag_rerank_pairs_total 4" in text and "rag_llm_calls_total 1" in text
+    assert "search_stream" in caplog.text and "rerank_pairs=4" in caplog.text
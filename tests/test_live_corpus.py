@@ -0,0 +1,150 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.dense_retriever import DenseRetriever
+from src.retrieval.live_corpus import CorpusWriter, LiveCorpus
+
+WORDS = "python java kubernetes docker sql react nurse sales finance design cloud data".split()
+DIM = 8
+
+
+def _resume(rid, rng, n=3):
+    return [
+        Document(
+            page_content=" ".join(rng.choice(WORDS, size=rng.integers(3, 9))),
+            metadata={"resume_id": rid, "chunk_id": i},
+        )
+        for i in range(n)
+    ]
+
+
+def _vectors(texts):
+    # Deterministic per text, so reused and recomputed embeddings agree.
+    return np.stack([
+        np.random.default_rng(abs(hash(t)) % (1 << 32)).normal(size=DIM) for t in texts
+    ]).astype(np.float32)
+
+
+def _write(path, chunks):
+    tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+    return CorpusStore.write(
+        path, chunks, _vectors([c.page_content for c in chunks]), "test-model",
+        bm25_index=BM25Index().fit(tokens),
+    )
+
+
+def _live(store):
+    chunks = store.chunks()
+    rows = range(len(chunks)) if store.dead is None else np.flatnonzero(~store.dead)
+    return [chunks[int(r)] for r in rows]
+
+
+def _key(chunk):
+    return chunk.metadata["resume_id"], chunk.metadata["chunk_id"]
+
+
+def _assert_matches_fresh(store, tmp_path):
+    """BM25 and dense results over the live rows equal those of a store rebuilt from scratch."""
+    live = _live(store)
+    fresh = CorpusStore(_write(tmp_path / "fresh", live).path)
+    chunks = store.chunks()
+
+    query = BM25Retriever.clean_and_tokenize("python kubernetes data")
+    ids, scores = store.bm25_index().top_k(query, 10)
+    f_ids, f_scores = fresh.bm25_index().top_k(query, 10)
+    assert [_key(chunks[int(i)]) for i in ids] == [_key(live[int(i)]) for i in f_ids]
+    assert np.allclose(scores, f_scores)
+
+    dense = DenseRetriever(api_key="test")
+    dense.fit(chunks, store.vectors, "test-model", normalized=True,
+              extra_embeddings=store.extra_embeddings, dead=store.dead, vector_ids=store.vector_ids)
+    f_dense = DenseRetriever(api_key="test")
+    f_dense.fit(fresh.chunks(), fresh.embeddings, "test-model", normalized=True)
+    q = _vectors(["query"])[0]
+    q /= np.linalg.norm(q)
+    ids, sims = dense._top_k(q, 10)
+    f_ids, f_sims = f_dense._top_k(q, 10)
+    assert [_key(chunks[int(i)]) for i in ids] == [_key(live[int(i)]) for i in f_ids]
+    assert np.allclose(sims, f_sims, atol=1e-6)
+
+
+def test_add_replace_remove_and_compact(tmp_path):
+    rng = np.random.default_rng(0)
+    base = [c for i in range(8) for c in _resume(f"r{i}", rng)]
+    path = tmp_path / "corpus"
+    _write(path, base)
+    writer = CorpusWriter(path, compact_ratio=0.5)
+
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return _vectors(texts)
+
+    # r3 keeps its first chunk unchanged, so only its new chunks are embedded.
+    changed = [base[9]] + _resume("r3", rng, n=2)[1:] + _resume("r8", rng)
+    changed[0] = Document(page_content=base[9].page_content, metadata={"resume_id": "r3", "chunk_id": 0})
+    assert writer.add_resumes(changed, embed) == 1
+    assert embedded == [c.page_content for c in changed[1:]]
+    writer.remove_resumes(["r5"])
+
+    store = LiveCorpus(path)
+    assert store.generation == 2
+    index = store.chunk_index()
+    assert "r5" not in index.resume_ids()
+    assert [c.page_content for c in index.resume_chunks("r3")] == [c.page_content for c in changed[:2]]
+    _assert_matches_fresh(store, tmp_path)
+    assert not writer.needs_compaction()
+
+    # Reopening reuses the unchanged base store (and anything built over it).
+    writer.remove_resumes(["r0", "r1"])
+    reopened = LiveCorpus(path, previous=store)
+    assert reopened.base is store.base
+    assert writer.needs_compaction()
+
+    writer.compact()
+    compacted = LiveCorpus(path)
+    assert compacted.deltas == [] and compacted.dead is None
+    assert compacted.generation == 4
+    assert compacted.fingerprint != store.fingerprint
+    assert [_key(c) for c in compacted.chunks()] == [_key(c) for c in _live(reopened)]
+    _assert_matches_fresh(compacted, tmp_path)
+
+
+def test_rank_bm25_backend_over_tombstones(tmp_path):
+    rng = np.random.default_rng(1)
+    path = tmp_path / "corpus"
+    _write(path, [c for i in range(6) for c in _resume(f"r{i}", rng)])
+    writer = CorpusWriter(path, compact_ratio=1.0)
+    writer.add_resumes(_resume("r6", rng), _vectors)
+    writer.remove_resumes(["r1", "r4"])
+    store = LiveCorpus(path)
+    assert store.dead is not None
+    chunks = store.chunks()
+
+    bm25 = BM25Retriever(backend="rank_bm25")
+    bm25.fit(chunks, dead=store.dead)
+    hits = bm25.search("python kubernetes data docker", top_k=len(chunks))
+    # Rows index the full chunk sequence; tombstoned rows are never returned.
+    assert sorted(h.row for h in hits) == np.flatnonzero(~store.dead).tolist()
+    assert all(h.resume_id == chunks[h.row].metadata["resume_id"] for h in hits)
+
+    mask = np.array([c.metadata["resume_id"] in ("r1", "r6") for c in chunks])
+    rows, _ = bm25.search_rows("python kubernetes data docker", top_k=len(chunks), mask=mask)
+    assert {chunks[int(r)].metadata["resume_id"] for r in rows} == {"r6"}
+
+    # Scores use live-row statistics, as a rebuild over the live rows would.
+    live = _live(store)
+    fresh = BM25Retriever(backend="rank_bm25")
+    fresh.fit(live)
+    rows, scores = bm25.search_rows("python kubernetes data docker", top_k=10)
+    f_rows, f_scores = fresh.search_rows("python kubernetes data docker", top_k=10)
+    assert [_key(chunks[int(r)]) for r in rows] == [_key(live[int(r)]) for r in f_rows]
+    assert np.allclose(scores, f_scores)
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from data.loader import MANIFEST_NAME, REPORT_NAME, convert_pdfs_to_markdown
+
+
+class FakeConverter:
+    """Stands in for docling: the "PDF" bytes say how conversion should go."""
+
+    def convert(self, path: str):
+        data = Path(path).read_text()
+        if data == "HANG":
+            time.sleep(60)
+        if data == "CRASH":
+            os._exit(1)
+        if data == "BAD":
+            raise ValueError("unreadable pdf")
+        return SimpleNamespace(document=SimpleNamespace(export_to_markdown=lambda: f"# {data}"))
+
+
+def fake_converter():
+    return FakeConverter()
+
+
+def convert(pdf_dir: Path, md_dir: Path) -> int:
+    return convert_pdfs_to_markdown(
+        pdf_dir, md_dir, workers=2, timeout=1.0, converter_factory=fake_converter
+    )
+
+
+def test_parallel_conversion_reports_failures_and_skips_unchanged(tmp_path):
+    pdf_dir, md_dir = tmp_path / "pdf", tmp_path / "md"
+    pdf_dir.mkdir()
+    for i in range(4):
+        (pdf_dir / f"r{i}.pdf").write_text(f"resume {i}")
+    for name in ("HANG", "CRASH", "BAD"):
+        (pdf_dir / f"{name.lower()}.pdf").write_text(name)
+
+    assert convert(pdf_dir, md_dir) == 4
+    assert (md_dir / "r2.md").read_text() == "# resume 2"
+    report = json.loads((md_dir / REPORT_NAME).read_text())
+    kinds = {f["file"]: f["kind"] for f in report["failures"]}
+    assert kinds == {"hang.pdf": "timeout", "crash.pdf": "crash", "bad.pdf": "error"}
+
+    # Second run: only the modified PDF is converted; removed PDFs lose their Markdown.
+    (pdf_dir / "r0.pdf").write_text("resume 0 v2")
+    (pdf_dir / "r1.pdf").unlink()
+    for name in ("hang", "crash", "bad"):
+        (pdf_dir / f"{name}.pdf").unlink()
+    assert convert(pdf_dir, md_dir) == 3
+    report = json.loads((md_dir / REPORT_NAME).read_text())
+    assert (report["converted"], report["skipped_unchanged"], report["failed"]) == (1, 2, 0)
+    assert (md_dir / "r0.md").read_text() == "# resume 0 v2"
+    assert not (md_dir / "r1.md").exists()
+    assert set(json.loads((md_dir / MANIFEST_NAME).read_text())) == {"r0.pdf", "r2.pdf", "r3.pdf"}
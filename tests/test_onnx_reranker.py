@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.onnx_reranker import OnnxCrossEncoder
+from tiny_cross_encoder import WORDS, tiny_cross_encoder
+
+
+def test_onnx_matches_torch_scores_and_ranking(tmp_path):
+    from sentence_transformers import CrossEncoder
+
+    model = tiny_cross_encoder(tmp_path / "ce")
+    rng = np.random.default_rng(0)
+    pairs = [
+        ("python developer", " ".join(rng.choice(WORDS, size=rng.integers(2, 30))))
+        for _ in range(40)
+    ]
+    ref = CrossEncoder(model, device="cpu").predict(pairs, batch_size=8)
+
+    fp32 = OnnxCrossEncoder(model, tmp_path / "onnx", quantize=False, intra_op_threads=1)
+    assert np.allclose(fp32.predict(pairs, batch_size=8), ref, atol=1e-5)
+
+    # The INT8 graph reuses the export and is ranked like the torch model.
+    int8 = OnnxCrossEncoder(model, tmp_path / "onnx", quantize=True, intra_op_threads=1)
+    scores = int8.predict(pairs, batch_size=16)
+    assert scores.shape == ref.shape
+    assert np.corrcoef(np.argsort(np.argsort(ref)), np.argsort(np.argsort(scores)))[0, 1] > 0.9
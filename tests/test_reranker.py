@@ -0,0 +1,132 @@
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.reranker import CrossEncoderReranker, token_budget_batches, truncate_text
+from tiny_cross_encoder import WORDS, tiny_cross_encoder
+
+
+def test_token_budget_batches_cover_every_index_within_budget():
+    lengths = [5, 60, 7, 33, 5, 64, 12, 9, 40, 6]
+    batches = token_budget_batches(lengths, max_tokens=64)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 64
+    assert len(batches[0]) > len(batches[-1])  # short pairs share bigger batches
+
+
+def test_truncate_text_cuts_at_word_boundary():
+    assert truncate_text("python developer with docker", 20) == "python developer"
+    assert truncate_text("python developer", 6) == "python"
+    assert truncate_text("kubernetesdocker", 10) == "kubernetes"
+
+
+def test_bucketed_scores_match_insertion_order_predict(tmp_path):
+    model = tiny_cross_encoder(tmp_path / "ce", max_length=32)
+    rng = np.random.default_rng(0)
+    pairs = [
+        (q, " ".join(rng.choice(WORDS, size=rng.integers(1, 26))))
+        for q in ("python developer", "nurse with years of experience")
+        for _ in range(30)
+    ]
+    reranker = CrossEncoderReranker(model, max_batch_tokens=256)
+    plain = reranker.model.predict(pairs, batch_size=32)
+    bucketed = np.array(reranker._predict(pairs))
+
+    # Pairs that fit are scored exactly as before, in their original order.
+    fitted, lengths = reranker._fit_pairs(pairs)
+    fits = np.array([f == p for f, p in zip(fitted, pairs)])
+    assert fits.any() and not fits.all()
+    assert np.allclose(bucketed[fits], plain[fits], atol=1e-5)
+    assert max(lengths) <= 32
+    # Over-long chunks were cut at a word boundary.
+    for (_, cut), (_, text) in zip(fitted, pairs):
+        assert text.startswith(cut) and (cut == text or text[len(cut)] == " ")
+
+
+class _ScoreFromText:
+    """Fake cross-encoder: the score is the number at the end of the chunk text."""
+
+    def __init__(self):
+        self.scored = 0
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        self.scored += len(pairs)
+        return np.array([float(text.rsplit(" ", 1)[1]) for _, text in pairs])
+
+
+def test_prune_and_cascade_keep_top_resumes():
+    from langchain_core.documents import Document
+    from src.retrieval.chunk_index import ChunkIndex
+    from src.retrieval.fusion import aggregate_resumes, prune_resumes
+
+    # 20 resumes x 3 chunks; fused order roughly follows the cross-encoder score.
+    chunks = [Document(page_content=f"chunk {100 - r * 5 - c}", metadata={"resume_id": f"r{r}", "chunk_id": c})
+              for r in range(20) for c in range(3)]
+    fused = [{"resume_id": c.metadata["resume_id"], "chunk_id": c.metadata["chunk_id"], "rrf_score": 1.0 / (i + 1)}
+             for i, c in enumerate(chunks)]
+    index = ChunkIndex(chunks)
+
+    assert [rid for rid, _ in aggregate_resumes(fused, "sum")][:3] == ["r0", "r1", "r2"]
+    assert {h["resume_id"] for h in prune_resumes(fused, 4)} == {"r0", "r1", "r2", "r3"}
+
+    reranker = object.__new__(CrossEncoderReranker)
+    reranker.model, reranker.max_batch_tokens, reranker.score_cache, reranker.batch_size = _ScoreFromText(), None, None, 32
+    reranker._model_lock = threading.Lock()
+    full = reranker.rerank("q", [dict(h) for h in fused], index, top_k=60)
+    cascaded = reranker.rerank_cascade("q", [dict(h) for h in fused], index, top_n=3, round_resumes=2, top_k=60)
+
+    # Rounds of 2 resumes: the top 3 is known after round 2, confirmed unchanged by round 3.
+    assert reranker.model.scored == 60 + 18
+    top = lambda hits: list(dict.fromkeys(h["resume_id"] for h in hits))[:3]
+    assert top(cascaded) == top(full) == ["r0", "r1", "r2"]
+    assert [h["rerank_position"] for h in cascaded] == list(range(1, 19))
+
+
+def test_cascade_visits_resumes_by_sum_of_top_m_chunks():
+    from langchain_core.documents import Document
+    from src.retrieval.chunk_index import ChunkIndex
+
+    # "a" has the best single chunk, "b" the best three; "a" scores highest with the cross-encoder.
+    scores = {"a": [(0.5, 90)], "b": [(0.3, 50), (0.3, 40), (0.3, 30)], "c": [(0.4, 60), (0.01, 1), (0.01, 2)]}
+    chunks, fused = [], []
+    for rid, rows in scores.items():
+        for c, (rrf, ce) in enumerate(rows):
+            chunks.append(Document(page_content=f"chunk {ce}", metadata={"resume_id": rid, "chunk_id": c}))
+            fused.append({"resume_id": rid, "chunk_id": c, "rrf_score": rrf})
+    index = ChunkIndex(chunks)
+
+    reranker = object.__new__(CrossEncoderReranker)
+    reranker.model, reranker.max_batch_tokens, reranker.score_cache, reranker.batch_size = _ScoreFromText(), None, None, 32
+    reranker._model_lock = threading.Lock()
+
+    def scored(top_m):
+        hits = reranker.rerank_cascade("q", [dict(h) for h in fused], index, top_n=1, round_resumes=1,
+                                       aggregation="sum", top_m=top_m)
+        return {h["resume_id"] for h in hits}
+
+    # One chunk each: a, c, and the top resume is confirmed. Three: b first, so every resume is scored.
+    assert scored(1) == {"a", "c"}
+    assert scored(3) == {"a", "b", "c"}
+
+
+def test_rerank_caches_scores_under_the_chunk_index_version():
+    from langchain_core.documents import Document
+    from src.retrieval.cache import ScoreCache
+    from src.retrieval.chunk_index import ChunkIndex
+
+    chunks = [Document(page_content=f"chunk {c}", metadata={"resume_id": "r0", "chunk_id": c}) for c in range(3)]
+    fused = [{"resume_id": "r0", "chunk_id": c, "rrf_score": 1.0} for c in range(3)]
+    reranker = object.__new__(CrossEncoderReranker)
+    reranker.model, reranker.max_batch_tokens, reranker.batch_size = _ScoreFromText(), None, 32
+    reranker.score_cache, reranker.cache_name = ScoreCache(corpus_version="v2"), "ce"
+    reranker._model_lock = threading.Lock()
+
+    # Ranked on the v1 snapshot while the pipeline already refreshed to v2.
+    reranker.rerank("q", [dict(h) for h in fused], ChunkIndex(chunks, version="v1"))
+    keys = [("r0", c) for c in range(3)]
+    assert reranker.score_cache.get_many("ce", "q", keys) == [None] * 3
+    assert reranker.score_cache.get_many("ce", "q", keys, corpus_version="v1") == [0.0, 1.0, 2.0]
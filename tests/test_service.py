@@ -0,0 +1,202 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.instrumentation import count, stage
+from src.retrieval.cache import SqliteStore
+from src.service import SearchService, serve
+
+
+class StubPipeline:
+    """The pipeline surface the service uses, recording each ranking batch."""
+
+    chunks = list(range(10))
+
+    def __init__(self):
+        self.batches = []
+
+    def _rank_many(self, queries, bm25_top_k, dense_top_k, top_k_rerank, top_n, filters=None):
+        if filters and "bad" in filters:
+            raise ValueError("Unknown filter 'bad'")
+        with stage("retrieve"):
+            time.sleep(0.05)
+        count("rerank_pairs", len(queries))
+        self.batches.append(list(queries))
+        return [[{"resume_id": f"{q}-{i}", "ce_score": np.float32(-i)} for i in range(top_n)] for q in queries], None
+
+    async def _asummarize(self, query, reranked, chunk_index, top_n):
+        await asyncio.sleep(0.01)
+        return [{"resume_id": r["resume_id"], "summary": f"about {query}", "ce_score": r["ce_score"]} for r in reranked]
+
+    async def _asummarize_stream(self, query, reranked, chunk_index, top_n):
+        yield {"type": "candidates", "results": [{"resume_id": r["resume_id"]} for r in reranked]}
+        for r in reranked:
+            yield {"type": "summary", "resume_id": r["resume_id"], "summary": f"about {query}"}
+
+
+class CachingPipeline(StubPipeline):
+    """A stub whose rankings write to a SQLite store opened before fork, like the pipeline's caches."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.store = SqliteStore(path, "entries")
+        self.store.put("preload", str(os.getpid()).encode())
+        self.inherited = self.store._conn
+
+    def warmup(self, predict=True):
+        pass
+
+    def _rank_many(self, queries, bm25_top_k, dense_top_k, top_k_rerank, top_n, filters=None):
+        self.store.put_many([(q, str(os.getpid()).encode()) for q in queries])
+        shared = float(self.store._conn is self.inherited)
+        return [[{"resume_id": str(os.getpid()), "ce_score": shared}] for _ in queries], None
+
+    async def _asummarize(self, query, reranked, chunk_index, top_n):
+        time.sleep(0.05)  # hold this worker's loop so the other one accepts
+        return reranked
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _run(service, client):
+    async def main():
+        server = await service.start(host="127.0.0.1", port=0)
+        url = "http://127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+        try:
+            return await client(url)
+        finally:
+            server.close()
+            await service.batcher.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_batches():
+    pipeline = StubPipeline()
+    service = SearchService(pipeline, batch_window_ms=20, max_batch=4)
+
+    async def client(url):
+        searches = [asyncio.to_thread(_post, url + "/search", {"query": f"q{i}", "top_k": 2}) for i in range(8)]
+        batch = asyncio.to_thread(_post, url + "/search/batch", {"queries": ["a", "b"], "top_k": 1})
+        stream = asyncio.to_thread(_post, url + "/search/stream", {"query": "s", "top_k": 2})
+        bad = asyncio.to_thread(_post, url + "/search", {"query": "x", "filters": {"bad": 1}})
+        health = asyncio.to_thread(lambda: urllib.request.urlopen(url + "/health", timeout=10).read())
+        return await asyncio.gather(asyncio.gather(*searches), batch, stream, bad), json.loads(await health)
+
+    (searches, batch, stream, bad), health = _run(service, client)
+    for i, (status, body) in enumerate(searches):
+        results = json.loads(body)["results"]
+        assert status == 200 and [r["resume_id"] for r in results] == [f"q{i}-0", f"q{i}-1"]
+        assert results[1]["ce_score"] == -1.0
+    assert json.loads(batch[1])["results"] == [[{"resume_id": "a-0", "summary": "about a", "ce_score": 0.0}],
+                                               [{"resume_id": "b-0", "summary": "about b", "ce_score": 0.0}]]
+    events = [json.loads(line) for line in stream[1].splitlines()]
+    assert [e["type"] for e in events] == ["candidates", "summary", "summary", "trace"]
+    assert bad[0] == 400 and "Unknown filter" in json.loads(bad[1])["error"]
+
+    # 11 queries (bad filters never batch with the rest), at most 4 per batch.
+    assert sorted(q for b in pipeline.batches for q in b) == sorted([f"q{i}" for i in range(8)] + ["a", "b", "s"])
+    assert len(pipeline.batches) < 11 and max(len(b) for b in pipeline.batches) <= 4
+    assert health["pending"] == 0 and health["batches"] >= len(pipeline.batches)
+
+
+def test_overload_returns_503():
+    service = SearchService(StubPipeline(), batch_window_ms=50, max_pending=2)
+
+    async def client(url):
+        return await asyncio.gather(*(asyncio.to_thread(_post, url + "/search", {"query": f"q{i}"}) for i in range(6)))
+
+    statuses = [status for status, _ in _run(service, client)]
+    assert statuses.count(200) >= 2 and 503 in statuses and set(statuses) <= {200, 503}
+
+
+def test_responses_carry_traces_and_metrics():
+    service = SearchService(StubPipeline(), batch_window_ms=20)
+
+    async def client(url):
+        searches = await asyncio.gather(
+            *(asyncio.to_thread(_post, url + "/search", {"query": f"q{i}", "top_k": 1}) for i in range(3))
+        )
+        metrics = await asyncio.to_thread(lambda: urllib.request.urlopen(url + "/metrics", timeout=10).read())
+        return searches, metrics.decode()
+
+    searches, metrics = _run(service, client)
+    traces = [json.loads(body)["trace"] for _, body in searches]
+    for trace in traces:
+        names = [span["name"] for span in trace["spans"]]
+        assert names[:3] == ["rank", "rank_batch", "retrieve"]
+        # Spans recorded in the batch thread nest under the request's "rank" stage.
+        assert [span["parent"] for span in trace["spans"][:3]] == [None, 0, 1]
+        assert trace["stages"]["retrieve"] >= 40
+        # Counters of a shared batch are batch totals.
+        assert 1 <= trace["counters"]["rerank_pairs"] <= 3
+    assert 'rag_request_seconds_count{name="search"} 3' in metrics
+    assert 'rag_stage_seconds_bucket{stage="retrieve",le="+Inf"}' in metrics
+    assert "rag_rerank_pairs_total" in metrics
+
+
+def test_preloaded_workers_write_to_a_shared_sqlite_store(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    path = tmp_path / "cache.sqlite"
+    server = multiprocessing.get_context("fork").Process(target=serve, kwargs=dict(
+        pipeline_factory=lambda: CachingPipeline(path), host="127.0.0.1", port=port, workers=2, preload=True,
+        batch_window_ms=1,
+    ))
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{port}/search"
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                _post(url, {"query": "ready"})
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+
+        async def burst(i):
+            return await asyncio.gather(*(asyncio.to_thread(_post, url, {"query": f"q{i}-{j}"}) for j in range(4)))
+
+        writers, shared, sent = set(), set(), []
+        for i in range(20):
+            responses = asyncio.run(burst(i))
+            sent += [f"q{i}-{j}" for j in range(4)]
+            results = [json.loads(body)["results"][0] for status, body in responses if status == 200]
+            writers |= {r["resume_id"] for r in results}
+            shared |= {r["ce_score"] for r in results}
+            if len(writers) == 2:
+                break
+    finally:
+        os.kill(server.pid, signal.SIGTERM)
+        server.join(10)
+    assert len(writers) == 2 and str(server.pid) not in writers
+    # Each worker opened its own connection instead of using the one inherited across fork.
+    assert shared == {0.0}
+
+    conn = sqlite3.connect(str(path))
+    rows = dict(conn.execute("SELECT key, value FROM entries").fetchall())
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    conn.close()
+    assert set(sent) | {"preload", "ready"} == set(rows)
+    assert {rows[q].decode() for q in sent} <= writers and rows["preload"].decode() == str(server.pid)
@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.bm25_retriever import BM25Retriever
+from src.retrieval.corpus_store import CorpusStore
+from src.retrieval.dense_retriever import DenseRetriever
+from src.retrieval.metadata_index import MetadataIndex
+from src.retrieval.sharding import ShardedRetriever, write_shards
+
+WORDS = "python java docker kubernetes sql spark react aws gcp azure linux golang rust excel".split()
+QUERIES = ["python docker", "kubernetes aws linux", "rust", "excel sql spark react", "unknownterm"]
+
+
+def _corpus(tmp_path):
+    rng = np.random.default_rng(0)
+    chunks = [
+        Document(
+            page_content=" ".join(rng.choice(WORDS, size=rng.integers(3, 30))),
+            metadata={"resume_id": f"r{i // 4}", "chunk_id": i % 4,
+                      "section": "skills" if i % 4 == 3 else "experience"},
+        )
+        for i in range(400)
+    ]
+    vectors = rng.normal(size=(len(chunks), 16)).astype(np.float32)
+    tokens = [BM25Retriever.clean_and_tokenize(c.page_content) for c in chunks]
+    return CorpusStore.write(tmp_path / "corpus", chunks, vectors, "test-model", bm25_index=BM25Index().fit(tokens))
+
+
+def _embedder(store, vectors):
+    embedder = DenseRetriever(api_key="test")
+    embedder.model_name = store.embedding_model
+    embedder._embed_queries = lambda queries: vectors[: len(queries)]
+    return embedder
+
+
+def test_sharded_search_matches_unsharded(tmp_path):
+    store = _corpus(tmp_path)
+    manifest = write_shards(store, tmp_path / "shards", n_shards=3)
+    assert sum(s["n_chunks"] for s in manifest["shards"]) == store.n_chunks
+
+    Q = np.random.default_rng(1).normal(size=(len(QUERIES), 16)).astype(np.float32)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True)
+    bm25 = BM25Retriever()
+    bm25.fit_index(store.chunks(), store.bm25_index())
+    dense = DenseRetriever(api_key="test")
+    dense.fit(store.chunks(), store.vectors, "test-model", normalized=True, vector_ids=store.vector_ids)
+    metadata = MetadataIndex(store.chunks())
+
+    sharded = ShardedRetriever(tmp_path / "shards", _embedder(store, Q), processes=False)
+    for filters in (None, {"section": "skills"}, {"skills": ["rust"]}):
+        mask = metadata.mask(filters)
+        bm25_lists, dense_lists = sharded.search_many_rows(QUERIES, 25, 30, filters=filters)
+        for query, q, (b_rows, b_scores), (d_rows, d_scores) in zip(QUERIES, Q, bm25_lists, dense_lists):
+            e_rows, e_scores = bm25.search_rows(query, 25, mask=mask)
+            assert b_rows.tolist() == e_rows.tolist() and b_scores.tolist() == e_scores.tolist()
+            e_rows, e_scores = dense.search_vectors(q[None, :], 30, mask=mask)[0]
+            assert d_rows.tolist() == e_rows.tolist() and np.allclose(d_scores, e_scores, atol=1e-6)
+
+
+def test_shard_workers_match_in_process(tmp_path):
+    store = _corpus(tmp_path)
+    write_shards(store, tmp_path / "shards", n_shards=2)
+    Q = np.random.default_rng(2).normal(size=(len(QUERIES), 16)).astype(np.float32)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True)
+
+    local = ShardedRetriever(tmp_path / "shards", _embedder(store, Q), processes=False)
+    with ShardedRetriever(tmp_path / "shards", _embedder(store, Q), start_method="fork") as workers:
+        got = workers.search_many_rows(QUERIES, 10, 10, filters={"section": "experience"})
+    expected = local.search_many_rows(QUERIES, 10, 10, filters={"section": "experience"})
+    for got_lists, expected_lists in zip(got, expected):
+        for (rows, scores), (e_rows, e_scores) in zip(got_lists, expected_lists):
+            assert rows.tolist() == e_rows.tolist() and np.array_equal(scores, e_scores)
+
+
+def test_failed_request_leaves_workers_in_step(tmp_path):
+    store = _corpus(tmp_path)
+    write_shards(store, tmp_path / "shards", n_shards=3)
+    Q = np.random.default_rng(3).normal(size=(len(QUERIES), 16)).astype(np.float32)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True)
+
+    local = ShardedRetriever(tmp_path / "shards", _embedder(store, Q), processes=False)
+    with ShardedRetriever(tmp_path / "shards", _embedder(store, Q), start_method="fork") as workers:
+        with pytest.raises(ValueError):
+            workers.search_rows(QUERIES[0], 10, 10, filters={"min_degree": "bogus"})
+        # Every shard's error reply was consumed, so the next searches get their own results.
+        for filters in ({"section": "skills"}, None):
+            got = workers.search_rows(QUERIES[0], 10, 10, filters=filters)
+            expected = local.search_rows(QUERIES[0], 10, 10, filters=filters)
+            for (rows, scores), (e_rows, e_scores) in zip(got, expected):
+                assert rows.tolist() == e_rows.tolist() and np.array_equal(scores, e_scores)
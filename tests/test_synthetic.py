@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from data.synthetic import hash_embeddings, synthetic_chunks, synthetic_qrels, synthetic_queries, synthetic_resumes
+
+
+def test_synthetic_corpus_is_deterministic_and_chunked_by_section():
+    first = dict(synthetic_resumes(50, seed=3))
+    assert first == dict(synthetic_resumes(50, seed=3))
+    assert first != dict(synthetic_resumes(50, seed=4))
+    # A larger corpus starts with the smaller one.
+    assert list(synthetic_resumes(100, seed=3))[:50] == list(first.items())
+    assert synthetic_queries(5, seed=3) == synthetic_queries(5, seed=3)
+    qrels = synthetic_qrels(5, 50, seed=3)
+    assert [q["query"] for q in qrels] == synthetic_queries(5, seed=3)
+    assert all(set(q["relevant"]) <= set(first) and set(q["relevant"].values()) <= {1, 2} for q in qrels)
+
+    chunks = synthetic_chunks(200, seed=3)
+    assert len(chunks) >= 200
+    sections = {c.metadata.get("section") for c in chunks}
+    assert {"experience", "education", "skills"} <= sections
+    assert any(c.metadata.get("degree") for c in chunks)
+
+
+def test_hash_embeddings_rank_word_overlap_first():
+    texts = ["kubernetes docker terraform aws", "patient care icu triage", "react typescript css", ""]
+    vectors = hash_embeddings(texts, dim=128)
+    assert vectors.shape == (4, 128) and not vectors[3].any()
+    np.testing.assert_array_equal(vectors, hash_embeddings(texts, dim=128))
+
+    query = hash_embeddings(["docker and kubernetes"], dim=128)[0]
+    norms = np.linalg.norm(vectors[:3], axis=1)
+    assert int(np.argmax(vectors[:3] @ query / norms)) == 0
@@ -0,0 +1,23 @@
+"""Tiny randomly initialized cross-encoder for tests (no model hub download)."""
+from pathlib import Path
+
+WORDS = ["python", "java", "docker", "kubernetes", "developer", "engineer", "data",
+         "scientist", "nurse", "sales", "manager", "experience", "with", "and", "years"]
+
+
+def tiny_cross_encoder(path: Path, max_length: int = 64) -> str:
+    """Random two-layer BERT cross-encoder saved to ``path``; returns the model path."""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    path.mkdir()
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    BertTokenizerFast(str(path / "vocab.txt"), model_max_length=max_length).save_pretrained(str(path))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=max_length, num_labels=1,
+        initializer_range=0.5,  # spread the scores well beyond quantization noise
+    )
+    BertForSequenceClassification(config).save_pretrained(str(path))
+    return str(path)